@@ -7,14 +7,56 @@
 import re
 import os
 import sys
+from contextlib import contextmanager
 
 from tcadmin.appconfig import AppConfig
+from tcadmin.resources import Resources
 
 from . import projects, grants
+from .schemas import check_config
 from .secret_values import SecretValues
 
 
 async def update_resources(resources):
+    secret_values = None
+    if AppConfig.current().options.get("with_secrets"):
+        secret_values = SecretValues()
+
+    await build_resources(resources, secret_values)
+
+
+async def generate_resources(secret_values=None):
+    """
+    Generate a fresh Resources instance containing everything this repository
+    defines, without requiring a tc-admin command context.  This is useful for
+    tools that examine the generated resources offline.  It must be run from
+    the root of this repository.
+    """
+    with offline_appconfig():
+        resources = Resources()
+        await build_resources(resources, secret_values)
+    return resources
+
+
+@contextmanager
+def offline_appconfig():
+    """
+    Make a default AppConfig current, as tc-admin does while running a
+    command, so that resources can be constructed outside of one; resources
+    consult the current AppConfig when they are constructed.
+
+    tc-admin has no public way to do this, so this is the only place outside
+    tc-admin that calls its AppConfig._as_current.  Anything else needing an
+    AppConfig, such as the tests, uses this.
+    """
+    with AppConfig._as_current(AppConfig()):
+        yield
+
+
+async def build_resources(resources, secret_values):
+    # report every error in the config files at once, before generating anything
+    await check_config()
+
     # Set up the resources to manage everything *except* externally managed
     # resources
     externally_managed_patterns = (
@@ -27,9 +69,8 @@ async def update_resources(resources):
     em_bar = "|".join(externally_managed_patterns)
     resources.manage(re.compile(r"(?!{}).*".format(em_bar)))
 
-    secret_values = None
-    if AppConfig.current().options.get("with_secrets"):
-        secret_values = SecretValues()
-
-    await projects.update_resources(resources, secret_values)
-    await grants.update_resources(resources, secret_values)
+    # grants from projects and from grants.yml are aggregated, so that each
+    # role is emitted once with a minimal set of scopes
+    grant_index = grants.GrantIndex()
+    await projects.update_resources(resources, secret_values, grant_index)
+    await grants.update_resources(resources, secret_values, grant_index)
@@ -6,9 +6,11 @@
 
 import attr
 import re
+from collections import defaultdict
 
 from tcadmin.resources import Role
 from tcadmin.util.config import ConfigList
+from tcadmin.util.scopes import normalizeScopes
 from .loader import loader
 
 
@@ -26,19 +28,44 @@ class Grants(ConfigList):
         grant = attr.ib(type=list, converter=make_list)
         to = attr.ib(type=list, converter=make_list)
 
-        def update_resources(self, resources):
-            scopes = self.grant
-            for roleId in self.to:
-                id = f"Role={roleId}"
-                if not resources.is_managed(id):
-                    resources.manage(re.escape(id) + "$")
-                resources.add(Role(roleId=roleId, description="", scopes=scopes))
-
     @classmethod
     def from_project(cls, project):
         return cls(cls.Item(**g) for g in project.grants)
 
 
-async def update_resources(resources, secret_values):
+class GrantIndex:
+    """
+    An index of granted scopes, keyed by roleId.  Grants from all sources are
+    aggregated here, and then emitted as a single role per roleId with a
+    minimal, sorted set of scopes: duplicates are removed, as are scopes
+    already satisfied by a star-suffixed scope in the same role.
+    """
+
+    def __init__(self):
+        self.scopes = defaultdict(set)
+
+    def add(self, grant):
+        for roleId in grant.to:
+            self.scopes[roleId].update(grant.grant)
+
+    def update_resources(self, resources):
+        for roleId, scopes in sorted(self.scopes.items()):
+            id = f"Role={roleId}"
+            if not resources.is_managed(id):
+                resources.manage(re.escape(id) + "$")
+            resources.add(
+                Role(roleId=roleId, description="", scopes=normalizeScopes(scopes))
+            )
+
+
+async def update_resources(resources, secret_values, grant_index=None):
+    """
+    Add the grants in grants.yml to grant_index, then emit all of the roles
+    in that index.  If grant_index is not given, only the roles from
+    grants.yml are emitted.
+    """
+    if grant_index is None:
+        grant_index = GrantIndex()
     for grant in await Grants.load(loader):
-        grant.update_resources(resources)
+        grant_index.add(grant)
+    grant_index.update_resources(resources)
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+from concurrent.futures import ProcessPoolExecutor
+import json, re, statistics, time
+
+import jsone
+import jsonschema
+from tcadmin.resources import Hook
+
+# the taskId given to every sample firing
+SAMPLE_TASK_ID = "fN1SbArXTPSVFNUvaOlinQ"
+
+# keys of the json-e context must look like identifiers
+_CONTEXT_KEY_RE = re.compile(r"[a-zA-Z_][a-zA-Z0-9_]*$")
+
+
+def _is_static(template):
+    """
+    Return True if json-e would render this template to itself: it contains no
+    operators, no `$`-escaped keys and no `${..}` interpolations.
+    """
+    if isinstance(template, str):
+        return "${" not in template
+    if isinstance(template, list):
+        return all(_is_static(v) for v in template)
+    if isinstance(template, dict):
+        return all(
+            not k.startswith("$") and "${" not in k and _is_static(v)
+            for k, v in template.items()
+        )
+    return True
+
+
+def _compile(template):
+    """
+    Return a function rendering `template` given a full json-e context.  Static
+    subtrees are returned as-is, and plain objects and arrays are walked here,
+    so that json-e only sees the parts of the template that need rendering.
+    """
+    if _is_static(template):
+        return lambda context: template
+
+    if isinstance(template, dict) and not any(
+        k.startswith("$") or "${" in k for k in template
+    ):
+        items = [(k, _compile(v)) for k, v in template.items()]
+
+        def render_object(context):
+            result = {}
+            for k, render in items:
+                try:
+                    v = render(context)
+                except jsone.JSONTemplateError as e:
+                    if _CONTEXT_KEY_RE.match(k):
+                        e.add_location(".{}".format(k))
+                    else:
+                        e.add_location("[{}]".format(json.dumps(k)))
+                    raise
+                if v is not jsone.DeleteMarker:
+                    result[k] = v
+            return result
+
+        return render_object
+
+    if isinstance(template, list):
+        items = [_compile(v) for v in template]
+
+        def render_array(context):
+            result = []
+            for i, render in enumerate(items):
+                try:
+                    v = render(context)
+                except jsone.JSONTemplateError as e:
+                    e.add_location("[{}]".format(i))
+                    raise
+                if v is not jsone.DeleteMarker:
+                    result.append(v)
+            return result
+
+        return render_array
+
+    def render_dynamic(context):
+        rv = jsone.renderValue(template, context)
+        if jsone.containsFunctions(rv):
+            raise jsone.TemplateError("evaluated template contained uncalled functions")
+        return rv
+
+    return render_dynamic
+
+
+class CompiledTemplate:
+    """
+    A json-e template, prepared once for repeated rendering.  Rendering gives the
+    same result as `jsone.render`, but static parts of the result are shared
+    between renders and must not be modified.
+
+    json-e has no public compile step, so this uses its internals (renderValue,
+    containsFunctions, DeleteMarker, builtins and JSONTemplateError locations);
+    setup.py pins the json-e release it was written against, and
+    benchmark_hook checks every rendering against `jsone.render`.
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self._render = _compile(template)
+        self._builtins = jsone.builtins.build()
+
+    def render(self, context):
+        if type(context) != dict:
+            raise jsone.TemplateError("context must be a dictionary")
+        if not all(_CONTEXT_KEY_RE.match(c) for c in context):
+            raise jsone.TemplateError(
+                "top level keys of context must follow /[a-zA-Z_][a-zA-Z0-9_]*/"
+            )
+        full_context = {"now": jsone.fromNow("0 seconds", None)}
+        full_context.update(self._builtins)
+        full_context.update(context)
+        rv = self._render(full_context)
+        if rv is jsone.DeleteMarker:
+            return None
+        return rv
+
+
+def sample_payload(schema):
+    """
+    Build a minimal value satisfying a simple JSON schema, using defaults where
+    given and filling in only required properties.
+    """
+    if "default" in schema:
+        return schema["default"]
+    if "enum" in schema:
+        return schema["enum"][0]
+    type_ = schema.get("type", "object")
+    if isinstance(type_, list):
+        type_ = type_[0]
+    if type_ == "object":
+        properties = schema.get("properties", {})
+        return {
+            k: sample_payload(v)
+            for k, v in properties.items()
+            if "default" in v or k in schema.get("required", [])
+        }
+    return {
+        "array": [],
+        "string": "",
+        "integer": 0,
+        "number": 0,
+        "boolean": False,
+        "null": None,
+    }.get(type_)
+
+
+def hook_contexts(hook, samples, now):
+    """
+    Return a list of (label, context, problems) for the ways the given Hook can
+    fire, where `problems` lists reasons the context is invalid, such as
+    trigger payloads that do not match the hook's triggerSchema.
+
+    `samples` has the form of misc/hook-trigger-samples.yml: `exchanges` maps
+    exchange names to sample message payloads, and `hooks` maps
+    `hookGroupId/hookId` to a list of sample trigger payloads.
+    """
+    contexts = []
+    base = {"taskId": SAMPLE_TASK_ID, "now": now}
+
+    if hook.schedule:
+        contexts.append(("schedule", dict(base, firedBy="schedule"), []))
+
+    for exchange in sorted({b.exchange for b in hook.bindings}):
+        payload = samples.get("exchanges", {}).get(exchange)
+        problems = [] if payload is not None else ["no sample message"]
+        contexts.append(
+            (
+                "pulseMessage " + exchange,
+                dict(base, firedBy="pulseMessage", payload=payload or {}),
+                problems,
+            )
+        )
+
+    schema = hook.triggerSchema or {}
+    validator_cls = jsonschema.validators.validator_for(schema)
+    validator_cls.check_schema(schema)
+    validator = validator_cls(schema)
+    payloads = samples.get("hooks", {}).get(
+        "{}/{}".format(hook.hookGroupId, hook.hookId)
+    ) or [sample_payload(schema)]
+    for i, payload in enumerate(payloads):
+        problems = [
+            "triggerSchema: {} at {}".format(
+                e.message, "/".join(str(p) for p in e.absolute_path) or "payload"
+            )
+            for e in validator.iter_errors(payload)
+        ]
+        contexts.append(
+            (
+                "triggerHook #{}".format(i),
+                dict(base, firedBy="triggerHook", payload=payload, clientId="sample"),
+                problems,
+            )
+        )
+
+    return contexts
+
+
+def benchmark_hook(hookId, task, contexts, repeat):
+    """
+    Render the task template for each context `repeat` times, returning a
+    result dict per context.  The template is compiled once, for all of the
+    renders, and the compiled rendering is checked against `jsone.render` once
+    per context.
+    """
+    template = CompiledTemplate(task)
+    results = []
+    for label, context, problems in contexts:
+        result = {
+            "hookId": hookId,
+            "context": label,
+            "problems": list(problems),
+            "renders": 0,
+            "bytes": None,
+            "mean_ms": None,
+            "max_ms": None,
+        }
+        results.append(result)
+        try:
+            expected = jsone.render(task, context)
+        except jsone.JSONTemplateError as e:
+            result["problems"].append(str(e))
+            continue
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rendered = template.render(context)
+            timings.append(time.perf_counter() - start)
+        if rendered != expected:
+            result["problems"].append("compiled rendering differs from json-e")
+
+        result["renders"] = repeat
+        result["bytes"] = len(json.dumps(rendered, sort_keys=True))
+        result["mean_ms"] = statistics.mean(timings) * 1000
+        result["max_ms"] = max(timings) * 1000
+
+    return results
+
+
+def benchmark_hooks(resources, samples, repeat=100, jobs=None):
+    """
+    Benchmark every Hook in the given Resources, in parallel processes,
+    returning a flat list of result dicts as from `benchmark_hook`.
+    """
+    now = jsone.fromNow("0 seconds", None)
+    hooks = sorted((r for r in resources if isinstance(r, Hook)), key=lambda h: h.id)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(
+                benchmark_hook,
+                "{}/{}".format(hook.hookGroupId, hook.hookId),
+                hook.task,
+                hook_contexts(hook, samples, now),
+                repeat,
+            )
+            for hook in hooks
+        ]
+        return [result for future in futures for result in future.result()]
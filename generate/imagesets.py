@@ -8,12 +8,74 @@ import attr
 
 from tcadmin.util.config import ConfigDict
 from .loader import loader
+from .utils import evaluate_keyed_by
+
+# Where imagesets/prefetch.sh stores the artifacts and git mirrors it bakes
+# into an image; docker images go to the image's docker daemon.
+PREFETCH_DIR = "/var/cache/taskcluster-prefetch"
+
+
+def check_prefetch(instance, attribute, value):
+    """
+    Check an image set's `prefetch` field: `dockerImages` is a list of image
+    names, and `artifacts` and `gitMirrors` map names to URLs.
+    """
+    unknown = set(value) - {"dockerImages", "artifacts", "gitMirrors"}
+    if unknown:
+        raise ValueError(f"unknown prefetch options {sorted(unknown)}")
+    if not isinstance(value.get("dockerImages", []), list):
+        raise ValueError("prefetch.dockerImages must be a list")
+    for kind in ["artifacts", "gitMirrors"]:
+        for name in value.get(kind, {}):
+            if "/" in name or name.startswith("."):
+                raise ValueError(f"prefetch.{kind} has invalid name {name}")
+
+
+def build_prefetch_worker_config(workerImplementation, prefetch):
+    """
+    Return the workerConfig describing where the prefetched content baked into
+    an image can be found, or None if nothing is prefetched.  Only
+    generic-worker has a place for this, as `workerTypeMetadata`, which tasks
+    can read; docker-worker uses prefetched docker images without help.
+    """
+    if not prefetch or workerImplementation != "generic-worker":
+        return None
+    metadata = {"directory": PREFETCH_DIR}
+    if prefetch.get("dockerImages"):
+        metadata["dockerImages"] = sorted(prefetch["dockerImages"])
+    for kind, suffix in [("artifacts", ""), ("gitMirrors", ".git")]:
+        if prefetch.get(kind):
+            metadata[kind] = {
+                name: f"{PREFETCH_DIR}/{kind}/{name}{suffix}"
+                for name in sorted(prefetch[kind])
+            }
+    return {
+        "genericWorker": {
+            "config": {
+                "workerTypeMetadata": {"prefetch": metadata},
+            },
+        },
+    }
+
+
+def normalize_arm_parameters(parameters):
+    """
+    Normalize ARM template parameters to the `{"value": ..}` form expected by
+    Azure, leaving parameters that are already in that form untouched.
+    """
+    normalized = {}
+    for key, value in (parameters or {}).items():
+        if isinstance(value, dict) and "value" in value:
+            normalized[key] = value
+        else:
+            normalized[key] = {"value": value}
+    return normalized
 
 
 class ImageSets(ConfigDict):
     filename = "config/imagesets.yml"
 
-    @attr.s
+    @attr.s(frozen=True, eq=False)
     class Item:
         name = attr.ib(type=str)
         workerImplementation = attr.ib(type=str)
@@ -22,3 +84,83 @@ class ImageSets(ConfigDict):
         gcp = attr.ib(type=dict, factory=lambda: {})
         workerConfig = attr.ib(type=dict, factory=lambda: {})
         workerManager = attr.ib(type=dict, factory=lambda: {})
+        prefetch = attr.ib(type=dict, factory=lambda: {}, validator=check_prefetch)
+
+        # Data derived from the above, computed once when the image set is
+        # loaded rather than once for every worker pool that uses it.
+        aws_image_ids = attr.ib(
+            init=False,
+            default=attr.Factory(
+                lambda self: self.aws.get("amis", {}), takes_self=True
+            ),
+        )
+        aws_regions = attr.ib(
+            init=False,
+            default=attr.Factory(
+                lambda self: list(self.aws_image_ids), takes_self=True
+            ),
+        )
+        azure_image_ids = attr.ib(
+            init=False,
+            default=attr.Factory(
+                lambda self: self.azure.get("images", {}), takes_self=True
+            ),
+        )
+        azure_locations = attr.ib(
+            init=False,
+            default=attr.Factory(
+                lambda self: sorted(self.azure_image_ids), takes_self=True
+            ),
+        )
+        gcp_image = attr.ib(
+            init=False,
+            default=attr.Factory(lambda self: self.gcp.get("image"), takes_self=True),
+        )
+        prefetch_worker_config = attr.ib(
+            init=False,
+            default=attr.Factory(
+                lambda self: build_prefetch_worker_config(
+                    self.workerImplementation, self.prefetch
+                ),
+                takes_self=True,
+            ),
+        )
+        _arm_cache = attr.ib(init=False, factory=lambda: {}, repr=False)
+
+        def arm_deployment(self, location, vmSize):
+            """
+            Return this image set's `armDeployment`, evaluated for the given
+            location and VM size, with its parameters normalized.  The result
+            is cached and must not be modified.
+            """
+            key = ("armDeployment", location, vmSize)
+            if key not in self._arm_cache:
+                value = self.azure.get("armDeployment")
+                if value is not None:
+                    value = evaluate_keyed_by(
+                        value,
+                        "armDeployment",
+                        {"location": location, "vmSize": vmSize},
+                    )
+                value = dict(value or {})
+                if "parameters" in value:
+                    value["parameters"] = normalize_arm_parameters(value["parameters"])
+                self._arm_cache[key] = value
+            return self._arm_cache[key]
+
+        def arm_deployment_resource_group(self, location, vmSize):
+            """
+            Return this image set's `armDeploymentResourceGroup`, evaluated for
+            the given location and VM size.
+            """
+            key = ("armDeploymentResourceGroup", location, vmSize)
+            if key not in self._arm_cache:
+                value = self.azure.get("armDeploymentResourceGroup")
+                if value is not None:
+                    value = evaluate_keyed_by(
+                        value,
+                        "armDeploymentResourceGroup",
+                        {"location": location, "vmSize": vmSize},
+                    )
+                self._arm_cache[key] = value
+            return self._arm_cache[key]
@@ -5,12 +5,24 @@
 # obtain one at http://mozilla.org/MPL/2.0/.
 
 import attr
+import datetime
+import itertools
+import json
 import re
+from collections import defaultdict
 
 from tcadmin.resources import Role, Client, WorkerPool, Secret, Hook, Binding
 from .loader import loader, YamlDirectory
-from .workers import build_worker_pool
-from .grants import Grants
+from .workers import (
+    build_worker_pool,
+    check_image_sets,
+    get_image_set,
+    launch_config_region,
+    pool_image_set_names,
+)
+from .quotas import apply_quotas
+from .grants import Grants, GrantIndex
+from .utils import InternTable, split_capacity
 
 ADMIN_ROLE_PREFIXES = [
     "github-org-admin:",
@@ -19,6 +31,30 @@ ADMIN_ROLE_PREFIXES = [
 ]
 
 
+# Python script run by warm-capacity hook tasks, with WORKER_POOL_ID and
+# MIN_CAPACITY substituted.  It sets the pool's minCapacity through
+# worker-manager, via the taskcluster proxy.  (This must not contain json-e
+# interpolations, as it is part of a hook task template.)
+WARM_CAPACITY_SCRIPT = """\
+import json, os, urllib.parse, urllib.request
+url = os.environ.get("TASKCLUSTER_PROXY_URL", "http://taskcluster")
+url += "/api/worker-manager/v1/worker-pool/"
+url += urllib.parse.quote(WORKER_POOL_ID, safe="")
+pool = json.load(urllib.request.urlopen(url))
+pool["config"]["minCapacity"] = MIN_CAPACITY
+keys = ["providerId", "description", "config", "owner", "emailOnError"]
+body = {k: pool[k] for k in keys}
+request = urllib.request.Request(
+    url,
+    data=json.dumps(body).encode("utf8"),
+    headers={"Content-Type": "application/json"},
+    method="POST",
+)
+urllib.request.urlopen(request)
+print("set minCapacity of", WORKER_POOL_ID, "to", MIN_CAPACITY)
+"""
+
+
 class ExternallyManaged:
     def __init__(self, value):
         if value not in (True, False):
@@ -79,8 +115,303 @@ class Projects(YamlDirectory):
         )
 
 
-async def update_resources(resources, secret_values):
+# the ranges of the fields of a hook's cron schedule, which begins with seconds
+CRON_FIELDS = [(0, 59), (0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+def cron_field(field, low, high):
+    """
+    Return the set of values matched by a field of a cron schedule, such as
+    `*`, `5`, `1-5`, `*/15` or a comma-separated list of those.
+    """
+    values = set()
+    for part in field.split(","):
+        match = re.fullmatch(r"(\*|(\d+)(?:-(\d+))?)(?:/(\d+))?", part)
+        if not match:
+            raise ValueError(f"unsupported cron field {field!r}")
+        if match.group(1) == "*":
+            first, last = low, high
+        else:
+            first = int(match.group(2))
+            last = int(match.group(3) or (high if match.group(4) else first))
+        if not low <= first <= last <= high:
+            raise ValueError(f"cron field {field!r} is out of range")
+        values.update(range(first, last + 1, int(match.group(4) or 1)))
+    return values
+
+
+def cron_last_fired(schedule, now):
+    """
+    Return the last time, no later than `now`, at which a hook's cron schedule
+    fired, or None if it did not in the past year.  Times are UTC, as for
+    hook schedules.
+    """
+    fields = schedule.split()
+    if len(fields) != len(CRON_FIELDS):
+        raise ValueError(f"cron schedule {schedule!r} must have six fields")
+    seconds, minutes, hours, days, months, weekdays = [
+        cron_field(field, low, high) for field, (low, high) in zip(fields, CRON_FIELDS)
+    ]
+    if 7 in weekdays:
+        weekdays.add(0)
+    times = sorted(itertools.product(hours, minutes, seconds), reverse=True)
+    for offset in range(367):
+        date = now.date() - datetime.timedelta(days=offset)
+        day_matches = date.day in days
+        weekday_matches = (date.weekday() + 1) % 7 in weekdays
+        # as in cron, a day matches either field when both are restricted
+        if fields[3] != "*" and fields[5] != "*":
+            day_matches = day_matches or weekday_matches
+        elif fields[3] == "*":
+            day_matches = weekday_matches
+        if date.month not in months or not day_matches:
+            continue
+        for hour, minute, second in times:
+            fired = datetime.datetime.combine(date, datetime.time(hour, minute, second))
+            if fired <= now:
+                return fired
+    return None
+
+
+def warm_min_capacity(worker_pool, now):
+    """
+    Return the pool's minCapacity at the given (UTC) time: the largest
+    minCapacity of its warmCapacity windows that have started more recently
+    than they ended, or else the pool's own minCapacity.
+    """
+    minCapacity = worker_pool.get("minCapacity", 0)
+    for window in worker_pool["warmCapacity"].get("windows", []):
+
+        def last_fired(schedules):
+            if not isinstance(schedules, list):
+                schedules = [schedules]
+            times = [cron_last_fired(s, now) for s in schedules]
+            return max((t for t in times if t), default=None)
+
+        start, end = last_fired(window["start"]), last_fired(window["end"])
+        if start and (end is None or start > end):
+            minCapacity = max(minCapacity, window["minCapacity"])
+    return minCapacity
+
+
+async def warm_capacity_hooks(project, name, worker_pool, providerId):
+    """
+    Return a list of (hook, grant) for the pool's warmCapacity schedule.  Each
+    window gets a hook raising the pool's minCapacity when it starts, and one
+    lowering it back to the pool's minCapacity when it ends.  The hook tasks
+    run on the project's pool named by `workerType` (by default the pool
+    itself), which must be a Linux docker-worker or generic-worker pool; on a
+    docker-worker pool, they run in the docker image given by `image`, which
+    must have python3.
+
+    The pool itself is generated with the minCapacity of the windows open at
+    the time (see warm_min_capacity), so that `tc-admin apply` agrees with
+    the hooks.
+    """
+    warm = worker_pool["warmCapacity"]
+    unknown = set(warm) - {"workerType", "image", "windows"}
+    if unknown:
+        raise ValueError(f"unknown warmCapacity options {sorted(unknown)}")
+    worker_pool_id = "proj-{}/{}".format(project.name, name)
+    workerType = warm.get("workerType", name)
+    if workerType not in project.workerPools:
+        raise ValueError(
+            f"warmCapacity for {worker_pool_id} runs on unknown pool {workerType}"
+        )
+    image_set = await get_image_set(
+        pool_image_set_names(project.workerPools[workerType])[0]
+    )
+    baseCapacity = worker_pool.get("minCapacity", 0)
+
+    def hook(hookId, schedule, minCapacity):
+        script = WARM_CAPACITY_SCRIPT.replace(
+            "WORKER_POOL_ID", json.dumps(worker_pool_id)
+        ).replace("MIN_CAPACITY", json.dumps(minCapacity))
+        payload = {
+            "maxRunTime": 600,
+            "features": {"taskclusterProxy": True},
+        }
+        if image_set.workerImplementation == "docker-worker":
+            if "image" not in warm:
+                raise ValueError(
+                    f"warmCapacity for {worker_pool_id} runs on docker-worker"
+                    f" pool {workerType}, so must give an image"
+                )
+            payload["image"] = warm["image"]
+            payload["command"] = ["python3", "-c", script]
+        elif image_set.workerImplementation == "generic-worker":
+            payload["command"] = [["python3", "-c", script]]
+        else:
+            raise ValueError(
+                f"warmCapacity cannot run on {image_set.workerImplementation} pools"
+            )
+        description = f"Set the minCapacity of {worker_pool_id} to {minCapacity}"
+        scopes = [
+            f"worker-manager:manage-worker-pool:{worker_pool_id}",
+            f"worker-manager:provider:{providerId}",
+        ]
+        return (
+            Hook(
+                hookGroupId="project-{}".format(project.name),
+                hookId=hookId,
+                name=hookId,
+                description=description,
+                owner=worker_pool.get("owner", "nobody@mozilla.com"),
+                emailOnError=worker_pool.get("emailOnError", False),
+                schedule=schedule if isinstance(schedule, list) else [schedule],
+                bindings=[],
+                task={
+                    "provisionerId": "proj-{}".format(project.name),
+                    "workerType": workerType,
+                    "created": {"$fromNow": "0 seconds"},
+                    "deadline": {"$fromNow": "1 hour"},
+                    "payload": payload,
+                    "scopes": scopes,
+                    "metadata": {
+                        "name": hookId,
+                        "description": description,
+                        "owner": worker_pool.get("owner", "nobody@mozilla.com"),
+                        "source": "https://github.com/taskcluster/community-tc-config",
+                    },
+                },
+                triggerSchema={},
+            ),
+            Grants.Item(
+                grant=scopes
+                + [
+                    "queue:scheduler-id:-",
+                    "queue:create-task:lowest:proj-{}/{}".format(
+                        project.name, workerType
+                    ),
+                ],
+                to="hook-id:project-{}/{}".format(project.name, hookId),
+            ),
+        )
+
+    hooks = []
+    for i, window in enumerate(warm.get("windows", [])):
+        unknown = set(window) - {"start", "end", "minCapacity"}
+        if unknown:
+            raise ValueError(f"unknown warmCapacity window options {sorted(unknown)}")
+        prefix = "warm-capacity-{}-{}".format(name.replace("/", "-"), i)
+        hooks.append(hook(prefix + "-start", window["start"], window["minCapacity"]))
+        hooks.append(hook(prefix + "-end", window["end"], baseCapacity))
+    return hooks
+
+
+def shard_worker_pool(worker_pool, secret, role, shard):
+    """
+    Split a generated pool into one pool per region, for pools with `shard:
+    by-region`, returning ([WorkerPool], [Secret], [Role]).  The shards are
+    named by suffixing the region to the pool's name.
+
+    Each shard gets the launch configs in its region, and a share of the
+    pool's minCapacity and maxCapacity (but at least 1) by the total
+    initialWeight of those launch configs.  The shards have the same secret,
+    and roles assuming the pool's role.  The role
+    `worker-pool-shards:<workerPoolId>` allows creating tasks in any shard.
+    """
+    if shard != "by-region":
+        raise ValueError(f"unknown shard option {shard!r}")
+    workerPoolId = worker_pool.workerPoolId
+    by_region = defaultdict(list)
+    for lc in worker_pool.config.get("launchConfigs", []):
+        region = launch_config_region(worker_pool.providerId, lc)
+        if region is None:
+            raise ValueError(f"{workerPoolId} cannot be sharded by region")
+        by_region[region].append(lc)
+    if not by_region:
+        raise ValueError(f"{workerPoolId} has no launch configs to shard")
+
+    regions = sorted(by_region)
+    weights = [
+        sum(lc["workerManager"].get("initialWeight", 1) for lc in by_region[region])
+        for region in regions
+    ]
+    minCapacities = split_capacity(worker_pool.config["minCapacity"], weights)
+    maxCapacities = split_capacity(worker_pool.config["maxCapacity"], weights)
+
+    pools, secrets, roles = [], [], []
+    if role:
+        roles.append(role)
+    for region, minCapacity, maxCapacity in zip(regions, minCapacities, maxCapacities):
+        shardId = f"{workerPoolId}-{region}"
+        config = dict(
+            worker_pool.config,
+            minCapacity=minCapacity,
+            maxCapacity=max(maxCapacity, minCapacity, 1),
+            launchConfigs=by_region[region],
+        )
+        pools.append(
+            attr.evolve(
+                worker_pool,
+                workerPoolId=shardId,
+                description=f"{worker_pool.description} ({region})",
+                config=config,
+            )
+        )
+        if secret:
+            secrets.append(attr.evolve(secret, name=f"worker-pool:{shardId}"))
+        if role:
+            roles.append(
+                Role(
+                    roleId=f"worker-pool:{shardId}",
+                    description=f"Scopes for the {region} shard of {workerPoolId}.",
+                    scopes=[f"assume:{role.roleId}"],
+                )
+            )
+    roles.append(
+        Role(
+            roleId=f"worker-pool-shards:{workerPoolId}",
+            description=f"Create tasks in any shard of {workerPoolId}.",
+            scopes=[f"queue:create-task:highest:{pool.workerPoolId}" for pool in pools],
+        )
+    )
+    return pools, secrets, roles
+
+
+def sharded_from(worker_pool):
+    """
+    Return the workerPoolId that a WorkerPool made by shard_worker_pool was
+    split from, going by its name and region, or None if its name does not
+    end with its region.  Pools that were not sharded may also end with their
+    region, so callers should check that the returned pool has `shard`.
+    """
+    launchConfigs = worker_pool.config.get("launchConfigs", [])
+    if not launchConfigs:
+        return None
+    region = launch_config_region(worker_pool.providerId, launchConfigs[0])
+    suffix = f"-{region}"
+    if region is None or not worker_pool.workerPoolId.endswith(suffix):
+        return None
+    return worker_pool.workerPoolId[: -len(suffix)]
+
+
+async def update_resources(resources, secret_values, grant_index=None):
+    """
+    Add the resources for all projects.  Project grants are added to
+    grant_index, if given, to be emitted along with other grants; otherwise
+    they are emitted here.
+    """
     projects = await Projects.load(loader)
+    emit_grants = grant_index is None
+    if emit_grants:
+        grant_index = GrantIndex()
+
+    # find any unknown image sets in a single pass, before generating anything
+    await check_image_sets(
+        {
+            "proj-{}/{}".format(project.name, name): worker_pool
+            for project in projects.values()
+            for name, worker_pool in project.workerPools.items()
+        }
+    )
+
+    # worker pools are added once all are built, so that cloud quotas can be
+    # divided among them
+    worker_pools = []
+    # hook schedules are in UTC
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
 
     for project in projects.values():
         for roleId in project.adminRoles:
@@ -107,25 +438,54 @@ async def update_resources(resources, secret_values):
                 )
             )
         if project.workerPools:
-            for name, worker_pool in project.workerPools.items():
+            for name, worker_pool_cfg in project.workerPools.items():
                 worker_pool_id = "proj-{}/{}".format(project.name, name)
-                worker_pool["description"] = "Workers for " + project.name
+                worker_pool_cfg["description"] = "Workers for " + project.name
+                build_cfg = worker_pool_cfg
+                if "warmCapacity" in worker_pool_cfg:
+                    build_cfg = dict(
+                        worker_pool_cfg,
+                        minCapacity=warm_min_capacity(worker_pool_cfg, now),
+                    )
                 worker_pool, secret, role = await build_worker_pool(
-                    worker_pool_id, worker_pool, secret_values
+                    worker_pool_id, build_cfg, secret_values
                 )
+                if "shard" in worker_pool_cfg:
+                    if "warmCapacity" in worker_pool_cfg:
+                        raise ValueError(
+                            f"{worker_pool_id} cannot have both shard and warmCapacity"
+                        )
+                    pools, secrets, roles = shard_worker_pool(
+                        worker_pool, secret, role, worker_pool_cfg["shard"]
+                    )
+                else:
+                    pools = [worker_pool]
+                    secrets = [secret] if secret else []
+                    roles = [role] if role else []
                 if project.externallyManaged.manage_individual_resources():
-                    resources.manage("WorkerPool={}$".format(worker_pool_id))
-                    if role:
+                    for pool in pools:
+                        resources.manage("WorkerPool={}$".format(pool.workerPoolId))
+                    for role in roles:
                         resources.manage("Role=" + re.escape(role.roleId) + "$")
-                    if secret:
-                        resources.manage(
-                            "Secret=worker-pool:{}$".format(worker_pool_id)
-                        )
-                resources.add(worker_pool)
-                if role:
+                    for secret in secrets:
+                        resources.manage("Secret=" + re.escape(secret.name) + "$")
+                worker_pools.extend(pools)
+                for role in roles:
                     resources.add(role)
-                if secret:
+                for secret in secrets:
                     resources.add(secret)
+                if "warmCapacity" in worker_pool_cfg:
+                    for hook, grant in await warm_capacity_hooks(
+                        project, name, worker_pool_cfg, worker_pool.providerId
+                    ):
+                        if project.externallyManaged.manage_individual_resources():
+                            resources.manage(
+                                "Hook={}/{}$".format(hook.hookGroupId, hook.hookId)
+                            )
+                            for roleId in grant.to:
+                                resources.manage("Role=" + re.escape(roleId) + "$")
+                        resources.add(hook)
+                        grant_index.add(grant)
         if project.clients:
             for name, info in project.clients.items():
                 clientId = "project/{}/{}".format(project.name, name)
@@ -170,7 +530,18 @@ async def update_resources(resources, secret_values):
             if project.externallyManaged.manage_individual_resources():
                 for role in grant.to:
                     resources.manage("Role=" + re.escape(role) + "$")
-            grant.update_resources(resources)
+            grant_index.add(grant)
+
+    # launch configs repeat the same worker config, disks, scheduling and so
+    # on, so share equal subtrees between all of the pools' configs
+    intern_table = InternTable()
+    for worker_pool in apply_quotas(worker_pools):
+        resources.add(
+            attr.evolve(worker_pool, config=intern_table.intern(worker_pool.config))
+        )
+
+    if emit_grants:
+        grant_index.update_resources(resources)
 
 
 async def get_externally_managed_resource_patterns():
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import copy
+import fnmatch
+import math
+import os
+from collections import defaultdict
+from functools import lru_cache
+
+import attr
+import yaml
+
+from .workers import (
+    config_path,
+    launch_config_placement,
+    launch_config_region,
+    machine_shapes,
+)
+
+
+@attr.s(frozen=True)
+class Quota:
+    """A vCPU quota shared by the launch configs of all worker pools"""
+
+    cloud = attr.ib(type=str)
+    region = attr.ib(type=str)
+    vcpus = attr.ib(type=int)
+    machineTypes = attr.ib(type=tuple, converter=tuple, default=("*",))
+    spot = attr.ib(type=bool, default=True)
+
+    @property
+    def name(self):
+        return "{} {} {}{}".format(
+            self.cloud,
+            self.region,
+            ",".join(self.machineTypes),
+            "" if self.spot else " (on-demand)",
+        )
+
+    def matches(self, cloud, region, machineType, spot):
+        return (
+            cloud == self.cloud
+            and region == self.region
+            and spot == self.spot
+            and any(fnmatch.fnmatchcase(machineType, p) for p in self.machineTypes)
+        )
+
+
+@lru_cache(maxsize=2)
+def quotas():
+    """
+    Return the list of Quotas in config/cloud-quotas.yml, cached in memory.
+    """
+    quotas_file = os.path.join(config_path(), "cloud-quotas.yml")
+    with open(quotas_file, "r") as the_file:
+        entries = yaml.safe_load(the_file) or []
+    result = []
+    for entry in entries:
+        if entry.get("cloud") not in ("gcp", "aws", "azure"):
+            raise ValueError("unknown cloud in cloud quota: {}".format(entry))
+        result.append(Quota(**entry))
+    return result
+
+
+def launch_config_is_spot(providerId, launchConfig):
+    """Return True if a generated launch config requests spot instances"""
+    if providerId == "community-tc-workers-google":
+        return launchConfig["scheduling"].get("provisioningModel") == "SPOT"
+    if providerId == "community-tc-workers-aws":
+        market = launchConfig["launchConfig"].get("InstanceMarketOptions", {})
+        return market.get("MarketType") == "spot"
+    if "armDeployment" in launchConfig:
+        parameters = launchConfig["armDeployment"]["parameters"]
+        return parameters.get("priority", {}).get("value") != "Regular"
+    return launchConfig.get("priority") == "spot"
+
+
+def quota_members(workerPool):
+    """
+    Return {Quota: [(launch config index, vCPUs per instance)]} for the
+    launch configs of a WorkerPool resource.
+    """
+    members = defaultdict(list)
+    for i, lc in enumerate(workerPool.config.get("launchConfigs", [])):
+        placement = launch_config_placement(workerPool.providerId, lc)
+        if not placement:
+            continue
+        cloud, _, machineType = placement
+        region = launch_config_region(workerPool.providerId, lc)
+        spot = launch_config_is_spot(workerPool.providerId, lc)
+        for quota in quotas():
+            if quota.matches(cloud, region, machineType, spot):
+                vcpus = machine_shapes(cloud)[machineType]["vcpus"]
+                members[quota].append((i, vcpus))
+    return members
+
+
+def pool_vcpus(workerPool, members):
+    """
+    Return the most vCPUs a pool can run in the given launch configs, each
+    given as (launch config index, vCPUs per instance), allowing for the
+    pool's maxCapacity and each launch config's maxCapacity.
+    """
+    capacity = workerPool.config["maxCapacity"]
+    launchConfigs = workerPool.config["launchConfigs"]
+    options = []
+    for i, vcpus in members:
+        wm = launchConfigs[i]["workerManager"]
+        vcpusPerCapacity = vcpus / wm.get("capacityPerInstance", 1)
+        options.append((vcpusPerCapacity, wm.get("maxCapacity", capacity)))
+    # fill the pool's capacity from the launch configs with the most vCPUs
+    # per unit of capacity first
+    total = 0
+    for vcpusPerCapacity, lcCapacity in sorted(options, reverse=True):
+        used = min(lcCapacity, capacity)
+        total += used * vcpusPerCapacity
+        capacity -= used
+        if capacity <= 0:
+            break
+    return math.ceil(total)
+
+
+def fair_shares(demands, supply):
+    """
+    Divide supply among {key: demand} by max-min fairness: keys demanding less
+    than an equal share get their demand, and the rest share what is left
+    equally.  Return {key: share}.
+    """
+    shares = {}
+    remaining = sorted(demands.items(), key=lambda kv: kv[1])
+    while remaining:
+        equal = supply / len(remaining)
+        key, demand = remaining[0]
+        if demand > equal:
+            for key, _ in remaining:
+                shares[key] = equal
+            break
+        shares[key] = demand
+        supply -= demand
+        remaining.pop(0)
+    return shares
+
+
+def allocate_instances(share, vcpus):
+    """
+    Divide a share of vCPUs among launch configs, given the vCPUs of an
+    instance of each, as a list of whole numbers of instances using at most
+    the share.  Each launch config is due an equal part of the share; it gets
+    the whole instances of that part, and what is left of the share goes, an
+    instance at a time while one fits, to launch configs with no instances
+    yet and then to those with the largest remainders.
+    """
+    due = [share / len(vcpus) / v for v in vcpus]
+    instances = [math.floor(d) for d in due]
+    left = share - sum(n * v for n, v in zip(instances, vcpus))
+    while True:
+        fits = [i for i, v in enumerate(vcpus) if v <= left]
+        if not fits:
+            return instances
+        i = max(fits, key=lambda i: (instances[i] == 0, due[i] - instances[i], -i))
+        instances[i] += 1
+        left -= vcpus[i]
+
+
+def apply_quotas(workerPools):
+    """
+    Given a list of WorkerPool resources, return a list of the same pools with
+    per-launch-config maxCapacity set so that, for each quota in
+    config/cloud-quotas.yml, all of the pools together cannot run more vCPUs
+    than the quota.
+
+    When the pools could oversubscribe a quota, its vCPUs are divided among
+    them by max-min fairness, and each pool's share is divided among its
+    launch configs in the quota as whole instances by allocate_instances.  A
+    smaller maxCapacity already set on a launch config is kept.
+    """
+    members = {wp.workerPoolId: quota_members(wp) for wp in workerPools}
+    pools = {wp.workerPoolId: wp for wp in workerPools}
+    caps = defaultdict(dict)
+    for quota in quotas():
+        demands = {
+            workerPoolId: pool_vcpus(pools[workerPoolId], m[quota])
+            for workerPoolId, m in members.items()
+            if quota in m
+        }
+        if sum(demands.values()) <= quota.vcpus:
+            continue
+        for workerPoolId, share in fair_shares(demands, quota.vcpus).items():
+            inQuota = members[workerPoolId][quota]
+            launchConfigs = pools[workerPoolId].config["launchConfigs"]
+            allocation = allocate_instances(share, [vcpus for _, vcpus in inQuota])
+            for (i, _), instances in zip(inQuota, allocation):
+                cpi = launchConfigs[i]["workerManager"].get("capacityPerInstance", 1)
+                cap = instances * cpi
+                caps[workerPoolId][i] = min(caps[workerPoolId].get(i, cap), cap)
+
+    result = []
+    for wp in workerPools:
+        if wp.workerPoolId not in caps:
+            result.append(wp)
+            continue
+        config = copy.deepcopy(wp.config)
+        for i, cap in caps[wp.workerPoolId].items():
+            wm = config["launchConfigs"][i]["workerManager"]
+            wm["maxCapacity"] = min(wm.get("maxCapacity", cap), cap)
+        result.append(attr.evolve(wp, config=config))
+    return result
+
+
+def quota_usage(workerPools):
+    """
+    Return a list of (Quota, {workerPoolId: vCPUs}) giving, for each quota,
+    the most vCPUs each pool can run in it.
+    """
+    usage = [(quota, {}) for quota in quotas()]
+    for wp in workerPools:
+        members = quota_members(wp)
+        for quota, pools in usage:
+            if quota in members:
+                pools[wp.workerPoolId] = pool_vcpus(wp, members[quota])
+    return usage
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import bisect
+from collections import defaultdict
+
+from tcadmin.resources import Role, WorkerPool
+
+from .workers import launch_config_placement, launch_config_region
+
+# the attributes by which worker pools are indexed
+POOL_KEYS = [
+    "imageset",
+    "image",
+    "machineType",
+    "region",
+    "zone",
+    "provider",
+    "implementation",
+]
+
+
+def launch_config_image(providerId, launchConfig):
+    """
+    Return the image (GCP image, AMI or Azure image ID) of a generated launch
+    config, or None if it is not known.
+    """
+    if providerId == "community-tc-workers-google":
+        return launchConfig["disks"][0]["initializeParams"]["sourceImage"]
+    if providerId == "community-tc-workers-aws":
+        return launchConfig["launchConfig"]["ImageId"]
+    if providerId == "community-tc-workers-azure":
+        if "armDeployment" in launchConfig:
+            parameters = launchConfig["armDeployment"]["parameters"]
+            return parameters.get("imageId", {}).get("value")
+        return launchConfig["storageProfile"]["imageReference"]["id"]
+    return None
+
+
+def image_set_images(image_set):
+    """
+    Return the set of images (GCP image, AMIs and Azure image IDs) of an image
+    set, as launch_config_image returns them.
+    """
+    images = {image_set.gcp_image}
+    images.update(image_set.aws_image_ids.values())
+    images.update(image_set.azure_image_ids.values())
+    images.discard(None)
+    return images
+
+
+class ResourceIndex:
+    """
+    An in-memory inverted index over generated resources, answering questions
+    like "which pools use machine type n2-standard-4?" or "which roles have
+    scopes beginning with queue:create-task:?".
+
+    Worker pools are indexed per launch config, so that a query combining
+    several attributes (such as an image and a zone) matches only pools with
+    a launch config having all of them.  Pool-wide attributes (provider and
+    worker implementation) apply to all of a pool's launch configs, as does
+    the image set of a pool with only one; a pool with several (one per
+    architecture) has each launch config indexed under the image set whose
+    image it launches.  Role scopes are kept sorted, so that prefix queries are a binary
+    search.
+    """
+
+    def __init__(self):
+        # key -> value -> set of (workerPoolId, launch config index); pools
+        # without launch configs have the single index None
+        self._postings = {key: defaultdict(set) for key in POOL_KEYS}
+        # workerPoolId -> number of launch configs
+        self.pools = {}
+        # sorted list of (scope, roleId)
+        self._scopes = []
+
+    @classmethod
+    def from_resources(cls, resources, pool_image_sets={}, image_sets={}):
+        """
+        Construct an instance from a Resources instance.  The image sets of
+        each pool are given by pool_image_sets, as {workerPoolId: [image set
+        name, ..]}, and are found in image_sets, as {name: ImageSets.Item}.
+        """
+        index = cls()
+        scopes = []
+        for resource in resources:
+            if isinstance(resource, WorkerPool):
+                index.add_pool(
+                    resource,
+                    [
+                        image_sets[name]
+                        for name in pool_image_sets.get(resource.workerPoolId, [])
+                        if name in image_sets
+                    ],
+                )
+            elif isinstance(resource, Role):
+                scopes.extend((scope, resource.roleId) for scope in resource.scopes)
+        index._scopes = sorted(scopes)
+        return index
+
+    def _add(self, key, value, posting):
+        if value is None:
+            return
+        self._postings[key][value].add(posting)
+        # images are also found by their name, without the project or path
+        if key == "image" and "/" in value:
+            self._postings[key][value.split("/")[-1]].add(posting)
+
+    def add_pool(self, workerPool, image_sets=[]):
+        """
+        Index a WorkerPool resource, given the ImageSets.Item instances of its
+        image sets.
+        """
+        workerPoolId = workerPool.workerPoolId
+        providerId = workerPool.providerId
+        launchConfigs = workerPool.config.get("launchConfigs", [])
+        self.pools[workerPoolId] = len(launchConfigs)
+        postings = [(workerPoolId, i) for i in range(len(launchConfigs))] or [
+            (workerPoolId, None)
+        ]
+        implementation = image_sets[0].workerImplementation if image_sets else None
+        for posting in postings:
+            if len(image_sets) == 1:
+                self._add("imageset", image_sets[0].name, posting)
+            self._add("provider", providerId, posting)
+            self._add("implementation", implementation, posting)
+        # the image set of each launch config, by the image it launches
+        images = {
+            image: image_set.name
+            for image_set in image_sets
+            for image in image_set_images(image_set)
+        }
+        for posting, launchConfig in zip(postings, launchConfigs):
+            placement = launch_config_placement(providerId, launchConfig)
+            if placement:
+                _, zone, machineType = placement
+                self._add("zone", zone, posting)
+                self._add("machineType", machineType, posting)
+            self._add("region", launch_config_region(providerId, launchConfig), posting)
+            image = launch_config_image(providerId, launchConfig)
+            self._add("image", image, posting)
+            if len(image_sets) > 1:
+                self._add("imageset", images.get(image), posting)
+
+    def values(self, key):
+        """Return the sorted indexed values of the given attribute"""
+        return sorted(self._postings[key])
+
+    def pools_matching(self, terms):
+        """
+        Given a dict of {key: value}, return a sorted list of (workerPoolId,
+        matching launch configs) for the pools with launch configs matching all
+        of the terms.  Pools without launch configs (static pools) report 0
+        matching launch configs.
+        """
+        unknown = set(terms) - set(POOL_KEYS)
+        if unknown:
+            raise ValueError(f"unknown pool attributes {sorted(unknown)}")
+        if not terms:
+            return sorted(self.pools.items())
+        postings = None
+        # intersect the smallest sets first
+        for key, value in sorted(
+            terms.items(), key=lambda kv: len(self._postings[kv[0]].get(kv[1], ()))
+        ):
+            matching = self._postings[key].get(value, set())
+            postings = matching if postings is None else postings & matching
+            if not postings:
+                return []
+        counts = defaultdict(int)
+        for workerPoolId, i in postings:
+            counts[workerPoolId] += i is not None
+        return sorted(counts.items())
+
+    def roles_with_scope_prefix(self, prefix):
+        """
+        Return a sorted list of (roleId, [scopes]) for the roles with scopes
+        beginning with the given prefix.
+        """
+        roles = defaultdict(list)
+        i = bisect.bisect_left(self._scopes, (prefix,))
+        while i < len(self._scopes) and self._scopes[i][0].startswith(prefix):
+            scope, roleId = self._scopes[i]
+            roles[roleId].append(scope)
+            i += 1
+        return sorted(roles.items())
@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import inspect
+import json
+import os
+from functools import lru_cache
+
+import jsonschema
+
+from .loader import loader
+from .workers import CLOUD_FUNCS, TUNED_LIFECYCLE_KEYS
+
+STRING_LIST = {"type": "array", "items": {"type": "string"}}
+STRING_OR_LIST = {"anyOf": [{"type": "string"}, STRING_LIST]}
+STRING_MAP = {"type": "object", "additionalProperties": {"type": "string"}}
+CAPACITY = {"type": "integer", "minimum": 0}
+
+GRANT = {
+    "type": "object",
+    "required": ["grant", "to"],
+    "properties": {"grant": STRING_OR_LIST, "to": STRING_OR_LIST},
+    "additionalProperties": False,
+}
+
+# worker pool options handled by build_worker_pool or projects.update_resources,
+# rather than by the cloud functions' named arguments
+WORKER_POOL_PROPERTIES = {
+    "owner": {"type": "string"},
+    "emailOnError": {"type": "boolean"},
+    "description": {"type": "string"},
+    "imageset": {"type": "string"},
+    "cloud": {"type": "string"},
+    "minCapacity": CAPACITY,
+    "maxCapacity": CAPACITY,
+    "capacityPer": {
+        "type": "object",
+        "propertyNames": {"enum": ["vcpus", "memoryGb", "localDiskGb"]},
+        "additionalProperties": {"type": "number", "exclusiveMinimum": 0},
+    },
+    "workerConfig": {"type": "object"},
+    "workerManager": {"type": "object"},
+    "workerManagerConfig": {
+        "type": "object",
+        "propertyNames": {"enum": ["initialWeight", "maxCapacity"]},
+    },
+    "launchConfig": {"type": "object"},
+    "lifecycle": {"type": "object"},
+    "onDemandFallback": {
+        "type": "object",
+        "required": ["maxCapacity"],
+        "properties": {
+            "initialWeight": {
+                "type": "number",
+                "exclusiveMinimum": 0,
+                "exclusiveMaximum": 1,
+            },
+            "maxCapacity": CAPACITY,
+        },
+        "additionalProperties": False,
+    },
+    "warmCapacity": {
+        "type": "object",
+        "required": ["windows"],
+        "properties": {
+            "workerType": {"type": "string"},
+            "image": {"type": "string"},
+            "windows": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "required": ["start", "end", "minCapacity"],
+                    "properties": {
+                        "start": STRING_OR_LIST,
+                        "end": STRING_OR_LIST,
+                        "minCapacity": CAPACITY,
+                    },
+                    "additionalProperties": False,
+                },
+            },
+        },
+        "additionalProperties": False,
+    },
+    "shard": {"enum": ["by-region"]},
+    "architectures": {
+        "type": "object",
+        "propertyNames": {"enum": ["amd64", "arm64"]},
+        "additionalProperties": {
+            "anyOf": [
+                {"type": "string"},
+                {
+                    # other options override the pool's for the architecture
+                    "type": "object",
+                    "required": ["imageset"],
+                    "properties": {
+                        "imageset": {"type": "string"},
+                        "initialWeight": {"type": "number", "minimum": 0, "maximum": 1},
+                    },
+                },
+            ]
+        },
+    },
+}
+
+
+def cloud_options(fn):
+    """Return the names of the pool options taken by a cloud function"""
+    return [
+        name
+        for name, param in inspect.signature(fn).parameters.items()
+        if param.kind == param.KEYWORD_ONLY and name != "image_set"
+    ]
+
+
+def worker_pool_schema():
+    """
+    Return the schema of a worker pool.  The options allowed depend on the
+    pool's cloud: those handled for every pool, and the named arguments of the
+    cloud function, so that a misspelled option is an error rather than being
+    ignored.
+    """
+    return {
+        "type": "object",
+        "required": ["cloud"],
+        # a pool has either an imageset or architectures, each with an imageset
+        "if": {"not": {"required": ["architectures"]}},
+        "then": {"required": ["imageset"]},
+        "dependencies": {"architectures": {"properties": {"imageset": False}}},
+        "properties": dict(WORKER_POOL_PROPERTIES, cloud={"enum": sorted(CLOUD_FUNCS)}),
+        "allOf": [
+            {
+                "if": {"properties": {"cloud": {"const": cloud}}},
+                "then": {
+                    "properties": {
+                        option: {}
+                        for option in set(WORKER_POOL_PROPERTIES)
+                        | set(cloud_options(fn))
+                    },
+                    "additionalProperties": False,
+                },
+            }
+            for cloud, fn in sorted(CLOUD_FUNCS.items())
+        ],
+    }
+
+
+def projects_schema():
+    return {
+        "type": "object",
+        "additionalProperties": {
+            "type": "object",
+            "properties": {
+                "adminRoles": STRING_LIST,
+                "repos": STRING_LIST,
+                "externallyManaged": {
+                    "anyOf": [{"type": ["boolean", "null"]}, STRING_OR_LIST]
+                },
+                "workerPools": {
+                    "type": "object",
+                    "additionalProperties": worker_pool_schema(),
+                },
+                "clients": {
+                    "type": "object",
+                    "additionalProperties": {
+                        "type": "object",
+                        "required": ["scopes"],
+                        "properties": {
+                            "scopes": STRING_LIST,
+                            "description": {"type": "string"},
+                        },
+                        "additionalProperties": False,
+                    },
+                },
+                "grants": {"type": "array", "items": GRANT},
+                "secrets": {
+                    "type": "object",
+                    "additionalProperties": {
+                        "anyOf": [{"const": True}, {"type": "object"}]
+                    },
+                },
+                "hooks": {
+                    "type": "object",
+                    "additionalProperties": {
+                        "type": "object",
+                        "required": ["owner", "task"],
+                        "properties": {
+                            "name": {"type": "string"},
+                            "description": {"type": "string"},
+                            "owner": {"type": "string"},
+                            "emailOnError": {"type": "boolean"},
+                            "schedule": STRING_LIST,
+                            "bindings": {
+                                "type": "array",
+                                "items": {
+                                    "type": "object",
+                                    "required": ["exchange", "routingKeyPattern"],
+                                    "properties": {
+                                        "exchange": {"type": "string"},
+                                        "routingKeyPattern": {"type": "string"},
+                                    },
+                                    "additionalProperties": False,
+                                },
+                            },
+                            "task": {"type": "object"},
+                            "triggerSchema": {"type": "object"},
+                        },
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "additionalProperties": False,
+        },
+    }
+
+
+def imagesets_schema():
+    return {
+        "type": "object",
+        "additionalProperties": {
+            "type": "object",
+            "required": ["workerImplementation"],
+            "properties": {
+                "workerImplementation": {"enum": ["docker-worker", "generic-worker"]},
+                "aws": {
+                    "type": "object",
+                    "properties": {"amis": STRING_MAP},
+                    "additionalProperties": False,
+                },
+                "gcp": {
+                    "type": "object",
+                    "properties": {
+                        "image": {"type": "string"},
+                        "localSsdMount": {"type": "boolean"},
+                    },
+                    "additionalProperties": False,
+                },
+                "azure": {
+                    "type": "object",
+                    "properties": {
+                        "images": STRING_MAP,
+                        "armDeployment": {"type": "object"},
+                        # may be keyed-by location or vmSize
+                        "armDeploymentResourceGroup": {
+                            "anyOf": [{"type": "string"}, {"type": "object"}]
+                        },
+                    },
+                    "additionalProperties": False,
+                },
+                "workerConfig": {"type": "object"},
+                "workerManager": {"type": "object"},
+                "prefetch": {
+                    "type": "object",
+                    "properties": {
+                        "dockerImages": STRING_LIST,
+                        "artifacts": STRING_MAP,
+                        "gitMirrors": STRING_MAP,
+                    },
+                    "additionalProperties": False,
+                },
+            },
+            "additionalProperties": False,
+        },
+    }
+
+
+def grants_schema():
+    return {"type": "array", "items": GRANT}
+
+
+def zone_quarantine_schema():
+    return {
+        "type": ["array", "null"],
+        "items": {
+            "type": "object",
+            # expires is a YAML date, which is checked by zone_quarantine
+            "required": ["cloud", "zone", "expires"],
+            "properties": {
+                "cloud": {"enum": ["gcp", "aws", "azure"]},
+                "zone": {"type": "string"},
+                "type": {"type": "string"},
+                "expires": {},
+                "reason": {"type": "string"},
+            },
+            "additionalProperties": False,
+        },
+    }
+
+
+def cloud_quotas_schema():
+    return {
+        "type": ["array", "null"],
+        "items": {
+            "type": "object",
+            "required": ["cloud", "region", "vcpus"],
+            "properties": {
+                "cloud": {"enum": ["gcp", "aws", "azure"]},
+                "region": {"type": "string"},
+                "machineTypes": STRING_LIST,
+                "spot": {"type": "boolean"},
+                "vcpus": CAPACITY,
+            },
+            "additionalProperties": False,
+        },
+    }
+
+
+def pool_tuning_schema():
+    return {
+        "type": "object",
+        "additionalProperties": {
+            "type": "object",
+            "propertyNames": {"enum": ["afterIdleSeconds"] + TUNED_LIFECYCLE_KEYS},
+            "additionalProperties": {"type": "integer", "minimum": 0},
+        },
+    }
+
+
+def spot_prices_schema():
+    return {
+        "type": "object",
+        "additionalProperties": {
+            "type": "object",
+            "additionalProperties": {
+                "type": "object",
+                "properties": {
+                    "prices": {
+                        "type": "object",
+                        "additionalProperties": {"type": "number", "minimum": 0},
+                    },
+                    "throughput": {"type": "number", "exclusiveMinimum": 0},
+                },
+                "additionalProperties": False,
+            },
+        },
+    }
+
+
+# config files, or directories of .yml files, and their schemas
+CONFIG_SCHEMAS = [
+    ("config/projects", projects_schema),
+    ("config/imagesets.yml", imagesets_schema),
+    ("config/grants.yml", grants_schema),
+    ("config/zone-quarantine.yml", zone_quarantine_schema),
+    ("config/cloud-quotas.yml", cloud_quotas_schema),
+    ("config/pool-tuning.json", pool_tuning_schema),
+    ("config/spot-prices.json", spot_prices_schema),
+]
+
+
+@lru_cache(maxsize=None)
+def validator(schema_fn):
+    """Return a validator for the given schema, built once per process"""
+    schema = schema_fn()
+    jsonschema.Draft7Validator.check_schema(schema)
+    return jsonschema.Draft7Validator(schema)
+
+
+def config_errors(filename, data, schema_fn):
+    """
+    Return a list of "file: path: message" strings for the errors in the data
+    loaded from a config file.
+    """
+    return [
+        "{}: {}: {}".format(
+            filename, ".".join(str(p) for p in e.absolute_path) or "(top)", e.message
+        )
+        for e in sorted(
+            validator(schema_fn).iter_errors(data),
+            key=lambda e: [str(p) for p in e.absolute_path],
+        )
+    ]
+
+
+async def check_config():
+    """
+    Check every config file against its schema, before anything is generated,
+    and raise an exception listing all of the errors in all of the files.
+    """
+    errors = []
+    for path, schema_fn in CONFIG_SCHEMAS:
+        if os.path.isdir(path):
+            filenames = [
+                os.path.join(path, f)
+                for f in sorted(os.listdir(path))
+                if f.endswith(".yml")
+            ]
+        else:
+            filenames = [path]
+        for filename in filenames:
+            if filename.endswith(".json"):
+                with open(filename) as f:
+                    data = json.load(f)
+            else:
+                data = await loader.load(filename, parse="yaml")
+            errors.extend(config_errors(filename, data, schema_fn))
+    if errors:
+        raise RuntimeError(
+            "Invalid configuration:\n" + "\n".join("  " + e for e in errors)
+        )
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import re
+
+from tcadmin.resources import Role
+from tcadmin.util.scopes import normalizeScopes
+
+# guard against parameterized roles that expand without bound
+MAX_EXPANDED_SCOPES = 10000
+
+_PARAM_RE = re.compile(r"<\.\.>")
+_PARAM_STAR_RE = re.compile(r"<\.\.>.*")
+
+
+def star_prefixes(scopes):
+    """
+    Return the set of prefixes of the star-suffixed scopes in `scopes`, for use
+    with `satisfied_by`.
+    """
+    return {s[:-1] for s in scopes if s.endswith("*")}
+
+
+def satisfied_by(scope, scopes, prefixes):
+    """
+    Return True if `scope` is satisfied by `scopes`, a set of scopes whose
+    star prefixes are `prefixes`: either the scope is present, or some scope
+    ending in `*` is a prefix of it.
+    """
+    return scope in scopes or any(scope[:i] in prefixes for i in range(len(scope) + 1))
+
+
+class _TrieNode:
+    __slots__ = ("children", "role", "star_role", "_subtree")
+
+    def __init__(self):
+        self.children = {}
+        # roleId exactly matching the path to this node
+        self.role = None
+        # roleId matching the path to this node, followed by `*`
+        self.star_role = None
+        # cached list of (roleId, is_star) for all roles at or below this node
+        self._subtree = None
+
+    def subtree(self):
+        if self._subtree is None:
+            roles = []
+            if self.role is not None:
+                roles.append((self.role, False))
+            if self.star_role is not None:
+                roles.append((self.star_role, True))
+            for child in self.children.values():
+                roles.extend(child.subtree())
+            self._subtree = roles
+        return self._subtree
+
+
+class ScopeResolver:
+    """
+    An in-memory scope expander, following the same rules as the Taskcluster
+    Auth service: `assume:<roleId>` grants the role's scopes, roles ending in
+    `*` match any scope beginning with their prefix (substituting the remainder
+    for `<..>` in their scopes), and a scope ending in `*` assumes every role
+    it satisfies.
+
+    Roles are indexed in a trie by roleId, and the expansion of each scope is
+    memoized, so repeated and bulk queries are cheap.
+    """
+
+    def __init__(self, roles):
+        "Instantiate given roles of the form {roleId: [scopes]}"
+        self.roles = {roleId: tuple(scopes) for roleId, scopes in roles.items()}
+        self._root = _TrieNode()
+        for roleId in self.roles:
+            if roleId.endswith("*"):
+                self._node(roleId[:-1]).star_role = roleId
+            else:
+                self._node(roleId).role = roleId
+        # scope -> scopes granted directly by roles it assumes
+        self._direct = {}
+        # scope -> frozenset of all scopes it expands to (including itself)
+        self._expanded = {}
+
+    @classmethod
+    def from_resources(cls, resources):
+        """Construct an instance from a Resources instance, ignoring any non-Role
+        resources"""
+        return cls(
+            {
+                resource.roleId: resource.scopes
+                for resource in resources
+                if isinstance(resource, Role)
+            }
+        )
+
+    def _node(self, path):
+        node = self._root
+        for c in path:
+            node = node.children.setdefault(c, _TrieNode())
+        return node
+
+    def _star_scopes(self, roleId, param):
+        # `*` in the parameter consumes everything after `<..>`
+        if param.endswith("*"):
+            return [_PARAM_STAR_RE.sub(param, s) for s in self.roles[roleId]]
+        return [_PARAM_RE.sub(param, s) for s in self.roles[roleId]]
+
+    def _directly_granted(self, scope):
+        """Return the scopes granted directly by the roles `scope` assumes"""
+        if scope in self._direct:
+            return self._direct[scope]
+
+        granted = set()
+        if scope.startswith("assume:"):
+            rest = scope[len("assume:") :]
+            node = self._root
+            # roles ending in `*` whose prefix is a prefix of this roleId
+            for i, c in enumerate(rest):
+                if node.star_role is not None:
+                    granted.update(self._star_scopes(node.star_role, rest[i:]))
+                node = node.children.get(c)
+                if node is None:
+                    break
+            else:
+                if node.star_role is not None:
+                    granted.update(self._star_scopes(node.star_role, ""))
+                if node.role is not None:
+                    granted.update(self.roles[node.role])
+        if scope.endswith("*") and (
+            scope.startswith("assume:") or "assume:".startswith(scope[:-1])
+        ):
+            # every role whose `assume:` scope this scope satisfies
+            node = self._root
+            for c in scope[len("assume:") : -1]:
+                node = node.children.get(c)
+                if node is None:
+                    break
+            else:
+                for roleId, is_star in node.subtree():
+                    if is_star:
+                        granted.update(self._star_scopes(roleId, "*"))
+                    else:
+                        granted.update(self.roles[roleId])
+
+        self._direct[scope] = granted = frozenset(granted)
+        return granted
+
+    def _expand_scope(self, scope):
+        if scope in self._expanded:
+            return self._expanded[scope]
+
+        expanded = set()
+        pending = [scope]
+        while pending:
+            s = pending.pop()
+            if s in expanded:
+                continue
+            if s in self._expanded:
+                expanded.update(self._expanded[s])
+                continue
+            expanded.add(s)
+            pending.extend(self._directly_granted(s))
+            if len(expanded) > MAX_EXPANDED_SCOPES:
+                raise RuntimeError(
+                    "maximum role expansion size reached expanding {}".format(scope)
+                )
+
+        self._expanded[scope] = expanded = frozenset(expanded)
+        return expanded
+
+    def expand_scopes(self, scopes):
+        """
+        Given a list of scopes, return the normalized list of scopes they expand
+        to, as the Auth service's `expandScopes` would.
+        """
+        expanded = set()
+        for scope in scopes:
+            expanded.update(self._expand_scope(scope))
+        return normalizeScopes(expanded)
+
+    def expand_many(self, queries):
+        """
+        Expand each of the given lists of scopes, returning a list of results in
+        the same order.
+        """
+        return [self.expand_scopes(scopes) for scopes in queries]
+
+    def satisfies(self, have, require):
+        """
+        Return True if the expansion of the scopes in `have` satisfies all of
+        the scopes in `require`.
+        """
+        expanded = set()
+        for scope in have:
+            expanded.update(self._expand_scope(scope))
+        prefixes = star_prefixes(expanded)
+        return all(satisfied_by(r, expanded, prefixes) for r in require)
+
+    def roles_satisfying(self, require, roleIds=None):
+        """
+        Return the sorted roleIds (by default, all known roles) whose expansion
+        satisfies all of the scopes in `require`.  This answers questions like
+        "who can create tasks in proj-fuzzing/ci?".
+        """
+        if roleIds is None:
+            roleIds = self.roles
+        return sorted(
+            roleId
+            for roleId in roleIds
+            if self.satisfies(["assume:" + roleId], require)
+        )
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import os
+
+import pytest
+from tcadmin.resources import WorkerPool
+
+from generate import offline_appconfig
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def repo_root(monkeypatch):
+    """
+    Run the test from the root of this repository, where the config files are
+    loaded from.
+    """
+    monkeypatch.chdir(ROOT)
+    return ROOT
+
+
+@pytest.fixture(autouse=True)
+def appconfig():
+    """
+    Make an AppConfig current, as tc-admin does, so that tests can construct
+    resources.
+    """
+    with offline_appconfig():
+        yield
+
+
+@pytest.fixture
+def gcp_pool():
+    """
+    Return a function making a generated GCP worker pool, given its
+    workerPoolId and a (zone, machine type, initialWeight) for each of its
+    spot launch configs.
+    """
+
+    def make(workerPoolId, launchConfigs, minCapacity=0, maxCapacity=10):
+        return WorkerPool(
+            workerPoolId=workerPoolId,
+            description="",
+            owner="nobody@mozilla.com",
+            emailOnError=False,
+            providerId="community-tc-workers-google",
+            config={
+                "minCapacity": minCapacity,
+                "maxCapacity": maxCapacity,
+                "launchConfigs": [
+                    {
+                        "region": zone.rsplit("-", 1)[0],
+                        "zone": zone,
+                        "machineType": f"zones/{zone}/machineTypes/{machineType}",
+                        "scheduling": {"provisioningModel": "SPOT"},
+                        "workerManager": {
+                            "capacityPerInstance": 1,
+                            "initialWeight": initialWeight,
+                        },
+                    }
+                    for zone, machineType, initialWeight in launchConfigs
+                ],
+            },
+        )
+
+    return make
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import pytest
+
+from generate import workers
+from generate.resource_index import ResourceIndex
+from generate.workers import (
+    build_worker_pool,
+    get_image_set,
+    machine_types_for_architecture,
+)
+
+N2 = "zones/{zone}/machineTypes/n2-standard-4"
+T2A = "zones/{zone}/machineTypes/t2a-standard-4"
+AMD64_IMAGESET = "generic-worker-ubuntu-24-04"
+ARM64_IMAGESET = "generic-worker-ubuntu-24-04-arm64"
+
+
+@pytest.fixture
+def spot_prices(monkeypatch):
+    """
+    Price n2-standard-4 at 100 vCPUs per dollar in every region, and
+    t2a-standard-4 at 200.
+    """
+    regions = workers.cloud_config("gcp")["regions"]
+    prices = {
+        "gcp": {
+            "n2-standard-4": {"prices": {region: 0.04 for region in regions}},
+            "t2a-standard-4": {"prices": {region: 0.02 for region in regions}},
+        }
+    }
+    monkeypatch.setattr(workers, "spot_prices", lambda: prices)
+
+
+def pool_config(**cfg):
+    return dict(
+        {
+            "owner": "nobody@mozilla.com",
+            "emailOnError": False,
+            "cloud": "gcp",
+            "maxCapacity": 10,
+            "machineTypes": {N2: 1, T2A: 1},
+            "architectures": {"amd64": AMD64_IMAGESET, "arm64": ARM64_IMAGESET},
+        },
+        **cfg,
+    )
+
+
+def launch_configs_by_machine_type(worker_pool):
+    """Return {machine type name: [launch configs]} for a generated pool"""
+    result = {}
+    for lc in worker_pool.config["launchConfigs"]:
+        result.setdefault(lc["machineType"].split("/")[-1], []).append(lc)
+    return result
+
+
+def test_machine_types_for_architecture():
+    assert machine_types_for_architecture("gcp", {N2: 1, T2A: 2}, "arm64") == {T2A: 2}
+    assert machine_types_for_architecture(
+        "aws", {"m5.large": 1, "m4.2xlarge": 2}, "amd64"
+    ) == {"m5.large": 1, "m4.2xlarge": 2}
+
+
+def test_machine_types_for_architecture_unknown():
+    with pytest.raises(ValueError):
+        machine_types_for_architecture(
+            "gcp", {"zones/{zone}/machineTypes/x": 1}, "amd64"
+        )
+
+
+@pytest.mark.asyncio
+async def test_architectures_use_matching_machine_types():
+    worker_pool, _, _ = await build_worker_pool(
+        "proj-test/multiarch", pool_config(), None
+    )
+    by_type = launch_configs_by_machine_type(worker_pool)
+    assert sorted(by_type) == ["n2-standard-4", "t2a-standard-4"]
+    amd64 = (await get_image_set(AMD64_IMAGESET)).gcp_image
+    arm64 = (await get_image_set(ARM64_IMAGESET)).gcp_image
+    for machineType, image in [("n2-standard-4", amd64), ("t2a-standard-4", arm64)]:
+        assert {
+            lc["disks"][0]["initializeParams"]["sourceImage"]
+            for lc in by_type[machineType]
+        } == {image}
+
+
+@pytest.mark.asyncio
+async def test_architecture_without_matching_machine_types():
+    cfg = pool_config(machineTypes={N2: 1})
+    with pytest.raises(RuntimeError) as excinfo:
+        await build_worker_pool("proj-test/multiarch", cfg, None)
+    assert "arm64" in str(excinfo.value.__cause__)
+
+
+@pytest.mark.asyncio
+async def test_architectures_price_performance_normalized_once(spot_prices):
+    cfg = pool_config(
+        architectures={
+            "amd64": AMD64_IMAGESET,
+            "arm64": {"imageset": ARM64_IMAGESET, "initialWeight": 0.25},
+        },
+        workerManagerConfig={"initialWeight": "price-performance"},
+    )
+    worker_pool, _, _ = await build_worker_pool("proj-test/multiarch", cfg, None)
+    weights = {
+        machineType: {lc["workerManager"]["initialWeight"] for lc in lcs}
+        for machineType, lcs in launch_configs_by_machine_type(worker_pool).items()
+    }
+    # t2a is twice the price/performance, but arm64 is weighted at a quarter
+    assert weights == {"n2-standard-4": {1}, "t2a-standard-4": {0.5}}
+
+
+@pytest.mark.asyncio
+async def test_architecture_initial_weight_above_one():
+    cfg = pool_config(
+        architectures={
+            "amd64": AMD64_IMAGESET,
+            "arm64": {"imageset": ARM64_IMAGESET, "initialWeight": 2},
+        },
+    )
+    with pytest.raises(RuntimeError) as excinfo:
+        await build_worker_pool("proj-test/multiarch", cfg, None)
+    assert "between 0 and 1" in str(excinfo.value.__cause__)
+
+
+@pytest.mark.asyncio
+async def test_resource_index_image_set_per_launch_config():
+    worker_pool, _, _ = await build_worker_pool(
+        "proj-test/multiarch", pool_config(), None
+    )
+    by_type = launch_configs_by_machine_type(worker_pool)
+    index = ResourceIndex.from_resources(
+        [worker_pool],
+        {"proj-test/multiarch": [AMD64_IMAGESET, ARM64_IMAGESET]},
+        await workers.get_image_sets(),
+    )
+    assert index.pools_matching({"imageset": ARM64_IMAGESET}) == [
+        ("proj-test/multiarch", len(by_type["t2a-standard-4"]))
+    ]
+    assert (
+        index.pools_matching(
+            {"imageset": AMD64_IMAGESET, "machineType": "t2a-standard-4"}
+        )
+        == []
+    )
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import pytest
+import pytest_asyncio
+
+from generate import generate_resources
+
+
+@pytest_asyncio.fixture
+async def resources(repo_root):
+    return await generate_resources()
+
+
+def worker_pool(resources, workerPoolId):
+    [pool] = [r for r in resources if r.id == "WorkerPool={}".format(workerPoolId)]
+    return pool
+
+
+@pytest.mark.asyncio
+async def test_generate_resources(resources):
+    assert worker_pool(resources, "proj-taskcluster/ci")
+
+
+@pytest.mark.asyncio
+async def test_on_demand_fallback_gcp(resources):
+    launchConfigs = worker_pool(resources, "proj-fuzzing/decision").config[
+        "launchConfigs"
+    ]
+    spot = [
+        lc for lc in launchConfigs if lc["scheduling"]["provisioningModel"] == "SPOT"
+    ]
+    standard = [
+        lc
+        for lc in launchConfigs
+        if lc["scheduling"]["provisioningModel"] == "STANDARD"
+    ]
+    # the on-demand tier has the pool's onDemandFallback.maxCapacity
+    assert standard
+    assert sum(lc["workerManager"]["maxCapacity"] for lc in standard) == 1
+    spot_weights = {
+        (lc["zone"], lc["machineType"]): lc["workerManager"].get("initialWeight", 1)
+        for lc in spot
+    }
+    for lc in standard:
+        weight = spot_weights[lc["zone"], lc["machineType"]]
+        assert lc["workerManager"]["initialWeight"] < weight
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+from generate.imagesets import build_prefetch_worker_config
+
+
+def test_prefetch_worker_config():
+    prefetch = {
+        "dockerImages": ["ubuntu:24.04"],
+        "gitMirrors": {"gecko-dev": "https://github.com/mozilla/gecko-dev"},
+    }
+    config = build_prefetch_worker_config("generic-worker", prefetch)
+    assert config["genericWorker"]["config"]["workerTypeMetadata"]["prefetch"] == {
+        "directory": "/var/cache/taskcluster-prefetch",
+        "dockerImages": ["ubuntu:24.04"],
+        "gitMirrors": {
+            "gecko-dev": "/var/cache/taskcluster-prefetch/gitMirrors/gecko-dev.git"
+        },
+    }
+
+
+def test_prefetch_worker_config_docker_worker():
+    prefetch = {"dockerImages": ["ubuntu:24.04"]}
+    assert build_prefetch_worker_config("docker-worker", prefetch) is None
+    assert build_prefetch_worker_config("generic-worker", {}) is None
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import datetime
+
+import pytest
+from tcadmin.resources import Role, Secret
+
+from generate.projects import (
+    cron_last_fired,
+    shard_worker_pool,
+    sharded_from,
+    warm_min_capacity,
+)
+
+TWO_REGIONS = [
+    ("us-central1-a", "n2-standard-4", 1),
+    ("us-west1-a", "n2-standard-4", 1),
+]
+
+
+def test_shard_worker_pool(gcp_pool):
+    pool = gcp_pool(
+        "proj-test/ci",
+        [
+            ("us-central1-a", "n2-standard-4", 1),
+            ("us-central1-b", "n2-standard-4", 1),
+            ("us-west1-a", "n2-standard-4", 0.5),
+        ],
+        minCapacity=1,
+        maxCapacity=10,
+    )
+    secret = Secret(name="worker-pool:proj-test/ci")
+    role = Role(roleId="worker-pool:proj-test/ci", description="", scopes=["s"])
+    pools, secrets, roles = shard_worker_pool(pool, secret, role, "by-region")
+
+    assert [p.workerPoolId for p in pools] == [
+        "proj-test/ci-us-central1",
+        "proj-test/ci-us-west1",
+    ]
+    # capacity is split by the launch configs' total initialWeight
+    assert [(p.config["minCapacity"], p.config["maxCapacity"]) for p in pools] == [
+        (1, 8),
+        (0, 2),
+    ]
+    assert [len(p.config["launchConfigs"]) for p in pools] == [2, 1]
+    assert [s.name for s in secrets] == [
+        "worker-pool:proj-test/ci-us-central1",
+        "worker-pool:proj-test/ci-us-west1",
+    ]
+    assert {r.roleId: r.scopes for r in roles} == {
+        "worker-pool:proj-test/ci": ("s",),
+        "worker-pool:proj-test/ci-us-central1": ("assume:worker-pool:proj-test/ci",),
+        "worker-pool:proj-test/ci-us-west1": ("assume:worker-pool:proj-test/ci",),
+        "worker-pool-shards:proj-test/ci": (
+            "queue:create-task:highest:proj-test/ci-us-central1",
+            "queue:create-task:highest:proj-test/ci-us-west1",
+        ),
+    }
+
+
+def test_shard_worker_pool_small_capacity(gcp_pool):
+    pool = gcp_pool("proj-test/ci", TWO_REGIONS, maxCapacity=1)
+    pools, _, _ = shard_worker_pool(pool, None, None, "by-region")
+    # every shard can run at least one worker
+    assert [p.config["maxCapacity"] for p in pools] == [1, 1]
+
+
+def test_sharded_from(gcp_pool):
+    pool = gcp_pool("proj-test/ci", TWO_REGIONS)
+    pools, _, _ = shard_worker_pool(pool, None, None, "by-region")
+    assert [sharded_from(p) for p in pools] == ["proj-test/ci", "proj-test/ci"]
+    assert sharded_from(pool) is None
+
+
+# a Monday
+MONDAY = datetime.datetime(2025, 1, 6, 12, 30)
+
+
+@pytest.mark.parametrize(
+    "schedule,fired",
+    [
+        ("0 0 13 * * 1-5", datetime.datetime(2025, 1, 3, 13, 0)),
+        ("0 0 12 * * 1-5", datetime.datetime(2025, 1, 6, 12, 0)),
+        ("0 */15 * * * *", datetime.datetime(2025, 1, 6, 12, 30)),
+        ("0 0 0 1 * *", datetime.datetime(2025, 1, 1, 0, 0)),
+        ("0 0 0 1 * 0", datetime.datetime(2025, 1, 5, 0, 0)),
+        ("0 0 0 29 2 *", datetime.datetime(2024, 2, 29, 0, 0)),
+    ],
+)
+def test_cron_last_fired(schedule, fired):
+    assert cron_last_fired(schedule, MONDAY) == fired
+
+
+@pytest.mark.parametrize("schedule", ["0 0 13 * *", "0 0 24 * * *", "0 0 13 * * MON"])
+def test_cron_last_fired_invalid(schedule):
+    with pytest.raises(ValueError):
+        cron_last_fired(schedule, MONDAY)
+
+
+def test_warm_min_capacity():
+    pool = {
+        "minCapacity": 1,
+        "warmCapacity": {
+            "windows": [
+                {"start": "0 0 8 * * 1-5", "end": "0 0 18 * * 1-5", "minCapacity": 3},
+                {"start": "0 0 13 * * *", "end": "0 0 23 * * *", "minCapacity": 5},
+            ]
+        },
+    }
+    assert warm_min_capacity(pool, MONDAY) == 3
+    assert warm_min_capacity(pool, MONDAY.replace(hour=14)) == 5
+    assert warm_min_capacity(pool, MONDAY.replace(hour=7)) == 1
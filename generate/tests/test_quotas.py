@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import pytest
+
+from generate import quotas
+from generate.quotas import Quota, allocate_instances, apply_quotas, quota_usage
+
+ZONES = ["us-central1-a", "us-central1-b", "us-central1-c", "us-central1-f"]
+
+
+@pytest.fixture
+def us_central1_quota(monkeypatch):
+    quota = Quota(cloud="gcp", region="us-central1", vcpus=128)
+    monkeypatch.setattr(quotas, "quotas", lambda: [quota])
+    return quota
+
+
+def spot_in_every_zone(*machineTypes):
+    return [(zone, machineType, 1) for machineType in machineTypes for zone in ZONES]
+
+
+def caps(workerPool):
+    return [
+        lc["workerManager"].get("maxCapacity")
+        for lc in workerPool.config["launchConfigs"]
+    ]
+
+
+def test_allocate_instances_whole_share():
+    # an even split would give each n2-standard-8 and n2-standard-16 launch
+    # config less than one instance
+    vcpus = [4] * 4 + [8] * 4 + [16] * 4
+    instances = allocate_instances(64, vcpus)
+    assert sum(n * v for n, v in zip(instances, vcpus)) == 64
+    assert instances == [1] * 4 + [1] * 4 + [1] + [0] * 3
+
+
+def test_allocate_instances_equal_parts():
+    assert allocate_instances(100, [2, 2, 2]) == [17, 17, 16]
+
+
+def test_allocate_instances_never_over_share():
+    for share in range(0, 100):
+        vcpus = [2, 4, 8, 16]
+        instances = allocate_instances(share, vcpus)
+        used = sum(n * v for n, v in zip(instances, vcpus))
+        assert share - 2 < used <= share
+
+
+def test_allocate_instances_zero_share():
+    assert allocate_instances(0, [4, 8]) == [0, 0]
+
+
+def test_apply_quotas_under_quota(us_central1_quota, gcp_pool):
+    pool = gcp_pool(
+        "proj-test/small", spot_in_every_zone("n2-standard-4"), maxCapacity=2
+    )
+    [result] = apply_quotas([pool])
+    assert caps(result) == [None] * 4
+
+
+def test_apply_quotas_shares_whole_quota(us_central1_quota, gcp_pool):
+    big = gcp_pool(
+        "proj-test/big",
+        spot_in_every_zone("n2-standard-4", "n2-standard-8", "n2-standard-16"),
+        maxCapacity=1000,
+    )
+    other = gcp_pool(
+        "proj-test/other", spot_in_every_zone("n2-standard-4"), maxCapacity=1000
+    )
+    result = apply_quotas([big, other])
+    [(_, usage)] = quota_usage(result)
+    assert usage == {"proj-test/big": 64, "proj-test/other": 64}
+    assert caps(result[0]) == [1] * 4 + [1] * 4 + [1, 0, 0, 0]
+    assert caps(result[1]) == [4] * 4
+
+
+def test_apply_quotas_capacity_per_instance(us_central1_quota, gcp_pool):
+    big = gcp_pool(
+        "proj-test/big", spot_in_every_zone("n2-standard-16"), maxCapacity=1000
+    )
+    for lc in big.config["launchConfigs"]:
+        lc["workerManager"]["capacityPerInstance"] = 4
+    [result] = apply_quotas([big])
+    # 128 vCPUs are 8 instances, each running 4 tasks
+    assert caps(result) == [8, 8, 8, 8]
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import pytest
+
+from generate.schemas import (
+    check_config,
+    config_errors,
+    imagesets_schema,
+    projects_schema,
+)
+
+
+def project(**workerPools):
+    return {"proj": {"workerPools": workerPools}}
+
+
+@pytest.mark.asyncio
+async def test_repository_config_is_valid(repo_root):
+    await check_config()
+
+
+def test_keyed_by_arm_deployment_resource_group():
+    imagesets = {
+        "windows": {
+            "workerImplementation": "generic-worker",
+            "azure": {
+                "images": {"eastus": "image-id"},
+                "armDeploymentResourceGroup": {
+                    "by-location": {"eastus": "rg-east", "default": "rg"},
+                },
+            },
+        },
+    }
+    assert config_errors("imagesets.yml", imagesets, imagesets_schema) == []
+
+
+def test_unknown_pool_option():
+    projects = project(
+        ci={
+            "imageset": "docker-worker",
+            "cloud": "gcp",
+            "maxCapacity": 1,
+            "instanceTypes": {"m5.large": 1},
+        }
+    )
+    assert config_errors("proj.yml", projects, projects_schema) == [
+        "proj.yml: proj.workerPools.ci: Additional properties are not allowed"
+        " ('instanceTypes' was unexpected)"
+    ]
+
+
+def test_pool_requires_imageset_or_architectures():
+    projects = project(
+        ci={"cloud": "gcp", "maxCapacity": 1},
+        multi={
+            "cloud": "gcp",
+            "maxCapacity": 1,
+            "architectures": {"arm64": "generic-worker-ubuntu-24-04-arm64"},
+        },
+    )
+    assert config_errors("proj.yml", projects, projects_schema) == [
+        "proj.yml: proj.workerPools.ci: 'imageset' is a required property"
+    ]
+
+
+def test_errors_are_reported_together():
+    projects = project(
+        ci={
+            "imageset": "docker-worker",
+            "cloud": "gcp",
+            "maxCapacity": -1,
+            "onDemandFallback": {"maxCapacity": 1, "initialWeight": 1},
+        }
+    )
+    errors = config_errors("proj.yml", projects, projects_schema)
+    assert [e.split(": ")[1] for e in errors] == [
+        "proj.workerPools.ci.maxCapacity",
+        "proj.workerPools.ci.onDemandFallback.initialWeight",
+    ]
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import pytest
+from tcadmin.resources import Role, Secret
+
+from generate.scopes import ScopeResolver
+
+
+def test_expansion_is_normalized():
+    resolver = ScopeResolver({"r": ["a:b", "a:*", "b", "a:b:c"], "s": ["*"]})
+    assert resolver.expand_scopes(["assume:r"]) == ["a:*", "assume:r", "b"]
+    assert resolver.expand_scopes(["assume:r", "assume:s"]) == ["*"]
+
+
+def test_assume_chain():
+    resolver = ScopeResolver({"r1": ["assume:r2", "s1"], "r2": ["s2"]})
+    assert resolver.expand_scopes(["assume:r1"]) == [
+        "assume:r1",
+        "assume:r2",
+        "s1",
+        "s2",
+    ]
+
+
+def test_assume_cycle():
+    resolver = ScopeResolver({"a": ["assume:b", "s"], "b": ["assume:a"]})
+    assert resolver.expand_scopes(["assume:b"]) == ["assume:a", "assume:b", "s"]
+
+
+def test_parameterized_role():
+    resolver = ScopeResolver({"repo:*": ["queue:route:<..>.done", "x"]})
+    assert resolver.expand_scopes(["assume:repo:foo"]) == [
+        "assume:repo:foo",
+        "queue:route:foo.done",
+        "x",
+    ]
+    # a `*` in the parameter consumes the rest of the scope
+    assert resolver.expand_scopes(["assume:repo:fo*"]) == [
+        "assume:repo:fo*",
+        "queue:route:fo*",
+        "x",
+    ]
+
+
+def test_star_scope_assumes_every_role():
+    resolver = ScopeResolver({"a": ["s1"], "ab": ["s2"], "b": ["s3"]})
+    assert resolver.expand_scopes(["assume:a*"]) == ["assume:a*", "s1", "s2"]
+    assert resolver.expand_scopes(["assu*"]) == ["assu*", "s1", "s2", "s3"]
+
+
+def test_unbounded_expansion():
+    resolver = ScopeResolver({"r*": ["assume:r<..>x"]})
+    with pytest.raises(RuntimeError):
+        resolver.expand_scopes(["assume:r"])
+
+
+def test_expand_many():
+    resolver = ScopeResolver({"a": ["s1"], "b": ["s2"]})
+    assert resolver.expand_many([["assume:a"], ["assume:b", "s3"]]) == [
+        ["assume:a", "s1"],
+        ["assume:b", "s2", "s3"],
+    ]
+
+
+def test_roles_satisfying():
+    resolver = ScopeResolver(
+        {
+            "admin": ["queue:*"],
+            "project:fuzzing": ["queue:create-task:highest:proj-fuzzing/*"],
+            "repo:fuzzing": ["assume:project:fuzzing"],
+            "other": ["queue:create-task:highest:proj-other/*"],
+        }
+    )
+    require = ["queue:create-task:highest:proj-fuzzing/ci"]
+    assert resolver.satisfies(["assume:repo:fuzzing"], require)
+    assert not resolver.satisfies(["assume:other"], require)
+    assert resolver.roles_satisfying(require) == [
+        "admin",
+        "project:fuzzing",
+        "repo:fuzzing",
+    ]
+
+
+def test_from_resources():
+    resources = [
+        Role(roleId="a", description="", scopes=["s1"]),
+        Secret(name="secret"),
+    ]
+    resolver = ScopeResolver.from_resources(resources)
+    assert resolver.roles == {"a": ("s1",)}
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import argparse
+import importlib.util
+import os
+
+import pytest
+
+from .conftest import ROOT
+
+
+@pytest.fixture
+def tune_pools():
+    """The misc/tune-pools.py script, as a module"""
+    path = os.path.join(ROOT, "misc", "tune-pools.py")
+    spec = importlib.util.spec_from_file_location("tune_pools", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+ARGS = argparse.Namespace(
+    idle_percentile=90, boot_percentile=99, duration_percentile=100
+)
+
+
+def bursts(workerPoolId, count, every, size, duration):
+    """Tasks arriving in `count` bursts of `size`, a second apart"""
+    return [
+        {
+            "workerPoolId": workerPoolId,
+            "created": str(burst * every + i),
+            "duration": str(duration),
+        }
+        for burst in range(count)
+        for i in range(size)
+    ]
+
+
+@pytest.mark.parametrize(
+    "p,expected", [(0, 1), (10, 1), (50, 5), (90, 9), (91, 10), (100, 10)]
+)
+def test_percentile(tune_pools, p, expected):
+    assert tune_pools.percentile([10, 3, 1, 2, 9, 4, 5, 8, 7, 6], p) == expected
+
+
+def test_idle_gaps(tune_pools):
+    runs = [(0, 10), (5, 20), (20, 30), (50, 60), (55, 58)]
+    assert tune_pools.idle_gaps(runs) == [20]
+
+
+def test_tune_bursty_pool(tune_pools):
+    # bursts of 10 tasks every 10 minutes, each task taking a minute: the pool
+    # is idle from a minute after the last task of a burst to the next burst
+    tasks = bursts("proj-test/ci", 20, 600, 10, 60)
+    boots = [{"workerPoolId": "proj-test/ci", "seconds": "200"}]
+    assert tune_pools.tune(tasks, boots, ARGS) == {
+        "proj-test/ci": {
+            "afterIdleSeconds": 600 - 9 - 60,
+            "registrationTimeout": 600,
+            "reregistrationTimeout": 6 * 3600,
+        }
+    }
+
+
+def test_tune_rarely_used_pool(tune_pools):
+    # waiting hours for the next task costs more than booting a new worker
+    tasks = bursts("proj-test/rare", 5, 6 * 3600, 1, 60)
+    boots = [{"workerPoolId": "proj-test/rare", "seconds": "100"}]
+    tuning = tune_pools.tune(tasks, boots, ARGS)["proj-test/rare"]
+    assert tuning["afterIdleSeconds"] == 100
+
+
+def test_tune_without_durations(tune_pools):
+    tasks = [{"workerPoolId": "proj-test/ci", "created": "2025-01-06T12:00:00Z"}]
+    boots = [{"workerPoolId": "proj-test/ci", "seconds": "1000"}]
+    assert tune_pools.tune(tasks, boots, ARGS) == {
+        "proj-test/ci": {"registrationTimeout": 1500}
+    }
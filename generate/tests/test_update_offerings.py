@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import importlib.util
+import json
+import os
+
+import pytest
+
+from .conftest import ROOT
+
+
+@pytest.fixture
+def update_offerings():
+    """The misc/update-offerings.py script, as a module"""
+    path = os.path.join(ROOT, "misc", "update-offerings.py")
+    spec = importlib.util.spec_from_file_location("update_offerings", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # as update-offerings.py writes it
+    with open(path, "w") as f:
+        f.write(json.dumps(data, indent=2, sort_keys=True) + "\n")
+
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def fixtures(tmp_path, monkeypatch, update_offerings):
+    """
+    Return a function writing the fixture files for a cloud, and a
+    FixtureBackend reading them.  The test runs in an empty directory with its
+    own config/.
+    """
+    directory = tmp_path / "fixtures"
+    workdir = tmp_path / "work"
+    (workdir / "config").mkdir(parents=True)
+    monkeypatch.chdir(workdir)
+
+    def write(cloud, offerings, shapes):
+        write_json(
+            directory / cloud / "locations.json",
+            [[region, zone] for region, zone in sorted(offerings)],
+        )
+        for (_, zone), types in offerings.items():
+            write_json(directory / cloud / "offerings" / f"{zone}.json", types)
+        write_json(directory / cloud / "shapes.json", shapes)
+
+    return write, update_offerings.FixtureBackend(str(directory))
+
+
+AWS_OFFERINGS = {
+    ("us-east-1", "us-east-1a"): ["m5.large", "c5.xlarge"],
+    ("us-east-1", "us-east-1b"): ["m5.large"],
+}
+AWS_SHAPES = {
+    "m5.large": {"vcpus": 2, "memoryGb": 8, "localDiskGb": 0, "localDisks": 0},
+    "c5.xlarge": {"vcpus": 4, "memoryGb": 8, "localDiskGb": 0, "localDisks": 0},
+}
+
+
+@pytest.mark.asyncio
+async def test_unchanged_files_left_untouched(fixtures, update_offerings):
+    write, backend = fixtures
+    write("aws", AWS_OFFERINGS, AWS_SHAPES)
+    write_json(update_offerings.SHAPES_FILES["aws"], {})
+
+    changed = await update_offerings.refresh_cloud(backend, "aws", True)
+    assert sorted(changed) == [
+        "config/ec2-instance-type-offerings/us-east-1a.json",
+        "config/ec2-instance-type-offerings/us-east-1b.json",
+        "config/ec2-instance-types.json",
+    ]
+    assert read_json("config/ec2-instance-type-offerings/us-east-1a.json") == [
+        "c5.xlarge",
+        "m5.large",
+    ]
+
+    mtimes = {f: os.stat(f).st_mtime_ns for f in changed}
+    for f in changed:
+        os.utime(f, ns=(0, 0))
+    assert await update_offerings.refresh_cloud(backend, "aws", True) == []
+    assert all(os.stat(f).st_mtime_ns == 0 for f in mtimes)
+
+
+@pytest.mark.asyncio
+async def test_all_zones_removes_missing_zones(fixtures, update_offerings):
+    write, backend = fixtures
+    write("aws", AWS_OFFERINGS, AWS_SHAPES)
+    write_json(update_offerings.SHAPES_FILES["aws"], AWS_SHAPES)
+    gone = "config/ec2-instance-type-offerings/us-west-9a.json"
+    write_json(gone, ["m5.large"])
+
+    changed = await update_offerings.refresh_cloud(backend, "aws", True)
+    assert gone in changed
+    assert not os.path.exists(gone)
+    assert os.path.exists("config/ec2-instance-type-offerings/us-east-1b.json")
+
+
+@pytest.mark.asyncio
+async def test_used_zones_keep_other_zones(fixtures, update_offerings, monkeypatch):
+    write, backend = fixtures
+    write(
+        "gcp",
+        {("us-central1", "us-central1-a"): ["n2-standard-4", "e2-small"]},
+        {},
+    )
+    write_json(update_offerings.SHAPES_FILES["gcp"], {})
+    write_json(
+        update_offerings.GCP_OFFERINGS_FILE,
+        [
+            {"name": "n2-standard-2", "zone": "us-central1-a"},
+            {"name": "n2-standard-2", "zone": "us-west1-b"},
+        ],
+    )
+    monkeypatch.setattr(
+        update_offerings,
+        "used_locations",
+        lambda cloud: [("us-central1", "us-central1-a")],
+    )
+
+    changed = await update_offerings.refresh_cloud(backend, "gcp", False)
+    assert changed == [update_offerings.GCP_OFFERINGS_FILE]
+    assert read_json(update_offerings.GCP_OFFERINGS_FILE) == [
+        {"name": "e2-small", "zone": "us-central1-a"},
+        {"name": "n2-standard-4", "zone": "us-central1-a"},
+        {"name": "n2-standard-2", "zone": "us-west1-b"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_shapes_are_merged(fixtures, update_offerings):
+    write, backend = fixtures
+    write(
+        "azure",
+        {("eastus", "eastus"): ["Standard_F8s_v2"]},
+        {"Standard_F8s_v2": {"vcpus": 8, "memoryGb": 16}},
+    )
+    write_json(
+        update_offerings.SHAPES_FILES["azure"],
+        {
+            "Standard_F8s_v2": {"vcpus": 4, "memoryGb": 16},
+            "Standard_D2s_v3": {"vcpus": 2, "memoryGb": 8},
+        },
+    )
+
+    changed = await update_offerings.refresh_cloud(backend, "azure", True)
+    assert update_offerings.SHAPES_FILES["azure"] in changed
+    assert read_json(update_offerings.SHAPES_FILES["azure"]) == {
+        "Standard_F8s_v2": {"vcpus": 8, "memoryGb": 16},
+        "Standard_D2s_v3": {"vcpus": 2, "memoryGb": 8},
+    }
+
+
+@pytest.mark.parametrize(
+    "names,expected",
+    [
+        # aws, gcloud and az, respectively
+        (["i386", "x86_64"], "amd64"),
+        (["arm64"], "arm64"),
+        (["ARM64"], "arm64"),
+        (["X86_64"], "amd64"),
+        (["Arm64"], "arm64"),
+        # gcloud gives no architecture for some x86 machine types
+        ([None], "amd64"),
+    ],
+)
+def test_architecture(update_offerings, names, expected):
+    assert update_offerings.architecture(*names) == expected
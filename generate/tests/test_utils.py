@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import copy
+
+from generate.utils import InternTable
+
+
+def launch_config(zone):
+    return {
+        "zone": zone,
+        "machineType": f"zones/{zone}/machineTypes/n2-standard-4",
+        "disks": [{"type": "PERSISTENT", "initializeParams": {"diskSizeGb": 60}}],
+        "workerConfig": {"genericWorker": {"config": {"idleTimeoutSecs": 15}}},
+        "tags": ("a", "b"),
+        "extra": None,
+    }
+
+
+def test_intern_equal():
+    table = InternTable()
+    trees = [launch_config("us-central1-a"), launch_config("us-west1-b")]
+    originals = copy.deepcopy(trees)
+    assert [table.intern(tree) for tree in trees] == originals
+    # interning does not modify the originals
+    assert trees == originals
+
+
+def test_intern_keeps_scalar_types():
+    table = InternTable()
+    interned = [table.intern({"value": [value]}) for value in (1, True, 1.0)]
+    assert [type(tree["value"][0]) for tree in interned] == [int, bool, float]
+    assert interned[0]["value"] is not interned[1]["value"]
+    assert interned[0]["value"] is not interned[2]["value"]
+    assert interned[1]["value"] is not interned[2]["value"]
+
+
+def test_intern_shares_equal_subtrees():
+    table = InternTable()
+    a = table.intern(launch_config("us-central1-a"))
+    b = table.intern(launch_config("us-west1-b"))
+    assert a is not b
+    assert a["disks"] is b["disks"]
+    assert a["workerConfig"] is b["workerConfig"]
+    assert a["tags"] is b["tags"]
+    assert table.intern(launch_config("us-central1-a")) is a
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+import datetime
+
+import pytest
+
+from generate.workers import (
+    DynamicWorkerPoolSettings,
+    apply_on_demand_fallback,
+    aws_block_device_mappings,
+    check_gcp_disks,
+    check_on_demand_fallback,
+    gcp_launch_config,
+    required_free_disk_gb,
+    zone_quarantine,
+)
+
+
+def pool_with_fallbacks(*weights):
+    wp = DynamicWorkerPoolSettings("community-tc-workers-google")
+    spots = [
+        {"zone": f"zone-{i}", "workerManager": {"initialWeight": weight}}
+        for i, weight in enumerate(weights)
+    ]
+    fallbacks = [
+        {"zone": f"zone-{i}", "onDemand": True, "workerManager": {"initialWeight": w}}
+        for i, w in enumerate(weights)
+    ]
+    wp.config = {"launchConfigs": spots + fallbacks}
+    wp.on_demand_fallbacks = list(zip(spots, fallbacks))
+    return wp
+
+
+def fallbacks(wp):
+    return [lc for lc in wp.config["launchConfigs"] if lc.get("onDemand")]
+
+
+def test_on_demand_fallback_caps_the_tier():
+    wp = pool_with_fallbacks(1, 1, 1, 1, 1)
+    apply_on_demand_fallback(wp, {"maxCapacity": 2})
+    assert sum(lc["workerManager"]["maxCapacity"] for lc in fallbacks(wp)) == 2
+    # fallbacks without any capacity are dropped
+    assert len(fallbacks(wp)) == 2
+    assert len(wp.config["launchConfigs"]) == 7
+
+
+def test_on_demand_fallback_prefers_best_spot_weights():
+    wp = pool_with_fallbacks(0.2, 1, 0.5)
+    apply_on_demand_fallback(wp, {"maxCapacity": 1})
+    [fallback] = fallbacks(wp)
+    assert fallback["zone"] == "zone-1"
+
+
+def test_on_demand_fallback_weights_below_spot():
+    wp = pool_with_fallbacks(0.05, 1, 0.5)
+    apply_on_demand_fallback(wp, {"maxCapacity": 30, "initialWeight": 0.5})
+    assert [lc["workerManager"] for lc in fallbacks(wp)] == [
+        {"initialWeight": 0.025, "maxCapacity": 1},
+        {"initialWeight": 0.5, "maxCapacity": 19},
+        {"initialWeight": 0.25, "maxCapacity": 10},
+    ]
+
+
+@pytest.mark.parametrize(
+    "onDemandFallback",
+    [{}, {"maxCapacity": 1, "initialWeight": 1}, {"maxCapacity": 1, "weight": 1}],
+)
+def test_check_on_demand_fallback_invalid(onDemandFallback):
+    with pytest.raises(ValueError):
+        check_on_demand_fallback(onDemandFallback)
+
+
+def local_ssd_launch_config(**cfg):
+    return gcp_launch_config(
+        "us-central1-a",
+        "us-central1",
+        "zones/{zone}/machineTypes/n2-standard-8",
+        1,
+        "image",
+        60,
+        disks={"localSsds": 2, "localSsdDirectory": "/mnt/ssd"},
+        **cfg,
+    )
+
+
+def test_gcp_local_ssd_directory():
+    launchConfig = local_ssd_launch_config()
+    assert launchConfig["metadata"] == {
+        "items": [{"key": "local-ssd-directory", "value": "/mnt/ssd"}],
+    }
+    config = launchConfig["workerConfig"]["genericWorker"]["config"]
+    assert config["tasksDir"] == "/mnt/ssd/tasks"
+    assert [d["type"] for d in launchConfig["disks"]] == [
+        "PERSISTENT",
+        "SCRATCH",
+        "SCRATCH",
+    ]
+
+
+def test_gcp_local_ssd_directory_keeps_pool_metadata():
+    item = {"key": "enable-oslogin", "value": "true"}
+    launchConfig = local_ssd_launch_config(launchConfig={"metadata": {"items": [item]}})
+    assert launchConfig["metadata"]["items"] == [
+        item,
+        {"key": "local-ssd-directory", "value": "/mnt/ssd"},
+    ]
+
+
+def test_gcp_local_ssd_directory_metadata_conflict():
+    item = {"key": "local-ssd-directory", "value": "/elsewhere"}
+    with pytest.raises(ValueError):
+        local_ssd_launch_config(launchConfig={"metadata": {"items": [item]}})
+
+
+@pytest.mark.parametrize(
+    "machineType,localSsds",
+    [("n2-standard-8", 1), ("n2-standard-16", 2), ("n2-standard-16", 24)],
+)
+def test_check_gcp_local_ssds(machineType, localSsds):
+    check_gcp_disks(machineType, None, None, None, localSsds)
+
+
+@pytest.mark.parametrize(
+    "machineType,localSsds",
+    [("n2-standard-8", 3), ("n2-standard-16", 1), ("c3d-standard-4", 1)],
+)
+def test_check_gcp_local_ssds_invalid(machineType, localSsds):
+    with pytest.raises(ValueError):
+        check_gcp_disks(machineType, None, None, None, localSsds)
+
+
+def gcp_disk_launch_config(diskSizeGb, capacityPerInstance):
+    return {
+        "disks": [
+            {"type": "PERSISTENT", "initializeParams": {"diskSizeGb": diskSizeGb}}
+        ],
+        "workerManager": {"capacityPerInstance": capacityPerInstance},
+    }
+
+
+def test_required_free_disk_gb_default():
+    # without capacityPer.localDiskGb, workers keep their own default
+    launchConfig = gcp_disk_launch_config(10, 1)
+    assert (
+        required_free_disk_gb("community-tc-workers-google", launchConfig, None) is None
+    )
+    assert (
+        required_free_disk_gb("community-tc-workers-google", launchConfig, {"vcpus": 2})
+        is None
+    )
+
+
+def test_required_free_disk_gb_per_task():
+    launchConfig = gcp_disk_launch_config(100, 3)
+    capacityPer = {"localDiskGb": 20}
+    assert (
+        required_free_disk_gb("community-tc-workers-google", launchConfig, capacityPer)
+        == 60
+    )
+
+
+def test_required_free_disk_gb_too_small():
+    launchConfig = gcp_disk_launch_config(50, 3)
+    with pytest.raises(ValueError):
+        required_free_disk_gb(
+            "community-tc-workers-google", launchConfig, {"localDiskGb": 20}
+        )
+
+
+def test_zone_quarantine():
+    entries = [
+        {"cloud": "aws", "zone": "us-east-1e", "expires": datetime.date(2025, 2, 1)},
+        {
+            "cloud": "gcp",
+            "zone": "us-central1-a",
+            "type": "n2-standard-4",
+            "expires": datetime.date(2025, 1, 31),
+        },
+    ]
+    assert zone_quarantine(entries, datetime.date(2025, 1, 31)) == {
+        ("aws", "us-east-1e", None),
+        ("gcp", "us-central1-a", "n2-standard-4"),
+    }
+
+
+def test_zone_quarantine_expired():
+    entries = [
+        {"cloud": "aws", "zone": "us-east-1e", "expires": datetime.date(2025, 2, 1)},
+        {
+            "cloud": "gcp",
+            "zone": "us-central1-a",
+            "type": "n2-standard-4",
+            "expires": datetime.date(2025, 1, 31),
+        },
+    ]
+    with pytest.raises(ValueError) as excinfo:
+        zone_quarantine(entries, datetime.date(2025, 2, 1))
+    assert "us-central1-a n2-standard-4" in str(excinfo.value)
+    assert "us-east-1e" not in str(excinfo.value)
+
+
+def test_aws_root_volume():
+    rootVolume = {"deviceName": "/dev/xvda", "type": "gp3", "sizeGb": 100}
+    assert aws_block_device_mappings("m5.large", rootVolume, None, False) == [
+        {
+            "DeviceName": "/dev/xvda",
+            "Ebs": {
+                "DeleteOnTermination": True,
+                "VolumeType": "gp3",
+                "VolumeSize": 100,
+            },
+        }
+    ]
+
+
+@pytest.mark.parametrize("deviceName", [None, "/dev/sdb"])
+def test_aws_root_volume_device_name(deviceName):
+    rootVolume = {"type": "gp3", "sizeGb": 100}
+    if deviceName:
+        rootVolume["deviceName"] = deviceName
+    with pytest.raises(ValueError):
+        aws_block_device_mappings("m5.large", rootVolume, None, False)
@@ -3,6 +3,7 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 import re
+import sys
 
 
 def keymatch(attributes, target):
@@ -117,3 +118,62 @@ def evaluate_keyed_by(value, item_name, attributes):
         raise Exception(
             f"No {keyed_by} matching {key!r} nor 'default' found while determining item {item_name}"
         )
+
+
+def split_capacity(capacity, weights):
+    """
+    Split a capacity into integer shares proportional to the given weights,
+    summing to the capacity.
+    """
+    total = sum(weights)
+    if not total:
+        weights, total = [1] * len(weights), len(weights)
+    shares = [capacity * w / total for w in weights]
+    result = [int(share) for share in shares]
+    # give what is left to the largest remainders
+    by_remainder = sorted(range(len(shares)), key=lambda i: result[i] - shares[i])
+    for i in by_remainder[: capacity - sum(result)]:
+        result[i] += 1
+    return result
+
+
+class InternTable:
+    """
+    A hash-consing table for JSON-like trees.  Interning a tree returns an
+    equal tree in which equal strings, and equal dicts and lists, are shared
+    with every other tree interned in the same table.  Children are interned
+    before their parents, so a node is identified by the identity of its
+    children, and equal subtrees are found without comparing them deeply.
+
+    Interned trees are shared, so they must not be modified.
+    """
+
+    SCALARS = (str, int, float, bool, type(None))
+
+    def __init__(self):
+        # node key -> interned node; this keeps interned nodes alive, so that
+        # the ids in the keys of their parents remain valid
+        self._nodes = {}
+
+    def _key(self, value):
+        if isinstance(value, self.SCALARS):
+            # keep True, 1 and 1.0 apart
+            return (type(value), value)
+        return id(value)
+
+    def intern(self, value):
+        """Return the interned equivalent of the given tree"""
+        if isinstance(value, str):
+            return sys.intern(value)
+        if isinstance(value, dict):
+            value = {sys.intern(k): self.intern(v) for k, v in value.items()}
+            key = (dict, tuple((k, self._key(v)) for k, v in value.items()))
+        elif isinstance(value, (list, tuple)):
+            value = type(value)(self.intern(v) for v in value)
+            key = (type(value), tuple(self._key(v) for v in value))
+        else:
+            return value
+        return self._nodes.setdefault(key, value)
+
+    def __len__(self):
+        return len(self._nodes)
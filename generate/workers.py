@@ -8,28 +8,68 @@ from tcadmin.resources import WorkerPool, Secret, Role
 
 from collections import defaultdict
 from functools import lru_cache
-import copy, hashlib, json, os, asyncio
+import copy, datetime, hashlib, json, os, sys, asyncio
 import yaml
 
-from .imagesets import ImageSets
+from .imagesets import ImageSets, normalize_arm_parameters
 from .loader import loader
-from .utils import evaluate_keyed_by
+from .utils import evaluate_keyed_by, split_capacity
 
 CLOUD_FUNCS = {}
 WORKER_IMPLEMENTATION_FUNCS = {}
 
 
-async def get_image_set(name, _cache={}, _lock=asyncio.Lock()):
+async def get_image_sets(_cache={}, _lock=asyncio.Lock()):
     """
-    Get an image_set from image_sets.yml.  This loads the file on first call and
-    can thus be called repeatedly.
+    Get all image sets from imagesets.yml.  This loads the file on first call and
+    can thus be called repeatedly; the lock is only taken while loading.
     """
-    async with _lock:
-        if "image_sets" not in _cache:
-            _cache["image_sets"] = await ImageSets.load(loader)
-        image_sets = _cache["image_sets"]
+    if "image_sets" not in _cache:
+        async with _lock:
+            if "image_sets" not in _cache:
+                _cache["image_sets"] = await ImageSets.load(loader)
+    return _cache["image_sets"]
 
-    return image_sets[name]
+
+async def get_image_set(name):
+    """
+    Get an image_set from imagesets.yml.
+    """
+    return (await get_image_sets())[name]
+
+
+def pool_image_set_names(cfg):
+    """
+    Return the names of the image sets used by a worker pool's config: its
+    imageset, or that of each of its architectures.
+    """
+    if "architectures" in cfg:
+        return [
+            arch_cfg if isinstance(arch_cfg, str) else arch_cfg.get("imageset")
+            for _, arch_cfg in sorted(cfg["architectures"].items())
+        ]
+    return [cfg.get("imageset")]
+
+
+async def check_image_sets(worker_pools):
+    """
+    Check that every worker pool, given as a dict of workerPoolId to config,
+    names image sets that exist, reporting all unknown names at once.
+    """
+    image_sets = await get_image_sets()
+    unknown = defaultdict(list)
+    for workerPoolId, cfg in worker_pools.items():
+        for name in pool_image_set_names(cfg):
+            if name not in image_sets:
+                unknown[name].append(workerPoolId)
+    if unknown:
+        raise RuntimeError(
+            "Unknown image sets: "
+            + "; ".join(
+                "{!r} (used by {})".format(name, ", ".join(pools))
+                for name, pools in unknown.items()
+            )
+        )
 
 
 def cloud(fn):
@@ -100,6 +140,11 @@ class WorkerPoolSettings:
         # scopes - any additional scopes required for workers in this cloud
         self.scopes = []
 
+        # on_demand_fallbacks - (spot launch config, on-demand launch config)
+        # pairs for the launch configs in config that fall back to on-demand
+        # instances; see apply_on_demand_fallback
+        self.on_demand_fallbacks = []
+
     def supports_lifecycle_config(self):
         """
         Returns true if this worker pool supports lifecycle configuration.
@@ -170,45 +215,133 @@ class DynamicWorkerPoolSettings(WorkerPoolSettings):
             )
 
 
-async def build_worker_pool(workerPoolId, cfg, secret_values):
-    try:
-        image_set = await get_image_set(cfg["imageset"])
-        wp = CLOUD_FUNCS[cfg["cloud"]](
-            secret_values=secret_values,
-            image_set=image_set,
-            **cfg,
+def build_cloud_settings(workerPoolId, cfg, image_set, secret_values):
+    """
+    Build the WorkerPoolSettings for a pool using the given image set, with
+    the worker and worker-manager config of the pool and image set merged in.
+    """
+    wp = CLOUD_FUNCS[cfg["cloud"]](
+        secret_values=secret_values,
+        image_set=image_set,
+        **cfg,
+    )
+    wp.workerPoolId = workerPoolId
+    tuning = pool_tuning().get(workerPoolId, {})
+
+    if wp.supports_worker_config():
+        wp.merge_config(
+            "workerConfig",
+            # The order is important here: earlier entries take precendence
+            # over later entries.
+            cfg.get("workerConfig", {}),
+            tuned_worker_config(image_set.workerImplementation, tuning),
+            image_set.workerConfig,
+            image_set.prefetch_worker_config,
+            WorkerPoolSettings.EXISTING_CONFIG,
+        )
+
+    if wp.supports_worker_manager_config():
+        wp.merge_config(
+            "workerManager",
+            # The order is important here: earlier entries take precendence
+            # over later entries.
+            cfg.get("workerManager", {}),
+            image_set.workerManager,
+            WorkerPoolSettings.EXISTING_CONFIG,
         )
-        wp.workerPoolId = workerPoolId
-
-        if wp.supports_worker_config():
-            wp.merge_config(
-                "workerConfig",
-                # The order is important here: earlier entries take precendence
-                # over later entries.
-                cfg.get("workerConfig", {}),
-                image_set.workerConfig,
-                WorkerPoolSettings.EXISTING_CONFIG,
+
+    return wp
+
+
+async def build_architectures(workerPoolId, cfg, secret_values):
+    """
+    Build the WorkerPoolSettings for a pool with `architectures`, by building
+    the launch configs for each architecture, with its image set and options,
+    and combining them.  Return it and the list of image sets used.
+
+    Each architecture is given either as an image set name, or as a dict with
+    `imageset`, an optional `initialWeight` between 0 and 1 multiplying the
+    initialWeight of its launch configs, and any other options of the pool's cloud, such as
+    machineTypes, which override the pool's options for that architecture.
+    Each architecture only uses those of its machine types that have that
+    architecture (see machine_types_for_architecture).
+    """
+    if "imageset" in cfg:
+        raise ValueError("a pool with architectures cannot also have an imageset")
+    if cfg["cloud"] == "static":
+        raise ValueError("static pools cannot have architectures")
+    option = MACHINE_TYPES_OPTIONS[cfg["cloud"]]
+    wp = None
+    image_sets = []
+    for architecture, arch_cfg in sorted(cfg["architectures"].items()):
+        if isinstance(arch_cfg, str):
+            arch_cfg = {"imageset": arch_cfg}
+        arch_cfg = dict(arch_cfg)
+        initialWeight = arch_cfg.pop("initialWeight", 1)
+        if not 0 <= initialWeight <= 1:
+            # worker-manager caps launch config weights at 1
+            raise ValueError(
+                f"the initialWeight of {architecture} must be between 0 and 1"
             )
+        if not arch_cfg.get(option, cfg.get(option)):
+            raise ValueError(f"a pool with architectures must give {option}")
+        arch_cfg[option] = machine_types_for_architecture(
+            cfg["cloud"], arch_cfg.get(option, cfg[option]), architecture
+        )
+        if not arch_cfg[option]:
+            raise ValueError(f"none of the {option} are {architecture}")
+        image_set = await get_image_set(arch_cfg["imageset"])
+        arch_wp = build_cloud_settings(
+            workerPoolId, dict(cfg, **arch_cfg), image_set, secret_values
+        )
+        if initialWeight != 1:
+            for lc in arch_wp.config["launchConfigs"]:
+                wm = lc.setdefault("workerManager", {})
+                wm["initialWeight"] = wm.get("initialWeight", 1) * initialWeight
+        if wp is None:
+            wp = arch_wp
+        else:
+            wp.config["launchConfigs"].extend(arch_wp.config["launchConfigs"])
+            wp.on_demand_fallbacks.extend(arch_wp.on_demand_fallbacks)
+            wp.scopes.extend(s for s in arch_wp.scopes if s not in wp.scopes)
+        image_sets.append(image_set)
+    if len({image_set.workerImplementation for image_set in image_sets}) != 1:
+        raise ValueError(
+            "the architectures' image sets must have the same worker implementation"
+        )
+    return wp, image_sets
 
-        if wp.supports_worker_manager_config():
-            wp.merge_config(
-                "workerManager",
-                # The order is important here: earlier entries take precendence
-                # over later entries.
-                cfg.get("workerManager", {}),
-                image_set.workerManager,
-                WorkerPoolSettings.EXISTING_CONFIG,
+
+async def build_worker_pool(workerPoolId, cfg, secret_values):
+    try:
+        if "architectures" in cfg:
+            wp, image_sets = await build_architectures(workerPoolId, cfg, secret_values)
+        else:
+            image_set = await get_image_set(cfg["imageset"])
+            wp = build_cloud_settings(workerPoolId, cfg, image_set, secret_values)
+            image_sets = [image_set]
+        if uses_price_performance(cfg):
+            # normalize over all architectures, before the on-demand fallbacks
+            # are weighted from their spot launch configs
+            fallbacks = {id(fallback) for _, fallback in wp.on_demand_fallbacks}
+            normalize_initial_weights(
+                [lc for lc in wp.config["launchConfigs"] if id(lc) not in fallbacks]
             )
+        if cfg.get("onDemandFallback"):
+            apply_on_demand_fallback(wp, cfg["onDemandFallback"])
+        tuning = pool_tuning().get(workerPoolId, {})
 
-        if "lifecycle" in cfg:
+        lifecycle = merge(
+            cfg.get("lifecycle", {}),
+            {key: tuning[key] for key in TUNED_LIFECYCLE_KEYS if key in tuning},
+        )
+        if lifecycle:
             if not wp.supports_lifecycle_config():
                 raise RuntimeError("lifecycle not supported for this provider")
-            wp.config["lifecycle"] = merge(
-                cfg["lifecycle"], wp.config.get("lifecycle", {})
-            )
+            wp.config["lifecycle"] = merge(lifecycle, wp.config.get("lifecycle", {}))
 
         wp = WORKER_IMPLEMENTATION_FUNCS[
-            image_set.workerImplementation.replace("-", "_")
+            image_sets[0].workerImplementation.replace("-", "_")
         ](
             secret_values=secret_values,
             wp=wp,
@@ -233,10 +366,12 @@ async def build_worker_pool(workerPoolId, cfg, secret_values):
     if wp.scopes:
         role = Role(
             roleId="worker-pool:{}".format(workerPoolId),
-            description="Scopes for image set `{}` and cloud `{}`.".format(
-                image_set.name, cfg["cloud"]
+            description="Scopes for image set{} {} and cloud `{}`.".format(
+                "s" if len(image_sets) > 1 else "",
+                ", ".join("`{}`".format(image_set.name) for image_set in image_sets),
+                cfg["cloud"],
             ),
-            scopes=wp.scopes,
+            scopes=[sys.intern(scope) for scope in wp.scopes],
         )
     else:
         role = None
@@ -267,6 +402,272 @@ def config_path():
     return config_path
 
 
+@lru_cache(maxsize=10)
+def cloud_config(cloud):
+    """
+    Return the network constants for the given cloud, read from
+    config/<cloud>.yml and cached in memory.  The result must not be modified.
+    """
+    config_file = os.path.join(config_path(), f"{cloud}.yml")
+    assert os.path.exists(config_file), "Missing {} config in {}".format(
+        cloud, config_file
+    )
+    with open(config_file, "r") as the_file:
+        return yaml.safe_load(the_file)
+
+
+# the option of each cloud's function giving its machine types
+MACHINE_TYPES_OPTIONS = {
+    "gcp": "machineTypes",
+    "aws": "instanceTypes",
+    "azure": "vmSizes",
+}
+
+# files in config/ describing the shape of each machine type, by cloud
+MACHINE_SHAPES_FILES = {
+    "gcp": "gce-machine-types.json",
+    "aws": "ec2-instance-types.json",
+    "azure": "azure-vm-sizes.json",
+}
+
+
+@lru_cache(maxsize=3)
+def machine_shapes(cloud):
+    """
+    Return a dict mapping machine type names (such as "n2-standard-2",
+    "m5.large" or "Standard_F8s_v2") to their shape, a dict with keys `vcpus`,
+    `memoryGb`, `localDiskGb` and `architecture` ("amd64" or "arm64").  For AWS, `localDisks` is the number of
+    instance store volumes; for Azure, `localDiskGb` is the resource disk,
+    with `cacheDiskGb`, `nvmeDiskGb` and `ephemeralOsDisk` describing where
+    an ephemeral OS disk can be placed.
+
+    The shapes are read from the per-cloud file named in MACHINE_SHAPES_FILES,
+    and cached in memory.  These are generated and updated along with the
+    offerings, by /misc/update-offerings.py.  The result must not be modified.
+    """
+    shapes_file = os.path.join(config_path(), MACHINE_SHAPES_FILES[cloud])
+    with open(shapes_file, "r") as the_file:
+        return json.load(the_file)
+
+
+def machine_types_for_architecture(cloud, machineTypes, architecture):
+    """
+    Return the entries of a dict of machine types, as given to a cloud's
+    function (such as gcp's machineTypes), whose shape has the given
+    architecture ("amd64" or "arm64").
+    """
+    shapes = machine_shapes(cloud)
+    result = {}
+    for machineType, capacityPerInstance in machineTypes.items():
+        shape = shapes.get(machineType.split("/")[-1])
+        if shape is None:
+            raise ValueError(
+                "no shape is known for {} machine type {}".format(cloud, machineType)
+            )
+        if shape["architecture"] == architecture:
+            result[machineType] = capacityPerInstance
+    return result
+
+
+def capacity_per_instance(cloud, machineType, capacityPer):
+    """
+    Return the capacityPerInstance for a machine type, given a per-task
+    footprint such as {"vcpus": 4, "memoryGb": 8}: the number of such tasks
+    that fit on one instance.
+    """
+    shape = machine_shapes(cloud).get(machineType)
+    if shape is None:
+        raise ValueError(
+            "no shape is known for {} machine type {}".format(cloud, machineType)
+        )
+    unknown = set(capacityPer) - {"vcpus", "memoryGb", "localDiskGb"}
+    if unknown:
+        raise ValueError("unknown capacityPer keys {}".format(sorted(unknown)))
+    capacity = min(int(shape[k] // v) for k, v in capacityPer.items())
+    if capacity < 1:
+        raise ValueError(
+            "{} machine type {} ({}) is too small for capacityPer {}".format(
+                cloud, machineType, shape, capacityPer
+            )
+        )
+    return capacity
+
+
+def capacities_per_instance(cloud, machineTypes, capacityPer, name=None):
+    """
+    Return a copy of the given dict of machine types to capacityPerInstance,
+    with `None` values computed from `capacityPer`.  Explicit values are kept
+    as they are.  `name` maps a machineTypes key to the machine type name.
+    """
+    result = {}
+    for machineType, capacity in machineTypes.items():
+        if capacity is None:
+            if not capacityPer:
+                raise ValueError(
+                    "must give capacityPer or a capacityPerInstance for {}".format(
+                        machineType
+                    )
+                )
+            capacity = capacity_per_instance(
+                cloud, name(machineType) if name else machineType, capacityPer
+            )
+        result[machineType] = capacity
+    return result
+
+
+# the value of workerManagerConfig.initialWeight that weights launch configs by
+# throughput per unit of spot price
+PRICE_PERFORMANCE = "price-performance"
+
+
+@lru_cache(maxsize=2)
+def spot_prices():
+    """
+    Return the price/performance table from config/spot-prices.json, cached in
+    memory.  It maps cloud, then machine type, to a dict with `prices`, the
+    spot price in USD per hour by region, and an optional `throughput`, the
+    relative amount of work the machine type does per hour.
+    See /misc/update-spot-prices.py for how this file is generated and updated.
+    The result must not be modified.
+    """
+    prices_file = os.path.join(config_path(), "spot-prices.json")
+    with open(prices_file, "r") as the_file:
+        return json.load(the_file)
+
+
+def price_performance(cloud, machineType, region):
+    """
+    Return the throughput per dollar of a machine type in a region.  The
+    throughput defaults to the machine type's vCPU count.
+    """
+    entry = spot_prices().get(cloud, {}).get(machineType, {})
+    price = entry.get("prices", {}).get(region)
+    if not price:
+        raise ValueError(
+            f"no spot price for {cloud} machine type {machineType} in {region}; "
+            "run misc/update-spot-prices.py"
+        )
+    throughput = entry.get("throughput")
+    if throughput is None:
+        throughput = machine_shapes(cloud)[machineType]["vcpus"]
+    return throughput / price
+
+
+def uses_price_performance(cfg):
+    """
+    Return True if the pool configuration weights its launch configs by
+    price/performance.
+    """
+    return cfg.get("workerManagerConfig", {}).get("initialWeight") == PRICE_PERFORMANCE
+
+
+def normalize_initial_weights(launchConfigs):
+    """
+    Scale the initialWeight of the given launch configs, in place, so that the
+    best has weight 1.
+    """
+    best = max(lc["workerManager"]["initialWeight"] for lc in launchConfigs)
+    for lc in launchConfigs:
+        weight = lc["workerManager"]["initialWeight"] / best
+        lc["workerManager"]["initialWeight"] = max(round(weight, 3), 0.001)
+
+
+@lru_cache(maxsize=2)
+def quarantined_zones():
+    """
+    Return the set of (cloud, zone, machine type) that are quarantined, where
+    the machine type is None if the whole zone is quarantined.
+
+    The entries are read from config/zone-quarantine.yml, and cached in
+    memory.  See /misc/quarantine-zones.py for how entries are added from
+    worker-manager errors, and for removing expired entries.
+    """
+    quarantine_file = os.path.join(config_path(), "zone-quarantine.yml")
+    with open(quarantine_file, "r") as the_file:
+        entries = yaml.safe_load(the_file) or []
+    return zone_quarantine(entries, datetime.date.today())
+
+
+def zone_quarantine(entries, today):
+    """
+    Return the set of (cloud, zone, machine type) quarantined by the given
+    entries from config/zone-quarantine.yml.
+
+    Expired entries are an error rather than being ignored, so that the
+    generated configuration does not change by itself when an entry expires;
+    the change is made by removing the entry.
+    """
+    result = set()
+    expired = []
+    for entry in entries:
+        if entry["cloud"] not in ("gcp", "aws", "azure"):
+            raise ValueError("unknown cloud in zone quarantine: {}".format(entry))
+        if not isinstance(entry["expires"], datetime.date):
+            raise ValueError("invalid expiry in zone quarantine: {}".format(entry))
+        if entry["expires"] < today:
+            expired.append(entry)
+        result.add((entry["cloud"], entry["zone"], entry.get("type")))
+    if expired:
+        raise ValueError(
+            "expired entries in config/zone-quarantine.yml; remove them, or run"
+            " misc/quarantine-zones.py to do so: {}".format(
+                ", ".join(
+                    "{} {} {} (expired {})".format(
+                        e["cloud"], e["zone"], e.get("type", "*"), e["expires"]
+                    )
+                    for e in expired
+                )
+            )
+        )
+    return result
+
+
+# the lifecycle settings that may be given in config/pool-tuning.json
+TUNED_LIFECYCLE_KEYS = ["registrationTimeout", "reregistrationTimeout"]
+
+
+@lru_cache(maxsize=2)
+def pool_tuning():
+    """
+    Return the generated per-pool overrides from config/pool-tuning.json,
+    cached in memory.  It maps workerPoolId to a dict with any of
+    `afterIdleSeconds`, `registrationTimeout` and `reregistrationTimeout`,
+    which are used unless the pool's configuration gives them explicitly.
+    See /misc/tune-pools.py for how this file is generated and updated.
+    The result must not be modified.
+    """
+    tuning_file = os.path.join(config_path(), "pool-tuning.json")
+    with open(tuning_file, "r") as the_file:
+        return json.load(the_file)
+
+
+def tuned_worker_config(workerImplementation, tuning):
+    """
+    Return the worker config setting the idle timeout from a pool's entry in
+    config/pool-tuning.json, or an empty dict if it has none.
+    """
+    if "afterIdleSeconds" not in tuning:
+        return {}
+    if workerImplementation == "generic-worker":
+        return {
+            "genericWorker": {
+                "config": {"idleTimeoutSecs": tuning["afterIdleSeconds"]},
+            },
+        }
+    if workerImplementation == "docker-worker":
+        return {"shutdown": {"afterIdleSeconds": tuning["afterIdleSeconds"]}}
+    return {}
+
+
+def quarantined(cloud, zone, machineType):
+    """
+    Return True if the machine type, or the whole zone (or AWS availability
+    zone, or Azure location), is quarantined.
+    """
+    zones = quarantined_zones()
+    return (cloud, zone, None) in zones or (cloud, zone, machineType) in zones
+
+
 @lru_cache(maxsize=2)
 def gcp_machine_types_by_zone():
     """
@@ -276,7 +677,7 @@ def gcp_machine_types_by_zone():
 
     The instances are read from config/gce-machine-type-offerings.json and
     cached in memory.
-    See /misc/update-gce-machine-types.sh for how this file is generated and updated.
+    See /misc/update-offerings.py for how this file is generated and updated.
     """
     offerings_file = os.path.join(config_path(), "gce-machine-type-offerings.json")
     with open(offerings_file, "r") as the_file:
@@ -296,7 +697,14 @@ def gcp(
     machineTypes={
         "zones/{zone}/machineTypes/n2-standard-4": 1,
     },
+    capacityPer=None,
     diskSizeGb=60,
+    diskType=None,
+    provisionedIops=None,
+    provisionedThroughput=None,
+    localSsds=0,
+    localSsdDirectory=None,
+    onDemandFallback=None,
     **cfg,
 ):
     """
@@ -307,20 +715,38 @@ def gcp(
       maxCapacity: maximum capacity to run at any time (required)
       machineTypes: dict of fully qualified gcp machine type names to
                     capacityPerInstance (default
-                    {"zones/{zone}/machineTypes/n2-standard-4": 1})
+                    {"zones/{zone}/machineTypes/n2-standard-4": 1}); a null
+                    capacityPerInstance is computed from capacityPer
+      capacityPer: resources used by each task, as a dict with keys vcpus,
+                   memoryGb and/or localDiskGb (optional)
       diskSizeGb: boot disk size, in GB (defaults to 60)
+      diskType: boot disk type, such as "pd-ssd" or "hyperdisk-balanced"
+                (defaults to the GCE default, pd-standard)
+      provisionedIops: IOPS to provision for the boot disk (pd-extreme and
+                       hyperdisk only)
+      provisionedThroughput: throughput to provision for the boot disk, in
+                             MiB/s (hyperdisk only)
+      localSsds: number of 375GB local NVMe SSDs to attach (default 0)
+      localSsdDirectory: if given, the local SSDs are formatted and mounted
+                         here at boot, before the worker starts, and
+                         generic-worker keeps its tasks, caches and downloads
+                         there; the image set must have gcp.localSsdMount
+      onDemandFallback: if given, as {initialWeight, maxCapacity}, also
+                        generate a standard (non-spot) launch config for each
+                        spot launch config, weighted at initialWeight
+                        (default 0.1) times its weight, with maxCapacity
+                        shared between them (see apply_on_demand_fallback)
     """
 
-    image = image_set.gcp["image"]
+    image = image_set.gcp_image
+    assert image, "image set {} has no gcp image".format(image_set.name)
 
     GOOGLE_PROVIDER = "community-tc-workers-google"
 
     # Use local yaml file for GCP network constants
     # These constants are set in a separate file to be used by external services
     # like the fuzzing team decision tasks
-    _config_path = os.path.join(os.path.dirname(__file__), "../config/gcp.yml")
-    assert os.path.exists(_config_path), "Missing gcp config in {}".format(_config_path)
-    gcp_config = yaml.safe_load(open(_config_path))
+    gcp_config = cloud_config("gcp")
 
     GOOGLE_ZONES_REGIONS = [
         ("{}-{}".format(region, zone), region)
@@ -339,30 +765,131 @@ def gcp(
 
     assert maxCapacity, "must give a maxCapacity"
     assert machineTypes, "must give machineTypes"
+    capacities = capacities_per_instance(
+        "gcp", machineTypes, capacityPer, name=lambda mt: mt.split("/")[-1]
+    )
+    for machineType in machineTypes:
+        check_gcp_disks(
+            machineType.split("/")[-1],
+            diskType,
+            provisionedIops,
+            provisionedThroughput,
+            localSsds,
+        )
+    if localSsdDirectory:
+        assert localSsds, "localSsdDirectory requires localSsds"
+        assert (
+            image_set.workerImplementation == "generic-worker"
+        ), "localSsdDirectory is only supported for generic-worker"
+        assert image_set.gcp.get("localSsdMount"), (
+            f"localSsdDirectory requires an image set with gcp.localSsdMount,"
+            f" which {image_set.name} does not have"
+        )
+    disks = dict(
+        diskType=diskType,
+        provisionedIops=provisionedIops,
+        provisionedThroughput=provisionedThroughput,
+        localSsds=localSsds,
+        localSsdDirectory=localSsdDirectory,
+    )
     wp = DynamicWorkerPoolSettings(GOOGLE_PROVIDER)
     wp.config = {
         "maxCapacity": maxCapacity,
         "minCapacity": minCapacity,
         "launchConfigs": [
             gcp_launch_config(
-                zone, region, machineType, capacityPerInstance, image, diskSizeGb, **cfg
+                zone,
+                region,
+                machineType,
+                capacityPerInstance,
+                image,
+                diskSizeGb,
+                disks=disks,
+                **cfg,
             )
-            for machineType, capacityPerInstance in machineTypes.items()
+            for machineType, capacityPerInstance in capacities.items()
             for zone, region in GOOGLE_ZONES_REGIONS
             if machine_in_zone(machineType, zone)
+            and not quarantined("gcp", zone, machineType.split("/")[-1])
         ],
     }
 
     assert len(wp.config["launchConfigs"]) != 0, (
         f"No configured GCP zones ({', '.join(zone for zone, r in GOOGLE_ZONES_REGIONS)})"
         f" support machine types {', '.join(mt.split('/')[-1] for mt in machineTypes)}"
+        " outside of config/zone-quarantine.yml"
     )
+    if onDemandFallback:
+        check_on_demand_fallback(onDemandFallback)
+        # build the fallbacks before adding any, so they are not built from
+        # each other
+        wp.on_demand_fallbacks = [
+            (lc, gcp_standard_launch_config(lc)) for lc in wp.config["launchConfigs"]
+        ]
+        wp.config["launchConfigs"].extend(
+            fallback for _, fallback in wp.on_demand_fallbacks
+        )
 
     return wp
 
 
+def gcp_standard_launch_config(launchConfig):
+    """
+    Return a copy of a spot GCP launch config using standard provisioning.
+    """
+    launchConfig = copy.deepcopy(launchConfig)
+    scheduling = launchConfig["scheduling"]
+    scheduling["provisioningModel"] = "STANDARD"
+    scheduling.pop("instanceTerminationAction", None)
+    return launchConfig
+
+
+def check_on_demand_fallback(onDemandFallback):
+    """
+    Check a pool's onDemandFallback option.
+    """
+    unknown = set(onDemandFallback) - {"initialWeight", "maxCapacity"}
+    if unknown:
+        raise ValueError(f"unknown onDemandFallback options {sorted(unknown)}")
+    if "maxCapacity" not in onDemandFallback:
+        raise ValueError("onDemandFallback must give a maxCapacity")
+    if not 0 < onDemandFallback.get("initialWeight", 0.1) < 1:
+        raise ValueError("onDemandFallback.initialWeight must be between 0 and 1")
+
+
+def apply_on_demand_fallback(wp, onDemandFallback):
+    """
+    Set the workerManager settings of a pool's on-demand fallback launch
+    configs, given its onDemandFallback option.  Each is weighted at the
+    option's initialWeight (default 0.1) times the weight of its spot launch
+    config, so that it is chosen less often than that launch config.  The
+    option's maxCapacity caps the whole on-demand tier: it is split among the
+    fallbacks by weight, and fallbacks left without any capacity are dropped.
+    """
+    fraction = onDemandFallback.get("initialWeight", 0.1)
+    weights = [
+        spot.get("workerManager", {}).get("initialWeight", 1) * fraction
+        for spot, _ in wp.on_demand_fallbacks
+    ]
+    capacities = split_capacity(onDemandFallback["maxCapacity"], weights)
+    dropped = set()
+    for (_, fallback), weight, capacity in zip(
+        wp.on_demand_fallbacks, weights, capacities
+    ):
+        if not capacity:
+            dropped.add(id(fallback))
+            continue
+        fallback["workerManager"] = merge(
+            {"initialWeight": round(weight, 6), "maxCapacity": capacity},
+            fallback.get("workerManager", {}),
+        )
+    wp.config["launchConfigs"] = [
+        lc for lc in wp.config["launchConfigs"] if id(lc) not in dropped
+    ]
+
+
 def gcp_launch_config(
-    zone, region, machineType, capacityPerInstance, image, diskSizeGb, **cfg
+    zone, region, machineType, capacityPerInstance, image, diskSizeGb, disks={}, **cfg
 ):
     default_launch_config = {
         "machineType": machineType.format(zone=zone),
@@ -373,17 +900,7 @@ def gcp_launch_config(
             "provisioningModel": "SPOT",
             "instanceTerminationAction": "DELETE",
         },
-        "disks": [
-            {
-                "type": "PERSISTENT",
-                "boot": True,
-                "autoDelete": True,
-                "initializeParams": {
-                    "sourceImage": image,
-                    "diskSizeGb": diskSizeGb,
-                },
-            },
-        ],
+        "disks": gcp_disks(zone, image, diskSizeGb, **disks),
         "networkInterfaces": [{"accessConfigs": [{"type": "ONE_TO_ONE_NAT"}]}],
         "workerManager": merge(
             {
@@ -392,10 +909,136 @@ def gcp_launch_config(
             get_worker_manager_overrides(
                 cfg,
                 {"region": region, "zone": zone, "machineType": machineType},
+                cloud="gcp",
             ),
         ),
     }
-    return merge(cfg.get("launchConfig", {}), default_launch_config)
+    if disks.get("localSsdDirectory"):
+        directory = disks["localSsdDirectory"]
+        # the image mounts the local SSDs here before starting the worker;
+        # see imagesets/local-ssd.sh
+        default_launch_config["metadata"] = {
+            "items": [{"key": "local-ssd-directory", "value": directory}],
+        }
+        default_launch_config["workerConfig"] = {
+            "genericWorker": {
+                "config": {
+                    "tasksDir": f"{directory}/tasks",
+                    "cachesDir": f"{directory}/caches",
+                    "downloadsDir": f"{directory}/downloads",
+                },
+            },
+        }
+    launchConfig = merge(cfg.get("launchConfig", {}), default_launch_config)
+
+    # merge does not merge lists, so add any metadata items of the pool's
+    # launchConfig to the generated ones
+    pool_items = cfg.get("launchConfig", {}).get("metadata", {}).get("items", [])
+    if pool_items and "metadata" in default_launch_config:
+        items = default_launch_config["metadata"]["items"]
+        keys = {item["key"] for item in items}
+        for item in pool_items:
+            if item["key"] in keys:
+                raise ValueError(f"launchConfig.metadata cannot set {item['key']}")
+        launchConfig["metadata"]["items"] = pool_items + items
+    return launchConfig
+
+
+@lru_cache(maxsize=2)
+def gcp_machine_families():
+    """
+    Return the disk support of each GCE machine family, read from
+    config/gce-machine-families.yml and cached in memory.  The result must not
+    be modified.
+    """
+    families_file = os.path.join(config_path(), "gce-machine-families.yml")
+    with open(families_file, "r") as the_file:
+        return yaml.safe_load(the_file)
+
+
+def check_gcp_disks(
+    machineType, diskType, provisionedIops, provisionedThroughput, localSsds
+):
+    """
+    Check that a machine type supports the given disk options.
+    """
+    if diskType is None and not localSsds:
+        if provisionedIops is not None or provisionedThroughput is not None:
+            raise ValueError("provisioned performance requires a diskType")
+        return
+    family = gcp_machine_families().get(machineType.split("-")[0])
+    if family is None:
+        raise ValueError(f"disk support for machine type {machineType} is not known")
+    if diskType is not None and diskType not in family["diskTypes"]:
+        raise ValueError(f"machine type {machineType} does not support {diskType}")
+    if provisionedIops is not None and not (
+        diskType == "pd-extreme" or diskType.startswith("hyperdisk-")
+    ):
+        raise ValueError(f"{diskType} does not support provisionedIops")
+    if provisionedThroughput is not None and not diskType.startswith("hyperdisk-"):
+        raise ValueError(f"{diskType} does not support provisionedThroughput")
+    if localSsds:
+        shape = machine_shapes("gcp").get(machineType)
+        if shape is None:
+            raise ValueError(f"no shape is known for gcp machine type {machineType}")
+        allowed = next(
+            (
+                counts
+                for vcpus, counts in sorted(family["localSsds"].items())
+                if shape["vcpus"] <= vcpus
+            ),
+            [],
+        )
+        if localSsds not in allowed:
+            raise ValueError(
+                f"machine type {machineType} supports {allowed} local SSDs,"
+                f" not {localSsds}"
+            )
+
+
+def gcp_disks(
+    zone,
+    image,
+    diskSizeGb,
+    diskType=None,
+    provisionedIops=None,
+    provisionedThroughput=None,
+    localSsds=0,
+    localSsdDirectory=None,
+):
+    """
+    Return the `disks` of a GCP launch config: a boot disk, then any local SSDs.
+    """
+    initializeParams = {
+        "sourceImage": image,
+        "diskSizeGb": diskSizeGb,
+    }
+    if diskType is not None:
+        initializeParams["diskType"] = f"zones/{zone}/diskTypes/{diskType}"
+    if provisionedIops is not None:
+        initializeParams["provisionedIops"] = provisionedIops
+    if provisionedThroughput is not None:
+        initializeParams["provisionedThroughput"] = provisionedThroughput
+    disks = [
+        {
+            "type": "PERSISTENT",
+            "boot": True,
+            "autoDelete": True,
+            "initializeParams": initializeParams,
+        },
+    ]
+    for _ in range(localSsds):
+        disks.append(
+            {
+                "type": "SCRATCH",
+                "autoDelete": True,
+                "interface": "NVME",
+                "initializeParams": {
+                    "diskType": f"zones/{zone}/diskTypes/local-ssd",
+                },
+            }
+        )
+    return disks
 
 
 @lru_cache(maxsize=100)
@@ -408,7 +1051,7 @@ def aws_instance_types_in_availability_zone(az):
 
     The instances are read from JSONs file in config/ec2-instance-type-offerings,
     and cached in memory.
-    See /misc/update-ec2-instance-types.sh for how these are generated and updated.
+    See /misc/update-offerings.py for how these are generated and updated.
     """
     offerings_file = os.path.join(
         config_path(), "ec2-instance-type-offerings", f"{az}.json"
@@ -427,9 +1070,13 @@ def aws(
         "m4.2xlarge": 1,
         "m5.2xlarge": 1,
     },
+    capacityPer=None,
     securityGroups=["no-inbound"],
     minCapacity=0,
     maxCapacity=None,
+    rootVolume=None,
+    ebsVolumes=[],
+    instanceStore=True,
     **cfg,
 ):
     """
@@ -438,30 +1085,43 @@ def aws(
       image_set: ImageSets.Item class instance with worker config, image names etc
       regions: regions to deploy to (required)
       instanceTypes: dict of instance types to provision, values are
-                     capacityPerInstance (required)
+                     capacityPerInstance (required); a null
+                     capacityPerInstance is computed from capacityPer
+      capacityPer: resources used by each task, as a dict with keys vcpus,
+                   memoryGb and/or localDiskGb (optional)
       securityGroups: list of the security groups to apply (default ["no-inbound"])
       minCapacity: minimum capacity to run at any time (default 0)
       maxCapacity: maximum capacity to run at any time (required)
+      rootVolume: EBS root volume settings, as a dict with keys type (such as
+                  gp3 or io2), sizeGb, iops, throughput (MiB/s) and
+                  deviceName, which is required and must be the AMI's root
+                  device name (/dev/sda1 or /dev/xvda) (default: as in the AMI)
+      ebsVolumes: list of additional EBS volumes, with the same keys as
+                  rootVolume; deviceName is required
+      instanceStore: map the instance type's instance store volumes
+                     (default true)
+
+    rootVolume, ebsVolumes and instanceStore may be keyed-by region, az or
+    instanceType.
     """
 
     assert maxCapacity, "must give a maxCapacity"
     assert instanceTypes, "must give instanceTypes"
+    capacities = capacities_per_instance("aws", instanceTypes, capacityPer)
 
     AWS_PROVIDER = "community-tc-workers-aws"
 
     # Use local yaml file for AWS network constants
     # These constants are set in a separate file to be used by external services
     # like the fuzzing team decision tasks
-    _config_path = os.path.join(os.path.dirname(__file__), "../config/aws.yml")
-    assert os.path.exists(_config_path), "Missing aws config in {}".format(_config_path)
-    aws_config = yaml.safe_load(open(_config_path))
+    aws_config = cloud_config("aws")
 
     # by default, deploy where there are images
     if "regions" not in cfg:
-        regions = list(image_set.aws["amis"])
+        regions = image_set.aws_regions
     assert regions, "must give regions"
 
-    imageIds = image_set.aws["amis"]
+    imageIds = image_set.aws_image_ids
     assert imageIds, "must give imageIds"
 
     launchConfigs = []
@@ -470,11 +1130,13 @@ def aws(
             aws_config["security_groups"][region][group] for group in securityGroups
         ]
         for az, subnetId in aws_config["subnets"][region].items():
-            for instanceType, capacityPerInstance in instanceTypes.items():
+            for instanceType, capacityPerInstance in capacities.items():
                 # Filter out availability zones where the required instance type
                 # is not available.
                 if instanceType not in aws_instance_types_in_availability_zone(az):
                     continue
+                if quarantined("aws", az, instanceType):
+                    continue
                 launchConfig = {
                     "region": region,
                     "launchConfig": {
@@ -492,14 +1154,27 @@ def aws(
                         get_worker_manager_overrides(
                             cfg,
                             {"region": region, "az": az, "instanceType": instanceType},
+                            cloud="aws",
                         ),
                     ),
                 }
 
+                attrs = {"region": region, "az": az, "instanceType": instanceType}
+                blockDeviceMappings = aws_block_device_mappings(
+                    instanceType,
+                    evaluate_keyed_by(rootVolume, "rootVolume", attrs),
+                    evaluate_keyed_by(ebsVolumes, "ebsVolumes", attrs),
+                    evaluate_keyed_by(instanceStore, "instanceStore", attrs),
+                )
+                if blockDeviceMappings:
+                    launchConfig["launchConfig"][
+                        "BlockDeviceMappings"
+                    ] = blockDeviceMappings
+
                 launchConfigs.append(launchConfig)
     assert launchConfigs, (
         f"The regions {regions} do not support instance types"
-        f" {list(instanceTypes.keys())}"
+        f" {list(instanceTypes.keys())} outside of config/zone-quarantine.yml"
     )
 
     wp = DynamicWorkerPoolSettings(AWS_PROVIDER)
@@ -511,6 +1186,64 @@ def aws(
     return wp
 
 
+def aws_ebs_mapping(volume):
+    """
+    Return a BlockDeviceMapping for an EBS volume given as a pool option.
+    """
+    unknown = set(volume) - {"deviceName", "type", "sizeGb", "iops", "throughput"}
+    if unknown:
+        raise ValueError("unknown EBS volume options {}".format(sorted(unknown)))
+    volumeType = volume.get("type")
+    if "iops" in volume and volumeType not in ("gp3", "io1", "io2"):
+        raise ValueError(f"EBS volume type {volumeType} does not support iops")
+    if "throughput" in volume and volumeType != "gp3":
+        raise ValueError(f"EBS volume type {volumeType} does not support throughput")
+    ebs = {"DeleteOnTermination": True}
+    for option, key in [
+        ("type", "VolumeType"),
+        ("sizeGb", "VolumeSize"),
+        ("iops", "Iops"),
+        ("throughput", "Throughput"),
+    ]:
+        if option in volume:
+            ebs[key] = volume[option]
+    return {"DeviceName": volume["deviceName"], "Ebs": ebs}
+
+
+def aws_block_device_mappings(instanceType, rootVolume, ebsVolumes, instanceStore):
+    """
+    Return the BlockDeviceMappings for an instance type: the root volume, any
+    additional EBS volumes, and then its instance store volumes, on the next
+    free /dev/sd? device names.
+    """
+    mappings = []
+    if rootVolume:
+        # AMIs differ in their root device name, and a mapping with any other
+        # name would add a second volume rather than change the root volume
+        if rootVolume.get("deviceName") not in AWS_ROOT_DEVICE_NAMES:
+            raise ValueError(
+                "rootVolume must give the deviceName of the AMI's root device,"
+                " one of {}".format(sorted(AWS_ROOT_DEVICE_NAMES))
+            )
+        mappings.append(aws_ebs_mapping(rootVolume))
+    for volume in ebsVolumes or []:
+        if "deviceName" not in volume:
+            raise ValueError("ebsVolumes entries must give a deviceName")
+        mappings.append(aws_ebs_mapping(volume))
+    if instanceStore:
+        used = {m["DeviceName"] for m in mappings}
+        free = (
+            f"/dev/sd{c}"
+            for c in "bcdefghijklmnopqrstuvwxy"
+            if f"/dev/sd{c}" not in used
+        )
+        for i in range(
+            machine_shapes("aws").get(instanceType, {}).get("localDisks", 0)
+        ):
+            mappings.append({"DeviceName": next(free), "VirtualName": f"ephemeral{i}"})
+    return mappings
+
+
 @lru_cache(maxsize=100)
 def azure_machine_types_in_location(location):
     """
@@ -520,7 +1253,7 @@ def azure_machine_types_in_location(location):
 
     The instances are read from JSON files in config/azure-vm-size-offerings, and
     cached in memory.
-    See /misc/update-azure-vm-sizes.sh for how this file is generated and updated.
+    See /misc/update-offerings.py for how this file is generated and updated.
     """
     offerings_file = os.path.join(
         config_path(), "azure-vm-size-offerings", f"{location}.json"
@@ -530,24 +1263,48 @@ def azure_machine_types_in_location(location):
     return set(data)
 
 
-def _build_arm_template_launch_config(
+def azure_ephemeral_os_disk_placement(vmSize, diskSizeGb):
+    """
+    Return the placement (NvmeDisk, CacheDisk or ResourceDisk) of an ephemeral
+    OS disk of the given size on a VM size, preferring the fastest with room
+    for it, or None if the VM size cannot host it.
+    """
+    shape = machine_shapes("azure").get(vmSize)
+    if shape is None:
+        raise ValueError(f"no shape is known for azure VM size {vmSize}")
+    if not shape.get("ephemeralOsDisk"):
+        return None
+    for placement, key in [
+        ("NvmeDisk", "nvmeDiskGb"),
+        ("CacheDisk", "cacheDiskGb"),
+        ("ResourceDisk", "localDiskGb"),
+    ]:
+        if shape.get(key, 0) >= diskSizeGb:
+            return placement
+    return None
+
+
+# Memoized pool-independent parts of ARM template launch configs, keyed by
+# (image set name, location, vmSize, digest of the pool's overrides)
+_ARM_TEMPLATE_CACHE = {}
+
+
+def _build_arm_template_deployment(
     *,
     image_set,
     pool_arm_deployment,
     pool_arm_deployment_resource_group,
     location,
     vmSize,
-    capacityPerInstance,
     imageId,
     subnetId,
-    cfg,
+    priority,
 ):
     """
-    Create a launch config for ARM template deployment.
-
-    Auto-injects the common parameters (vmSize, imageId, location, subnetId) and merges
-    them with user-provided parameters. Templates are specified via template specs; only
-    the template spec ID and parameters are supported in configuration.
+    Create the `armDeployment` and `armDeploymentResourceGroup` portions of an
+    ARM template launch config, or return None if no ARM deployment is
+    configured.  These do not depend on the worker pool except through the
+    given overrides, so they can be shared between pools.
     """
     attrs = {"location": location, "vmSize": vmSize}
 
@@ -556,18 +1313,7 @@ def _build_arm_template_launch_config(
             return None
         return evaluate_keyed_by(value, item_name, attrs)
 
-    def normalize(parameters):
-        normalized = {}
-        for key, value in (parameters or {}).items():
-            if isinstance(value, dict) and "value" in value:
-                normalized[key] = value
-            else:
-                normalized[key] = {"value": value}
-        return normalized
-
-    base_arm_deployment = (
-        evaluate(image_set.azure.get("armDeployment"), "armDeployment") or {}
-    )
+    base_arm_deployment = image_set.arm_deployment(location, vmSize)
     override_arm_deployment = evaluate(pool_arm_deployment, "armDeployment") or {}
 
     if not base_arm_deployment and not override_arm_deployment:
@@ -581,8 +1327,10 @@ def _build_arm_template_launch_config(
             "armDeployment.templateSpecId must be provided via imageset or pool override"
         )
 
-    parameters = normalize(base_arm_deployment.get("parameters"))
-    parameters.update(normalize(override_arm_deployment.get("parameters")))
+    parameters = dict(base_arm_deployment.get("parameters", {}))
+    parameters.update(
+        normalize_arm_parameters(override_arm_deployment.get("parameters"))
+    )
 
     auto_defaults = {
         "vmSize": {"value": vmSize},
@@ -590,20 +1338,86 @@ def _build_arm_template_launch_config(
         "location": {"value": location},
         "subnetId": {"value": subnetId},
     }
-    if "priority" in parameters or cfg.get("priority") is not None:
-        auto_defaults["priority"] = {"value": cfg.get("priority", "Spot")}
+    if "priority" in parameters or priority is not None:
+        auto_defaults["priority"] = {"value": "Spot" if priority is None else priority}
 
     for key, value in auto_defaults.items():
         parameters.setdefault(key, value)
 
-    deployment = {
-        "mode": "Incremental",
-        "templateLink": {"id": template_spec_id},
-        "parameters": parameters,
+    template = {
+        "armDeployment": {
+            "mode": "Incremental",
+            "templateLink": {"id": template_spec_id},
+            "parameters": parameters,
+        },
     }
 
+    # Add armDeploymentResourceGroup if specified
+    base_arm_rg = image_set.arm_deployment_resource_group(location, vmSize)
+    override_arm_rg = evaluate(
+        pool_arm_deployment_resource_group,
+        "armDeploymentResourceGroup",
+    )
+    armDeploymentResourceGroup = override_arm_rg or base_arm_rg
+    if armDeploymentResourceGroup:
+        template["armDeploymentResourceGroup"] = armDeploymentResourceGroup
+
+    return template
+
+
+def _build_arm_template_launch_config(
+    *,
+    image_set,
+    pool_arm_deployment,
+    pool_arm_deployment_resource_group,
+    location,
+    vmSize,
+    capacityPerInstance,
+    imageId,
+    subnetId,
+    cfg,
+):
+    """
+    Create a launch config for ARM template deployment.
+
+    Auto-injects the common parameters (vmSize, imageId, location, subnetId) and merges
+    them with user-provided parameters. Templates are specified via template specs; only
+    the template spec ID and parameters are supported in configuration.
+
+    The deployment itself is memoized across pools sharing an image set; only the
+    pool-specific `workerManager` settings are built for each call.  The result's
+    `armDeployment` is shared and must not be modified.
+    """
+    # imageId and subnetId are determined by the image set and location, so
+    # they need not be part of the digest
+    overrides_digest = hashlib.sha256(
+        json.dumps(
+            [
+                pool_arm_deployment,
+                pool_arm_deployment_resource_group,
+                cfg.get("priority"),
+            ],
+            sort_keys=True,
+        ).encode("utf8")
+    ).hexdigest()
+    key = (image_set.name, location, vmSize, overrides_digest)
+    if key not in _ARM_TEMPLATE_CACHE:
+        _ARM_TEMPLATE_CACHE[key] = _build_arm_template_deployment(
+            image_set=image_set,
+            pool_arm_deployment=pool_arm_deployment,
+            pool_arm_deployment_resource_group=pool_arm_deployment_resource_group,
+            location=location,
+            vmSize=vmSize,
+            imageId=imageId,
+            subnetId=subnetId,
+            priority=cfg.get("priority"),
+        )
+    template = _ARM_TEMPLATE_CACHE[key]
+    if template is None:
+        return None
+
     launchConfig = {
-        "armDeployment": deployment,
+        "armDeployment": template["armDeployment"],
         "workerManager": merge(
             {
                 "capacityPerInstance": capacityPerInstance,
@@ -611,22 +1425,14 @@ def _build_arm_template_launch_config(
             get_worker_manager_overrides(
                 cfg,
                 {"location": location, "vmSize": vmSize},
+                cloud="azure",
             ),
         ),
     }
-
-    # Add armDeploymentResourceGroup if specified
-    base_arm_rg = evaluate(
-        image_set.azure.get("armDeploymentResourceGroup"),
-        "armDeploymentResourceGroup",
-    )
-    override_arm_rg = evaluate(
-        pool_arm_deployment_resource_group,
-        "armDeploymentResourceGroup",
-    )
-    armDeploymentResourceGroup = override_arm_rg or base_arm_rg
-    if armDeploymentResourceGroup:
-        launchConfig["armDeploymentResourceGroup"] = armDeploymentResourceGroup
+    if "armDeploymentResourceGroup" in template:
+        launchConfig["armDeploymentResourceGroup"] = template[
+            "armDeploymentResourceGroup"
+        ]
 
     return launchConfig
 
@@ -641,6 +1447,9 @@ def azure(
     vmSizes={
         "Standard_F16s_v2": 1,
     },
+    capacityPer=None,
+    osDiskSizeGb=128,
+    onDemandFallback=None,
     armDeployment=None,
     armDeploymentResourceGroup=None,
     **cfg,
@@ -653,7 +1462,10 @@ def azure(
       minCapacity: minimum capacity to run at any time (default 0)
       maxCapacity: maximum capacity to run at any time (required)
       vmSizes: dict of VM sizes to provision, values are
-                     capacityPerInstance (required) (default {Standard_F16s_v2: 1})
+                     capacityPerInstance (required) (default {Standard_F16s_v2: 1});
+                     a null capacityPerInstance is computed from capacityPer
+      capacityPer: resources used by each task, as a dict with keys vcpus,
+                   memoryGb and/or localDiskGb (optional)
       armDeployment: Optional ARM template deployment configuration. When provided,
                      uses a template spec to deploy instead of image-based VMSS.
                      Supported keys:
@@ -663,45 +1475,60 @@ def azure(
                        parameters (optional): Values merged with auto-injected parameters
                                               (vmSize, imageId, subnetId, location, priority).
       armDeploymentResourceGroup: Optional resource group for the template deployment.
+      osDiskSizeGb: size of the ephemeral OS disk for image-based deployments,
+                    at least the size of the image (default 128); may be
+                    keyed-by location or vmSize.  The disk is placed on the
+                    VM size's NVMe, cache or resource disk, whichever is the
+                    first large enough, and VM sizes with none are skipped.
+      onDemandFallback: if given, as {initialWeight, maxCapacity}, also
+                        generate a regular (non-spot) launch config for each
+                        spot launch config, weighted at initialWeight
+                        (default 0.1) times its weight, with maxCapacity
+                        shared between them (see apply_on_demand_fallback);
+                        with armDeployment, the parameters must include
+                        priority, which the fallbacks set to Regular
     """
 
     assert maxCapacity, "must give a maxCapacity"
     assert vmSizes, "must give vmSizes"
+    capacities = capacities_per_instance("azure", vmSizes, capacityPer)
 
     AZURE_PROVIDER = "community-tc-workers-azure"
 
     # Use local yaml file for Azure network constants
     # These constants are set in a separate file to be used by external services
     # like the fuzzing team decision tasks
-    _config_path = os.path.join(os.path.dirname(__file__), "../config/azure.yml")
-    assert os.path.exists(_config_path), "Missing azure config in {}".format(
-        _config_path
-    )
-    azure_config = yaml.safe_load(open(_config_path))
+    azure_config = cloud_config("azure")
 
     # by default, deploy where there are images
     if "locations" not in cfg:
-        locations = list(image_set.azure["images"])
+        locations = image_set.azure_locations
     assert locations, "must give locations"
     locations = sorted(locations)
 
-    imageIds = image_set.azure["images"]
+    imageIds = image_set.azure_image_ids
     assert imageIds, "must give imageIds"
 
+    # this will use arm deployment if it is defined in azure.yml or pool config
+    arm_deployment_cfg = {
+        **azure_config.get("armDeployment", {}),
+        **(armDeployment if armDeployment else {}),
+    }
+
+    if onDemandFallback:
+        check_on_demand_fallback(onDemandFallback)
+
     launchConfigs = []
+    fallbacks = []
     for location in locations:
         subnetId = azure_config["subnets"][location]
-        for vmSize, capacityPerInstance in vmSizes.items():
+        for vmSize, capacityPerInstance in capacities.items():
             # Filter out locations where the required VM size
             # is not available.
             if vmSize not in azure_machine_types_in_location(location):
                 continue
-
-            # this will use arm deployment if it is defined in azure.yml or pool config
-            arm_deployment_cfg = {
-                **azure_config.get("armDeployment", {}),
-                **(armDeployment if armDeployment else {}),
-            }
+            if quarantined("azure", location, vmSize):
+                continue
 
             arm_launch_config = _build_arm_template_launch_config(
                 image_set=image_set,
@@ -718,6 +1545,14 @@ def azure(
                 launchConfig = arm_launch_config
             else:
                 # Original image-based deployment
+                diskSizeGb = evaluate_keyed_by(
+                    osDiskSizeGb,
+                    "osDiskSizeGb",
+                    {"location": location, "vmSize": vmSize},
+                )
+                placement = azure_ephemeral_os_disk_placement(vmSize, diskSizeGb)
+                if placement is None:
+                    continue
                 launchConfig = {
                     "location": location,
                     "storageProfile": {
@@ -727,7 +1562,9 @@ def azure(
                             "createOption": "FromImage",
                             "diffDiskSettings": {
                                 "option": "Local",
+                                "placement": placement,
                             },
+                            "diskSizeGB": diskSizeGb,
                         },
                         "imageReference": {
                             "id": imageIds[location],
@@ -752,13 +1589,44 @@ def azure(
                         get_worker_manager_overrides(
                             cfg,
                             {"location": location, "vmSize": vmSize},
+                            cloud="azure",
                         ),
                     ),
                 }
             launchConfigs.append(launchConfig)
+
+            if onDemandFallback:
+                if arm_launch_config:
+                    # a template spec only accepts the parameters it declares,
+                    # so the priority can only be changed for templates known
+                    # to take it
+                    parameters = arm_launch_config["armDeployment"]["parameters"]
+                    if "priority" not in parameters:
+                        raise ValueError(
+                            "onDemandFallback requires the ARM template spec to"
+                            " take a priority parameter; give it (such as"
+                            " priority: Spot) in armDeployment.parameters"
+                        )
+                    # the armDeployment is shared, so it is copied, not modified
+                    fallback = dict(
+                        arm_launch_config,
+                        armDeployment=dict(
+                            arm_launch_config["armDeployment"],
+                            parameters=dict(parameters, priority={"value": "Regular"}),
+                        ),
+                        workerManager=copy.deepcopy(arm_launch_config["workerManager"]),
+                    )
+                else:
+                    fallback = copy.deepcopy(launchConfig)
+                    fallback["priority"] = "regular"
+                    del fallback["evictionPolicy"]
+                fallbacks.append((launchConfig, fallback))
     assert launchConfigs, (
-        f"The locations {locations} do not support VM sizes" f" {list(vmSizes.keys())}"
+        f"The locations {locations} do not support VM sizes"
+        f" {list(vmSizes.keys())} outside of config/zone-quarantine.yml"
+        " with room for an ephemeral OS disk"
     )
+    launchConfigs.extend(fallback for _, fallback in fallbacks)
 
     wp = DynamicWorkerPoolSettings(AZURE_PROVIDER)
     wp.config = {
@@ -766,6 +1634,7 @@ def azure(
         "maxCapacity": maxCapacity,
         "launchConfigs": launchConfigs,
     }
+    wp.on_demand_fallbacks = fallbacks
     return wp
 
 
@@ -806,6 +1675,18 @@ def generic_worker(wp, **cfg):
 
     if wp.supports_worker_manager_config():
         for launchConfig in wp.config["launchConfigs"]:
+            freeGb = required_free_disk_gb(
+                wp.provider_id, launchConfig, cfg.get("capacityPer")
+            )
+            if freeGb is not None:
+                launchConfig["workerConfig"] = merge(
+                    launchConfig.get("workerConfig", {}),
+                    {
+                        "genericWorker": {
+                            "config": {"requiredDiskSpaceMegabytes": freeGb * 1024},
+                        },
+                    },
+                )
             launchConfig.setdefault("workerManager", {}).setdefault(
                 "launchConfigId", get_launch_config_id(launchConfig, wp.workerPoolId)
             )
@@ -831,6 +1712,18 @@ def docker_worker(wp, **cfg):
 
     if wp.supports_worker_manager_config():
         for launchConfig in wp.config["launchConfigs"]:
+            freeGb = required_free_disk_gb(
+                wp.provider_id, launchConfig, cfg.get("capacityPer")
+            )
+            if freeGb is not None:
+                launchConfig["workerConfig"] = merge(
+                    launchConfig.get("workerConfig", {}),
+                    {
+                        "capacityManagement": {
+                            "diskspaceThreshold": freeGb * 1024**3,
+                        },
+                    },
+                )
             launchConfig.setdefault("workerManager", {}).setdefault(
                 "launchConfigId", get_launch_config_id(launchConfig, wp.workerPoolId)
             )
@@ -848,6 +1741,98 @@ def docker_worker(wp, **cfg):
     return wp
 
 
+def launch_config_placement(providerId, launchConfig):
+    """
+    Return (cloud, zone, machine type) for a generated launch config, where the
+    zone is a GCP zone, AWS availability zone or Azure location, or None if
+    the provider is not one of the clouds above.
+    """
+    if providerId == "community-tc-workers-google":
+        return "gcp", launchConfig["zone"], launchConfig["machineType"].split("/")[-1]
+    if providerId == "community-tc-workers-aws":
+        lc = launchConfig["launchConfig"]
+        return "aws", lc["Placement"]["AvailabilityZone"], lc["InstanceType"]
+    if providerId == "community-tc-workers-azure":
+        if "armDeployment" in launchConfig:
+            parameters = launchConfig["armDeployment"]["parameters"]
+            return (
+                "azure",
+                parameters["location"]["value"],
+                parameters["vmSize"]["value"],
+            )
+        return (
+            "azure",
+            launchConfig["location"],
+            launchConfig["hardwareProfile"]["vmSize"],
+        )
+    return None
+
+
+def launch_config_region(providerId, launchConfig):
+    """
+    Return the GCP or AWS region, or Azure location, of a generated launch
+    config, or None if the provider is not one of those clouds.
+    """
+    if providerId in ("community-tc-workers-google", "community-tc-workers-aws"):
+        return launchConfig["region"]
+    placement = launch_config_placement(providerId, launchConfig)
+    return placement[1] if placement else None
+
+
+# the size of each GCP local SSD
+GCP_LOCAL_SSD_GB = 375
+
+# device names of AWS root volumes
+AWS_ROOT_DEVICE_NAMES = {"/dev/sda1", "/dev/xvda"}
+
+
+def launch_config_disk_gb(providerId, launchConfig):
+    """
+    Return the size, in GB, of the disk holding the task, cache and download
+    directories of a generated launch config, or None if it is not known (such
+    as for an AWS root volume sized by the AMI, or an ARM template deployment).
+    """
+    if providerId == "community-tc-workers-google":
+        scratch = [d for d in launchConfig["disks"] if d["type"] == "SCRATCH"]
+        gwConfig = launchConfig.get("workerConfig", {}).get("genericWorker", {})
+        if scratch and "tasksDir" in gwConfig.get("config", {}):
+            return len(scratch) * GCP_LOCAL_SSD_GB
+        return launchConfig["disks"][0]["initializeParams"]["diskSizeGb"]
+    if providerId == "community-tc-workers-aws":
+        for mapping in launchConfig["launchConfig"].get("BlockDeviceMappings", []):
+            if mapping["DeviceName"] in AWS_ROOT_DEVICE_NAMES:
+                return mapping.get("Ebs", {}).get("VolumeSize")
+        return None
+    if providerId == "community-tc-workers-azure":
+        return (
+            launchConfig.get("storageProfile", {}).get("osDisk", {}).get("diskSizeGB")
+        )
+    return None
+
+
+def required_free_disk_gb(providerId, launchConfig, capacityPer):
+    """
+    Return the disk space, in GB, that a worker should keep free for running
+    tasks, evicting caches to make room: enough for capacityPerInstance tasks
+    of the pool's capacityPer.localDiskGb.  Return None, leaving the worker's
+    default, if the pool does not give capacityPer.localDiskGb or the disk
+    size is not known.
+    """
+    taskDiskGb = (capacityPer or {}).get("localDiskGb")
+    if not taskDiskGb:
+        return None
+    diskGb = launch_config_disk_gb(providerId, launchConfig)
+    if diskGb is None:
+        return None
+    capacityPerInstance = launchConfig["workerManager"]["capacityPerInstance"]
+    freeGb = int(taskDiskGb * capacityPerInstance)
+    if freeGb >= diskGb:
+        raise ValueError(
+            f"a {diskGb}GB disk cannot keep {freeGb}GB free for running tasks"
+        )
+    return freeGb
+
+
 def get_launch_config_id(config, worker_pool_id):
     if isinstance(config, dict):
         worker_manager = config.get("workerManager")
@@ -865,12 +1850,27 @@ def get_launch_config_id(config, worker_pool_id):
     return "lc-" + hashedLaunchConfig[:20]
 
 
-def get_worker_manager_overrides(config, attrs):
+def get_worker_manager_overrides(config, attrs, cloud=None):
     initial_weight = evaluate_keyed_by(
         config.get("workerManagerConfig", {}).get("initialWeight", None),
         "initialWeight",
         attrs,
     )
+    if initial_weight == PRICE_PERFORMANCE:
+        if not uses_price_performance(config):
+            raise ValueError(
+                f"initialWeight: {PRICE_PERFORMANCE} must apply to the whole pool"
+            )
+        # this is normalized across the pool by normalize_initial_weights
+        initial_weight = price_performance(
+            cloud,
+            (
+                attrs.get("machineType")
+                or attrs.get("instanceType")
+                or attrs.get("vmSize")
+            ).split("/")[-1],
+            attrs.get("region") or attrs.get("location"),
+        )
     max_capacity = evaluate_keyed_by(
         config.get("workerManagerConfig", {}).get("maxCapacity", None),
         "maxCapacity",
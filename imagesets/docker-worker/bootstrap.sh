@@ -84,4 +84,8 @@ cat > /etc/modprobe.d/kvm-backdoor.conf << "EOF"
 options kvm enable_vmware_backdoor=y
 EOF
 
+# `imageset.sh bootstrap-script` replaces the next line with a run of
+# prefetch.sh, if the image set has a prefetch field in config/imagesets.yml
+# %PREFETCH%
+
 sudo shutdown -h now
@@ -39,7 +39,7 @@ function all-in-parallel {
 
   : ${UPDATE_GCLOUD:=true}
   : ${UPDATE_OFFERINGS:=true}
-  : ${AZURE_VM_SIZES_PARALLEL_PROCESSES:=10}
+  : ${OFFERINGS_PARALLEL_PROCESSES:=10}
 
   export GCP_PROJECT=community-tc-workers
   export AZURE_IMAGE_RESOURCE_GROUP=rg-tc-eng-images
@@ -83,20 +83,11 @@ function all-in-parallel {
   fi
 
   if "${UPDATE_OFFERINGS}"; then
-    echo "Updating EC2 instance types..."
-    misc/update-ec2-instance-types.sh
-    git add 'config/ec2-instance-type-offerings'
-    git commit -m "Ran script misc/update-ec2-instance-types.sh" || true
-
-    echo "Updating Azure VM sizes..."
-    misc/update-azure-vm-sizes.sh "${AZURE_VM_SIZES_PARALLEL_PROCESSES}"
-    git add 'config/azure-vm-size-offerings'
-    git commit -m "Ran script misc/update-azure-vm-sizes.sh" || true
-
-    echo "Updating GCE machine types..."
-    misc/update-gce-machine-types.sh
-    git add 'config/gce-machine-type-offerings.json'
-    git commit -m "Ran script misc/update-gce-machine-types.sh" || true
+    echo "Updating EC2 instance types, Azure VM sizes and GCE machine types..."
+    misc/update-offerings.py --jobs "${OFFERINGS_PARALLEL_PROCESSES}"
+    git add 'config/ec2-instance-type-offerings' 'config/azure-vm-size-offerings' 'config/gce-machine-type-offerings.json'
+    git add 'config/ec2-instance-types.json' 'config/azure-vm-sizes.json' 'config/gce-machine-types.json'
+    git commit -m "Ran script misc/update-offerings.py" || true
 
     retry git push "${OFFICIAL_GIT_REPO}"
     retry tc-admin apply
@@ -143,6 +134,37 @@ function all-in-parallel {
   echo "All done!"
 }
 
+############### Render an image set's bootstrap script ###############
+
+# Write the bootstrap script to run while building an image for the given
+# image set and cloud: imagesets/<image set>/bootstrap.sh, with %MY_CLOUD%
+# replaced by the cloud, and its `# %PREFETCH%` line replaced by a run of
+# prefetch.sh with the image set's `prefetch` field from config/imagesets.yml
+# (or removed, if it has none).
+function bootstrap-script {
+  local IMAGE_SET="${1}"
+  local CLOUD="${2}"
+  local PREFETCH
+  PREFETCH="$(python3 -c '
+import json, sys, yaml
+with open(sys.argv[1]) as f:
+    image_set = yaml.safe_load(f)[sys.argv[2]]
+print(json.dumps(image_set.get("prefetch") or {}, sort_keys=True))
+' "${IMAGESETS_DIR}/../config/imagesets.yml" "${IMAGE_SET}")"
+  while IFS= read -r LINE; do
+    if [ "${LINE}" == '# %PREFETCH%' ]; then
+      if [ "${PREFETCH}" != '{}' ]; then
+        echo 'apt-get install -y curl git jq'
+        echo "bash -s $(printf '%q' "${PREFETCH}") << 'EOF_PREFETCH'"
+        cat "${IMAGESETS_DIR}/prefetch.sh"
+        echo 'EOF_PREFETCH'
+      fi
+    else
+      echo "${LINE//%MY_CLOUD%/${CLOUD}}"
+    fi
+  done < "${IMAGESETS_DIR}/${IMAGE_SET}/bootstrap.sh"
+}
+
 ################## Entry point ##################
 
 cd "$(dirname "${0}")"
@@ -155,3 +177,8 @@ if [ "${1-}" == "all" ]; then
   all-in-parallel
   exit 0
 fi
+
+if [ "${1-}" == "bootstrap-script" ] && [ "${#}" == 3 ]; then
+  bootstrap-script "${2}" "${3}"
+  exit 0
+fi
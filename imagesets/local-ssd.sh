@@ -0,0 +1,69 @@
+#!/bin/bash
+
+# This script is run while building a Linux image for GCP, for image sets with
+# `localSsdMount: true` in their `gcp` field in /config/imagesets.yml, with the
+# name of the systemd unit that starts the worker in the image:
+#
+#   local-ssd.sh worker.service
+#
+# The image build workflows triggered by rel-sre-imagesets.py are asked to run
+# it by their `localSsdMount` input.  It installs a systemd unit which, at boot, formats the instance's local NVMe
+# SSDs (striped, if there are several) and mounts them at the directory given
+# in the instance's `local-ssd-directory` metadata attribute.  That attribute
+# is set by generate/workers.py for pools with `localSsdDirectory`, which keep
+# generic-worker's tasks, caches and downloads directories there.
+#
+# The unit runs before the worker's unit, which does not start if the mount
+# fails, so that the worker never creates those directories on the
+# boot disk.  Instances without the metadata attribute are left alone.
+#
+# You will need apt-get and systemctl in your PATH.
+
+set -exv
+set -o pipefail
+
+WORKER_SERVICE="${1:?give the name of the systemd unit that starts the worker}"
+
+apt-get install -y mdadm
+
+cat > /usr/local/bin/mount-local-ssds << 'EOF_SCRIPT'
+#!/bin/bash
+set -eu
+set -o pipefail
+url=http://metadata.google.internal/computeMetadata/v1/instance/attributes/local-ssd-directory
+status="$(curl --silent --retry 5 --header 'Metadata-Flavor: Google' --output /run/local-ssd-directory --write-out '%{http_code}' "${url}")"
+if [ "${status}" = 404 ]; then
+  echo "no local-ssd-directory metadata; not mounting local SSDs"
+  exit 0
+fi
+[ "${status}" = 200 ]
+directory="$(cat /run/local-ssd-directory)"
+devices=(/dev/disk/by-id/google-local-nvme-ssd-*)
+device="${devices[0]}"
+if [ "${#devices[@]}" -gt 1 ]; then
+  mdadm --create /dev/md0 --run --level=0 --raid-devices="${#devices[@]}" "${devices[@]}"
+  device=/dev/md0
+fi
+mkfs.ext4 -F "${device}"
+mkdir -p "${directory}"
+mount -o discard,defaults "${device}" "${directory}"
+EOF_SCRIPT
+chmod 755 /usr/local/bin/mount-local-ssds
+
+cat > /etc/systemd/system/local-ssd.service << EOF_UNIT
+[Unit]
+Description=Mount local SSDs for the worker
+Wants=network-online.target
+After=network-online.target
+Before=${WORKER_SERVICE}
+
+[Service]
+Type=oneshot
+RemainAfterExit=yes
+ExecStart=/usr/local/bin/mount-local-ssds
+
+[Install]
+WantedBy=multi-user.target
+RequiredBy=${WORKER_SERVICE}
+EOF_UNIT
+systemctl enable local-ssd.service
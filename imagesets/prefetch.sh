@@ -0,0 +1,46 @@
+#!/bin/bash
+
+# This script bakes the content listed in an image set's `prefetch` field in
+# /config/imagesets.yml into a Linux machine image, so that the first tasks on
+# a new worker do not have to fetch it.  It is run while building the image,
+# with the `prefetch` field as JSON, either as the first argument or on
+# standard input, by the bootstrap scripts written by
+# `imageset.sh bootstrap-script`, or by the image build workflows triggered by
+# rel-sre-imagesets.py, from their `prefetch` input:
+#
+#   prefetch.sh '{"dockerImages": ["ubuntu:24.04"], "gitMirrors": {"gecko-dev": "https://github.com/mozilla/gecko-dev"}}'
+#
+# Docker images are pulled into the image's docker daemon.  Artifacts and git
+# mirrors are stored under PREFETCH_DIR (which must match PREFETCH_DIR in
+# generate/imagesets.py, where generic-worker pools are told about them in
+# their workerTypeMetadata).
+#
+# You will need docker, curl, git and jq in your PATH.
+
+set -exv
+set -o pipefail
+
+PREFETCH_DIR=/var/cache/taskcluster-prefetch
+
+if [ -n "${1-}" ]; then
+  PREFETCH="${1}"
+else
+  PREFETCH="$(cat)"
+fi
+
+jq -r '.dockerImages // [] | .[]' <<< "${PREFETCH}" | while read -r IMAGE; do
+  docker pull "${IMAGE}"
+done
+
+mkdir -p "${PREFETCH_DIR}/artifacts" "${PREFETCH_DIR}/gitMirrors"
+
+jq -r '.artifacts // {} | to_entries[] | "\(.key) \(.value)"' <<< "${PREFETCH}" | while read -r NAME URL; do
+  curl --fail --location --retry 5 --output "${PREFETCH_DIR}/artifacts/${NAME}" "${URL}"
+done
+
+jq -r '.gitMirrors // {} | to_entries[] | "\(.key) \(.value)"' <<< "${PREFETCH}" | while read -r NAME URL; do
+  git clone --mirror "${URL}" "${PREFETCH_DIR}/gitMirrors/${NAME}.git"
+done
+
+# tasks run as unprivileged users, and may only read the prefetched content
+chmod -R a+rX,go-w "${PREFETCH_DIR}"
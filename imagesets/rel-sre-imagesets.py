@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import json
 import os
 import time
 import requests
@@ -96,10 +97,41 @@ def title_to_config(title: str | None) -> str | None:
     return (right or title).strip()
 
 
+def prefetch_input(config: str) -> str | None:
+    """
+    Return the image set's `prefetch` field from imagesets.yml as JSON, for
+    the build to pass to imagesets/prefetch.sh, or None if it has none.
+    """
+    with open(IMAGESETS_FILE, "r") as f:
+        prefetch = (yaml.load(f).get(config) or {}).get("prefetch")
+    return json.dumps(prefetch, sort_keys=True) if prefetch else None
+
+
+def local_ssd_mount(workflow_file: str, config: str) -> bool:
+    """
+    Return True if the image set has `localSsdMount: true` in its `gcp` field
+    in imagesets.yml and the workflow builds GCP images, so that the build
+    should run imagesets/local-ssd.sh.
+    """
+    if get_cloud_provider(workflow_file) != "gcp":
+        return False
+    with open(IMAGESETS_FILE, "r") as f:
+        gcp = (yaml.load(f).get(config) or {}).get("gcp") or {}
+    return bool(gcp.get("localSsdMount"))
+
+
 # ---- GitHub API helpers ----
 def trigger_workflow(workflow_file, config):
     url = f"{API_ROOT}/repos/{REPO}/actions/workflows/{workflow_file}/dispatches"
-    gh(url, "POST", json={"ref": REF, "inputs": {"config": config}})
+    inputs = {"config": config}
+    # only image sets with a prefetch field need the workflow to support this input
+    prefetch = prefetch_input(config)
+    if prefetch:
+        inputs["prefetch"] = prefetch
+    # likewise for image sets with gcp.localSsdMount
+    if local_ssd_mount(workflow_file, config):
+        inputs["localSsdMount"] = "true"
+    gh(url, "POST", json={"ref": REF, "inputs": inputs})
     print(f"🚀 Triggered workflow {workflow_file} for config={config}")
 
 def list_dispatch_runs_for_workflow(workflow_file, per_page=100):
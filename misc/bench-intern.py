@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Measure, with tracemalloc, the memory held by the generated worker pool
+configs when equal subtrees are shared (as generation does) and when each
+pool has its own copy, for a synthetic fleet of --scale times the real one.
+For example:
+
+  misc/bench-intern.py --scale 10
+
+Requires `pip install -e .` in the root of this repository.
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from tcadmin.resources import WorkerPool
+
+from generate import generate_resources
+from generate.utils import InternTable
+
+
+def synthetic_configs(configs, scale):
+    """
+    Yield `scale` copies of each config, each as if freshly generated (and so
+    sharing nothing with the others).
+    """
+    for _ in range(scale):
+        for config in configs:
+            yield copy.deepcopy(config)
+
+
+def measure(configs, scale, intern):
+    """
+    Return (current, peak) memory in bytes after building the synthetic
+    configs, interning them if requested.
+    """
+    tracemalloc.start()
+    table = InternTable() if intern else None
+    held = []
+    for config in synthetic_configs(configs, scale):
+        held.append(table.intern(config) if table else config)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--scale",
+        type=int,
+        default=10,
+        help="number of copies of the real fleet to generate (default 10)",
+    )
+    args = parser.parse_args()
+
+    os.chdir(os.path.join(os.path.dirname(__file__), ".."))
+    resources = asyncio.run(generate_resources())
+    # round-trip through JSON, to start from unshared configs
+    configs = [
+        json.loads(json.dumps(r.config)) for r in resources if isinstance(r, WorkerPool)
+    ]
+    print(f"{len(configs)} pools, x{args.scale}")
+
+    for label, intern in [("copies", False), ("interned", True)]:
+        start = time.perf_counter()
+        current, peak = measure(configs, args.scale, intern)
+        elapsed = time.perf_counter() - start
+        print(
+            "{:>8}: {:8.1f} MiB held, {:8.1f} MiB peak, {:.2f}s".format(
+                label, current / 2**20, peak / 2**20, elapsed
+            )
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
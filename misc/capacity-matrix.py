@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Export, as CSV, the most capacity and vCPUs the generated worker pools can
+run, by any of project, pool, cloud, region, machine family and machine type.
+For example:
+
+  # by project, region and family (the default)
+  misc/capacity-matrix.py
+
+  # could all fuzzing pools at their maximum exceed a quota in us-east1?
+  misc/capacity-matrix.py --by region,family --where project=fuzzing \\
+      --where region=us-east1
+
+Each pool can run at most its maxCapacity, and at most each launch config's
+maxCapacity in that launch config.  Within a row, a pool's vCPUs are counted
+as if it filled its capacity from the launch configs with the most vCPUs per
+unit of capacity first, so the figures are upper bounds.
+
+Requires `pip install -e .` in the root of this repository.
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import re
+import sys
+from collections import defaultdict
+
+from tcadmin.resources import WorkerPool
+
+from generate import generate_resources
+from generate.quotas import pool_vcpus
+from generate.workers import (
+    launch_config_placement,
+    launch_config_region,
+    machine_shapes,
+)
+
+# the attributes by which the matrix can be aggregated
+KEYS = ["project", "pool", "cloud", "region", "family", "machineType"]
+
+
+def machine_family(cloud, machineType):
+    """
+    Return the family of a machine type, such as "n2" for "n2-standard-4",
+    "m5" for "m5.large" or "Fs_v2" for "Standard_F8s_v2".
+    """
+    if cloud == "gcp":
+        return machineType.split("-")[0]
+    if cloud == "aws":
+        return machineType.split(".")[0]
+    return re.sub(r"\d+", "", machineType.removeprefix("Standard_"))
+
+
+def matrix_cells(workerPool):
+    """
+    Yield ({key: value}, launch config index, vCPUs per instance) for each
+    launch config of a WorkerPool resource.
+    """
+    project = workerPool.workerPoolId.split("/")[0].removeprefix("proj-")
+    for i, lc in enumerate(workerPool.config.get("launchConfigs", [])):
+        placement = launch_config_placement(workerPool.providerId, lc)
+        if not placement:
+            continue
+        cloud, _, machineType = placement
+        attrs = {
+            "project": project,
+            "pool": workerPool.workerPoolId,
+            "cloud": cloud,
+            "region": launch_config_region(workerPool.providerId, lc),
+            "family": machine_family(cloud, machineType),
+            "machineType": machineType,
+        }
+        yield attrs, i, machine_shapes(cloud)[machineType]["vcpus"]
+
+
+def pool_capacity(workerPool, members):
+    """
+    Return the most capacity a pool can run in the given launch configs, each
+    given as (launch config index, vCPUs per instance).
+    """
+    maxCapacity = workerPool.config["maxCapacity"]
+    launchConfigs = workerPool.config["launchConfigs"]
+    total = sum(
+        launchConfigs[i]["workerManager"].get("maxCapacity", maxCapacity)
+        for i, _ in members
+    )
+    return min(total, maxCapacity)
+
+
+def capacity_matrix(workerPools, by, where):
+    """
+    Return a sorted list of rows (key values.., pools, capacity, vCPUs),
+    aggregated by the given keys, for the launch configs matching all of the
+    {key: value} in where.
+    """
+    rows = defaultdict(lambda: [0, 0, 0])
+    for wp in workerPools:
+        groups = defaultdict(list)
+        for attrs, i, vcpus in matrix_cells(wp):
+            if all(attrs[key] == value for key, value in where.items()):
+                groups[tuple(attrs[key] for key in by)].append((i, vcpus))
+        # a pool can run its maxCapacity in each group, but not more
+        for group, members in groups.items():
+            row = rows[group]
+            row[0] += 1
+            row[1] += pool_capacity(wp, members)
+            row[2] += pool_vcpus(wp, members)
+    return [group + tuple(row) for group, row in sorted(rows.items())]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--by",
+        default="project,region,family",
+        help="comma-separated keys to aggregate by, from {}".format(", ".join(KEYS)),
+    )
+    parser.add_argument(
+        "--where",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="only count launch configs with this value (may be repeated)",
+    )
+    parser.add_argument(
+        "--output",
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="write the CSV here (default: standard output)",
+    )
+    args = parser.parse_args()
+
+    by = args.by.split(",") if args.by else []
+    where = {}
+    for term in args.where:
+        key, sep, value = term.partition("=")
+        if not sep or key not in KEYS:
+            parser.error(
+                "--where must be <key>=<value>, with key one of " + ", ".join(KEYS)
+            )
+        where[key] = value
+    unknown = set(by) - set(KEYS)
+    if unknown:
+        parser.error("unknown keys {}".format(", ".join(sorted(unknown))))
+
+    os.chdir(os.path.join(os.path.dirname(__file__), ".."))
+    resources = asyncio.run(generate_resources())
+    workerPools = [r for r in resources if isinstance(r, WorkerPool)]
+
+    writer = csv.writer(args.output)
+    writer.writerow(by + ["pools", "capacity", "vcpus"])
+    writer.writerows(capacity_matrix(workerPools, by, where))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
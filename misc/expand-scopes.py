@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Answer scope questions offline, using the roles generated by this repository
+rather than the roles currently in the deployment.  For example:
+
+  # what does a repository's role expand to?
+  misc/expand-scopes.py assume:repo:github.com/mozilla/fuzzing-tc:*
+
+  # which roles can create tasks in proj-fuzzing/ci?
+  misc/expand-scopes.py --who queue:create-task:highest:proj-fuzzing/ci
+
+  # bulk queries, one whitespace-separated list of scopes per line
+  misc/expand-scopes.py --file queries.txt
+
+Requires `pip install -e .` in the root of this repository.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+from generate import generate_resources
+from generate.scopes import ScopeResolver
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("scopes", nargs="*", metavar="SCOPE")
+    parser.add_argument(
+        "--who",
+        action="store_true",
+        help="list the roles whose expansion satisfies all of the given scopes",
+    )
+    parser.add_argument(
+        "--file",
+        type=argparse.FileType("r"),
+        help="read one query (whitespace-separated scopes) per line",
+    )
+    args = parser.parse_args()
+
+    queries = []
+    if args.scopes:
+        queries.append(args.scopes)
+    if args.file:
+        queries.extend(line.split() for line in args.file if line.strip())
+    if not queries:
+        parser.error("no scopes given")
+
+    os.chdir(os.path.join(os.path.dirname(__file__), ".."))
+    resolver = ScopeResolver.from_resources(asyncio.run(generate_resources()))
+
+    for i, query in enumerate(queries):
+        if len(queries) > 1:
+            print("{}# {}".format("\n" if i else "", " ".join(query)))
+        if args.who:
+            results = resolver.roles_satisfying(query)
+        else:
+            results = resolver.expand_scopes(query)
+        for result in results:
+            print(result)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
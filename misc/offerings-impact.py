@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Report how a change to the offerings data in /config changes the launch
+configs of each worker pool, without running `tc-admin diff`.  For example:
+
+  # review a refresh in the working tree, against HEAD
+  misc/offerings-impact.py
+
+  # review the offerings changes between two revisions
+  misc/offerings-impact.py --old origin/main --new HEAD
+
+For each pool, the launch configs that would appear (+) or disappear (-) are
+listed, as cloud, zone and machine type.  Pools left with no launch configs,
+or whose launch configs would all be in a single region when they were not
+before, are flagged, and the exit status is then 1.
+
+The launch configs each pool could have, whatever is offered (its
+requirements), are found by generating the worker pools once with every
+machine type offered everywhere.  With --requirements FILE, they are read from
+FILE if it exists, and otherwise written there, so that reviewing further
+refreshes does not need to generate anything.
+
+Requires `pip install -e .` in the root of this repository.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from tcadmin.resources import WorkerPool
+
+from generate import generate_resources, workers
+
+
+class Everything:
+    """A stand-in for a set of offerings that includes every machine type"""
+
+    def __contains__(self, item):
+        return True
+
+
+def generate_requirements():
+    """
+    Return {workerPoolId: [[cloud, region, zone, machineType], ..]}, with an
+    entry for each launch config the pool would have if every machine type were
+    offered in every zone.
+    """
+    workers.aws_instance_types_in_availability_zone = lambda az: Everything()
+    workers.azure_machine_types_in_location = lambda location: Everything()
+    workers.gcp_machine_types_by_zone = lambda: defaultdict(Everything)
+    requirements = {}
+    for resource in asyncio.run(generate_resources()):
+        if not isinstance(resource, WorkerPool):
+            continue
+        placements = []
+        for lc in resource.config.get("launchConfigs", []):
+            placement = workers.launch_config_placement(resource.providerId, lc)
+            if placement:
+                cloud, zone, machineType = placement
+                region = workers.launch_config_region(resource.providerId, lc)
+                placements.append([cloud, region, zone, machineType])
+        if placements:
+            requirements[resource.workerPoolId] = placements
+    return requirements
+
+
+class Offerings:
+    """
+    The offerings data at a git revision, or in the working tree if the
+    revision is None.  Files are read when first needed.
+    """
+
+    def __init__(self, revision=None):
+        self.revision = revision
+        self._cache = {}
+
+    def _read(self, path):
+        if self.revision is None:
+            if not os.path.exists(path):
+                return None
+            with open(path) as f:
+                return json.load(f)
+        try:
+            content = subprocess.check_output(
+                ["git", "show", f"{self.revision}:{path}"], stderr=subprocess.DEVNULL
+            )
+        except subprocess.CalledProcessError:
+            return None
+        return json.loads(content)
+
+    def _machine_types(self, cloud, zone):
+        if cloud == "gcp":
+            if "gcp" not in self._cache:
+                by_zone = defaultdict(set)
+                for pair in self._read("config/gce-machine-type-offerings.json") or []:
+                    by_zone[pair["zone"]].add(pair["name"])
+                self._cache["gcp"] = by_zone
+            return self._cache["gcp"][zone]
+        key = (cloud, zone)
+        if key not in self._cache:
+            directory = {
+                "aws": "config/ec2-instance-type-offerings",
+                "azure": "config/azure-vm-size-offerings",
+            }[cloud]
+            self._cache[key] = set(self._read(f"{directory}/{zone}.json") or [])
+        return self._cache[key]
+
+    def offered(self, cloud, zone, machineType):
+        return machineType in self._machine_types(cloud, zone)
+
+
+def impact(requirements, old, new):
+    """
+    Return a sorted list of (workerPoolId, launch configs before, launch
+    configs after, removed, added, warnings) for the pools whose launch
+    configs change between the old and new Offerings.
+    """
+    report = []
+    for workerPoolId, placements in sorted(requirements.items()):
+        before = [p for p in placements if old.offered(p[0], p[2], p[3])]
+        after = [p for p in placements if new.offered(p[0], p[2], p[3])]
+        removed = sorted({tuple(p) for p in before} - {tuple(p) for p in after})
+        added = sorted({tuple(p) for p in after} - {tuple(p) for p in before})
+        if not removed and not added:
+            continue
+        warnings = []
+        regions_before = {p[1] for p in before}
+        regions_after = {p[1] for p in after}
+        if not after:
+            warnings.append("no launch configs left")
+        elif len(regions_after) == 1 and len(regions_before) > 1:
+            warnings.append("launch configs only in region {}".format(*regions_after))
+        report.append((workerPoolId, len(before), len(after), removed, added, warnings))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--old",
+        default="HEAD",
+        help="git revision with the old offerings (default HEAD)",
+    )
+    parser.add_argument(
+        "--new",
+        help="git revision with the new offerings (default: the working tree)",
+    )
+    parser.add_argument(
+        "--requirements",
+        metavar="FILE",
+        help="read the pools' requirements from FILE, or write them there",
+    )
+    args = parser.parse_args()
+
+    requirements_file = args.requirements and os.path.abspath(args.requirements)
+    os.chdir(os.path.join(os.path.dirname(__file__), ".."))
+    if requirements_file and os.path.exists(requirements_file):
+        with open(requirements_file) as f:
+            requirements = json.load(f)
+    else:
+        requirements = generate_requirements()
+        if requirements_file:
+            with open(requirements_file, "w") as f:
+                json.dump(requirements, f, indent=2, sort_keys=True)
+                f.write("\n")
+
+    flagged = False
+    for workerPoolId, before, after, removed, added, warnings in impact(
+        requirements, Offerings(args.old), Offerings(args.new)
+    ):
+        print(f"{workerPoolId}: {before} -> {after} launch configs")
+        for sign, placements in [("-", removed), ("+", added)]:
+            for cloud, region, zone, machineType in placements:
+                print(f"  {sign} {cloud} {zone} {machineType}")
+        for warning in warnings:
+            flagged = True
+            print(f"  WARNING: {warning}")
+    if flagged:
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Add entries to /config/zone-quarantine.yml from worker-manager errors saved as
+JSON, such as the output of
+
+  taskcluster api workerManager listWorkerPoolErrors proj-fuzzing/ci > errors.json
+
+Each error is attributed to a (cloud, zone, machine type) through its
+launchConfigId, matched against the launch configs generated by this
+repository, or failing that, from the text of AWS "not supported in your
+requested Availability Zone" errors.  Combinations with at least --min-errors
+errors are quarantined for --days days; existing entries are extended, and
+expired entries are removed.  Generation fails while config/zone-quarantine.yml
+has expired entries, so run this without any ERRORS.json just to remove them.
+
+Requires `pip install -e .` in the root of this repository.
+"""
+
+import argparse
+import asyncio
+import collections
+import datetime
+import json
+import os
+import re
+import sys
+
+import yaml
+from tcadmin.resources import WorkerPool
+
+from generate import generate_resources
+from generate.workers import launch_config_placement
+
+QUARANTINE_FILE = os.path.join("config", "zone-quarantine.yml")
+
+AWS_UNSUPPORTED_RE = re.compile(
+    r"requested instance type \((?P<type>[^)]+)\) is not supported in your"
+    r" requested Availability Zone \((?P<zone>[^)]+)\)"
+)
+
+
+def load_errors(filenames):
+    """
+    Read worker-manager errors from the given files, each holding either a
+    `listWorkerPoolErrors` response or a list of errors.
+    """
+    errors = []
+    for filename in filenames:
+        with open(filename) as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("workerPoolErrors", [])
+        errors.extend(data)
+    return errors
+
+
+def placements_by_launch_config_id(resources):
+    """Return {launchConfigId: (cloud, zone, machine type)}"""
+    placements = {}
+    for resource in resources:
+        if not isinstance(resource, WorkerPool):
+            continue
+        for lc in resource.config.get("launchConfigs", []):
+            launchConfigId = lc.get("workerManager", {}).get("launchConfigId")
+            placement = launch_config_placement(resource.providerId, lc)
+            if launchConfigId and placement:
+                placements[launchConfigId] = placement
+    return placements
+
+
+def error_placement(error, placements):
+    launchConfigId = error.get("launchConfigId") or error.get("extra", {}).get(
+        "launchConfigId"
+    )
+    if launchConfigId in placements:
+        return placements[launchConfigId]
+    match = AWS_UNSUPPORTED_RE.search(error.get("description", ""))
+    if match:
+        return "aws", match.group("zone"), match.group("type")
+    return None
+
+
+class Dumper(yaml.SafeDumper):
+    # write each entry's expiry in full, rather than as an alias
+    def ignore_aliases(self, data):
+        return True
+
+
+def split_header(text):
+    """Split the leading comment block from the rest of the file"""
+    lines = text.splitlines(keepends=True)
+    i = 0
+    while i < len(lines) and (lines[i].startswith("#") or not lines[i].strip()):
+        i += 1
+    return "".join(lines[:i])
+
+
+def write_entries(header, entries):
+    """Write {(cloud, zone, machine type): entry} to QUARANTINE_FILE"""
+    body = yaml.dump(
+        [entries[k] for k in sorted(entries, key=lambda k: tuple(map(str, k)))],
+        Dumper=Dumper,
+        default_flow_style=False,
+        sort_keys=False,
+    )
+    with open(QUARANTINE_FILE, "w") as f:
+        f.write(header + body)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("errors", nargs="*", metavar="ERRORS.json")
+    parser.add_argument(
+        "--days", type=int, default=7, help="days to quarantine for (default 7)"
+    )
+    parser.add_argument(
+        "--min-errors",
+        type=int,
+        default=3,
+        help="errors needed to quarantine a zone and machine type (default 3)",
+    )
+    args = parser.parse_args()
+    errors = load_errors(args.errors)
+
+    os.chdir(os.path.join(os.path.dirname(__file__), ".."))
+    with open(QUARANTINE_FILE) as f:
+        text = f.read()
+    header = split_header(text)
+    today = datetime.date.today()
+    entries = {}
+    for entry in yaml.safe_load(text) or []:
+        if entry["expires"] >= today:
+            entries[(entry["cloud"], entry["zone"], entry.get("type"))] = entry
+    # generation fails on expired entries, so remove them before generating
+    write_entries(header, entries)
+    if not errors:
+        return
+
+    placements = placements_by_launch_config_id(asyncio.run(generate_resources()))
+
+    counts = collections.Counter()
+    reasons = collections.defaultdict(collections.Counter)
+    unattributed = 0
+    for error in errors:
+        placement = error_placement(error, placements)
+        if placement is None:
+            unattributed += 1
+            continue
+        counts[placement] += 1
+        reasons[placement][error.get("title", "")] += 1
+
+    expires = today + datetime.timedelta(days=args.days)
+    for (cloud, zone, machineType), count in sorted(counts.items()):
+        if count < args.min_errors:
+            continue
+        if (cloud, zone, None) in entries:
+            continue
+        reason = reasons[(cloud, zone, machineType)].most_common(1)[0][0]
+        entry = entries.setdefault(
+            (cloud, zone, machineType),
+            {"cloud": cloud, "zone": zone, "type": machineType, "expires": expires},
+        )
+        entry["expires"] = max(entry["expires"], expires)
+        entry["reason"] = "{} ({} errors)".format(reason, count)
+        print("quarantined {} {} {} until {}".format(cloud, zone, machineType, expires))
+
+    if unattributed:
+        print(
+            "{} errors could not be attributed to a zone".format(unattributed),
+            file=sys.stderr,
+        )
+
+    write_entries(header, entries)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Answer questions about the generated resources offline, including anything
+derived through imagesets.yml, keyed-by values or offerings filtering.  For
+example:
+
+  # which pools would be affected by retiring n2-standard-4?
+  misc/query-resources.py machineType=n2-standard-4
+
+  # which pools still use this AMI, and in which availability zone?
+  misc/query-resources.py image=ami-0c2f7ba5e98be094a zone=us-west-2a
+
+  # which roles have scopes beginning with worker-manager:manage-worker-pool:?
+  misc/query-resources.py --roles worker-manager:manage-worker-pool:
+
+  # which values are there for an attribute?
+  misc/query-resources.py --values machineType
+
+  # bulk queries, one whitespace-separated query per line
+  misc/query-resources.py --file queries.txt
+
+Pools are matched by imageset, image (an AMI, or a GCP or Azure image, by
+full name or final path component), machineType, region, zone, provider and
+implementation (the worker implementation).  Each matching pool is listed with
+the number of its launch configs matching all of the terms.
+
+Requires `pip install -e .` in the root of this repository.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from tcadmin.resources import WorkerPool
+
+from generate import generate_resources
+from generate.loader import loader
+from generate.projects import Projects, sharded_from
+from generate.resource_index import POOL_KEYS, ResourceIndex
+from generate.workers import get_image_sets, pool_image_set_names
+
+
+async def build_index():
+    resources = await generate_resources()
+    projects = await Projects.load(loader)
+    configs = {
+        "proj-{}/{}".format(project.name, name): worker_pool
+        for project in projects.values()
+        for name, worker_pool in project.workerPools.items()
+    }
+    pool_image_sets = {}
+    for resource in resources:
+        if not isinstance(resource, WorkerPool):
+            continue
+        cfg = configs.get(resource.workerPoolId)
+        if cfg is None:
+            # shards have the image sets of the pool they were split from
+            cfg = configs.get(sharded_from(resource))
+            if cfg is None or "shard" not in cfg:
+                continue
+        pool_image_sets[resource.workerPoolId] = pool_image_set_names(cfg)
+    return ResourceIndex.from_resources(
+        resources, pool_image_sets, await get_image_sets()
+    )
+
+
+def parse_terms(parser, query):
+    terms = {}
+    for term in query:
+        key, sep, value = term.partition("=")
+        if not sep or key not in POOL_KEYS:
+            parser.error(
+                "queries must be <key>=<value>, with key one of {}".format(
+                    ", ".join(POOL_KEYS)
+                )
+            )
+        terms[key] = value
+    return terms
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("query", nargs="*", metavar="KEY=VALUE|PREFIX")
+    parser.add_argument(
+        "--roles",
+        action="store_true",
+        help="list the roles with scopes beginning with each given prefix",
+    )
+    parser.add_argument(
+        "--values",
+        choices=POOL_KEYS,
+        help="list the indexed values of a pool attribute",
+    )
+    parser.add_argument(
+        "--file",
+        type=argparse.FileType("r"),
+        help="read one query (whitespace-separated terms or prefixes) per line",
+    )
+    args = parser.parse_args()
+
+    queries = []
+    if args.query:
+        queries.append(args.query)
+    if args.file:
+        queries.extend(line.split() for line in args.file if line.strip())
+    if not queries and not args.values:
+        parser.error("no query given")
+
+    os.chdir(os.path.join(os.path.dirname(__file__), ".."))
+    index = asyncio.run(build_index())
+
+    if args.values:
+        for value in index.values(args.values):
+            print(value)
+
+    for i, query in enumerate(queries):
+        if len(queries) > 1:
+            print("{}# {}".format("\n" if i else "", " ".join(query)))
+        start = time.perf_counter()
+        if args.roles:
+            for prefix in query:
+                for roleId, scopes in index.roles_with_scope_prefix(prefix):
+                    print(roleId)
+                    for scope in scopes:
+                        print("  " + scope)
+        else:
+            for workerPoolId, count in index.pools_matching(parse_terms(parser, query)):
+                print(
+                    "{} ({} of {} launch configs)".format(
+                        workerPoolId, count, index.pools[workerPoolId]
+                    )
+                )
+        elapsed = time.perf_counter() - start
+        print("# answered in {:.2f}ms".format(elapsed * 1000), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Report, for each vCPU quota in /config/cloud-quotas.yml, the most vCPUs that
+the generated worker pools can run in it, and the headroom left.  For example:
+
+  misc/quota-headroom.py
+  misc/quota-headroom.py --pools   # also list each pool's vCPUs
+
+The exit status is 1 if any quota could be oversubscribed.
+
+Requires `pip install -e .` in the root of this repository.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+from tcadmin.resources import WorkerPool
+
+from generate import generate_resources
+from generate.quotas import quota_usage
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--pools",
+        action="store_true",
+        help="list the vCPUs each pool can run in each quota",
+    )
+    args = parser.parse_args()
+
+    os.chdir(os.path.join(os.path.dirname(__file__), ".."))
+    resources = asyncio.run(generate_resources())
+    workerPools = [r for r in resources if isinstance(r, WorkerPool)]
+
+    oversubscribed = False
+    for quota, pools in quota_usage(workerPools):
+        committed = sum(pools.values())
+        headroom = quota.vcpus - committed
+        oversubscribed = oversubscribed or headroom < 0
+        print(
+            "{}: {} of {} vCPUs committed, {} headroom ({} pools)".format(
+                quota.name, committed, quota.vcpus, headroom, len(pools)
+            )
+        )
+        if args.pools:
+            for workerPoolId, vcpus in sorted(pools.items()):
+                print(f"  {workerPoolId}: {vcpus}")
+    if oversubscribed:
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Render the task template of every generated hook, for each way the hook can
+fire (schedule, pulse message, or triggerHook with sample payloads from
+misc/hook-trigger-samples.yml), and report the render latency and output size.
+Trigger payloads are validated against the hook's triggerSchema.
+
+Exits with a nonzero status if any template fails to render or any sample
+payload is invalid.
+
+Requires `pip install -e .` in the root of this repository.
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+
+import yaml
+
+from generate import generate_resources
+from generate.hook_templates import benchmark_hooks
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--samples",
+        default=os.path.join(os.path.dirname(__file__), "hook-trigger-samples.yml"),
+        help="YAML file of sample trigger payloads",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=100, help="renders per hook and context"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=None, help="parallel processes (default: CPUs)"
+    )
+    parser.add_argument(
+        "--grep", default="", help="only hooks whose ID contains this string"
+    )
+    args = parser.parse_args()
+
+    with open(args.samples) as f:
+        samples = yaml.safe_load(f) or {}
+
+    os.chdir(os.path.join(os.path.dirname(__file__), ".."))
+    resources = asyncio.run(generate_resources())
+    resources = resources.filter("^Hook=.*" + re.escape(args.grep))
+
+    results = benchmark_hooks(resources, samples, repeat=args.repeat, jobs=args.jobs)
+
+    failed = False
+    print(
+        "{:<55} {:<55} {:>9} {:>9} {:>9}".format(
+            "hook", "fired by", "bytes", "mean ms", "max ms"
+        )
+    )
+    for result in results:
+        if result["renders"]:
+            print(
+                "{hookId:<55} {context:<55} {bytes:>9} {mean_ms:>9.3f} {max_ms:>9.3f}".format(
+                    **result
+                )
+            )
+        else:
+            print("{hookId:<55} {context:<55} {:>9}".format("-", **result))
+        for problem in result["problems"]:
+            failed = True
+            print("  ERROR: " + problem)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Populate /config/pool-tuning.json with idle and lifecycle timeouts for each
+worker pool, computed from exported histories of its tasks and of its
+workers' boot times.  For example:
+
+  misc/tune-pools.py --tasks tasks.csv --boots boots.json
+
+Both files may be CSV (with a header row) or JSON (a list of objects), with
+one record per task or per worker:
+
+  tasks: workerPoolId, created (an ISO 8601 timestamp or seconds since the
+         epoch) and duration (seconds from start to resolution); tasks
+         without a duration are ignored
+  boots: workerPoolId, seconds (from requesting the instance to the worker
+         registering)
+
+For each pool, the idle window (generic-worker's idleTimeoutSecs, or
+docker-worker's shutdown.afterIdleSeconds) is the --idle-percentile of the
+pool's idle gaps, so that a worker is usually still there when the next task
+arrives.  An idle gap runs from the end of a period in which the pool has a
+task running, when its last worker becomes idle, to the next task.  Gaps
+between tasks arriving together in a burst are not idle gaps, since the
+workers are busy with the burst.  When waiting that long would cost more than
+IDLE_BOOT_MULTIPLE boots, as for rarely-used pools, the window is instead the
+--boot-percentile boot time: waiting about as long as a boot takes is never
+much worse than the best choice, whatever the next gap.
+
+registrationTimeout allows REGISTRATION_MARGIN times the --boot-percentile
+boot time, and reregistrationTimeout allows REREGISTRATION_MARGIN times the
+--duration-percentile task duration.
+
+Only the pools in the given histories are updated; other entries are kept.
+Values given in a pool's configuration in /config/projects take precedence
+over these.
+"""
+
+import argparse
+import csv
+import datetime
+import json
+import math
+import os
+import sys
+from collections import defaultdict
+
+# bounds on the idle window, in seconds
+MIN_IDLE_SECONDS = 15
+MAX_IDLE_SECONDS = 3600
+
+# the most boots' worth of time a worker may wait idle for its next task
+IDLE_BOOT_MULTIPLE = 4
+
+# registrationTimeout, as a multiple of the boot time, and its minimum
+REGISTRATION_MARGIN = 1.5
+MIN_REGISTRATION_TIMEOUT = 600
+
+# reregistrationTimeout, as a multiple of the task duration, and its minimum
+REREGISTRATION_MARGIN = 2
+MIN_REREGISTRATION_TIMEOUT = 6 * 3600
+
+
+def read_records(filename):
+    """Read a list of dicts from a CSV or JSON file"""
+    with open(filename) as f:
+        if filename.endswith(".json"):
+            return json.load(f)
+        return list(csv.DictReader(f))
+
+
+def parse_time(value):
+    """Return seconds since the epoch for an ISO 8601 timestamp or a number"""
+    try:
+        return float(value)
+    except ValueError:
+        # datetime.fromisoformat does not accept "Z" before Python 3.11
+        return datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def percentile(values, p):
+    """Return the p'th percentile of a non-empty list, by nearest rank"""
+    values = sorted(values)
+    rank = math.ceil(p / 100 * len(values))
+    return values[max(rank, 1) - 1]
+
+
+def idle_gaps(runs):
+    """
+    Return the gaps between the periods in which at least one of the given
+    (start, end) task runs is in progress.
+    """
+    gaps = []
+    busy_until = None
+    for start, end in sorted(runs):
+        if busy_until is not None and start > busy_until:
+            gaps.append(start - busy_until)
+        busy_until = end if busy_until is None else max(busy_until, end)
+    return gaps
+
+
+def idle_seconds(runs, boot, idle_percentile):
+    """
+    Return the idle window for a pool with the given (start, end) task runs
+    and boot time, or None if there are too few tasks to tell.
+    """
+    gaps = idle_gaps(runs)
+    if not gaps:
+        return None
+    idle = percentile(gaps, idle_percentile)
+    if boot is not None and idle > IDLE_BOOT_MULTIPLE * boot:
+        idle = boot
+    return min(max(math.ceil(idle), MIN_IDLE_SECONDS), MAX_IDLE_SECONDS)
+
+
+def tune(tasks, boots, args):
+    """
+    Return {workerPoolId: tuning} for the pools in the given task and boot
+    records.
+    """
+    runs = defaultdict(list)
+    durations = defaultdict(list)
+    for task in tasks:
+        if task.get("duration") not in (None, ""):
+            created = parse_time(task["created"])
+            duration = float(task["duration"])
+            runs[task["workerPoolId"]].append((created, created + duration))
+            durations[task["workerPoolId"]].append(duration)
+    boot_times = defaultdict(list)
+    for boot in boots:
+        boot_times[boot["workerPoolId"]].append(float(boot["seconds"]))
+
+    result = {}
+    for workerPoolId in sorted(set(runs) | set(boot_times)):
+        tuning = {}
+        boot = None
+        if boot_times[workerPoolId]:
+            boot = percentile(boot_times[workerPoolId], args.boot_percentile)
+            tuning["registrationTimeout"] = max(
+                math.ceil(boot * REGISTRATION_MARGIN), MIN_REGISTRATION_TIMEOUT
+            )
+        idle = idle_seconds(runs[workerPoolId], boot, args.idle_percentile)
+        if idle is not None:
+            tuning["afterIdleSeconds"] = idle
+        if durations[workerPoolId]:
+            duration = percentile(durations[workerPoolId], args.duration_percentile)
+            tuning["reregistrationTimeout"] = max(
+                math.ceil(duration * REREGISTRATION_MARGIN),
+                MIN_REREGISTRATION_TIMEOUT,
+            )
+        if tuning:
+            result[workerPoolId] = tuning
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--tasks", metavar="FILE", required=True, help="task history (CSV or JSON)"
+    )
+    parser.add_argument(
+        "--boots", metavar="FILE", help="worker boot-time history (CSV or JSON)"
+    )
+    parser.add_argument(
+        "--idle-percentile",
+        type=float,
+        default=90,
+        help="percentile of gaps between tasks covered by the idle window",
+    )
+    parser.add_argument(
+        "--boot-percentile",
+        type=float,
+        default=99,
+        help="percentile of boot times allowed for",
+    )
+    parser.add_argument(
+        "--duration-percentile",
+        type=float,
+        default=100,
+        help="percentile of task durations allowed for",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="print the new entries rather than updating the file",
+    )
+    args = parser.parse_args()
+
+    tasks = read_records(args.tasks)
+    boots = read_records(args.boots) if args.boots else []
+    tuned = tune(tasks, boots, args)
+
+    if args.dry_run:
+        json.dump(tuned, sys.stdout, indent=2, sort_keys=True)
+        print()
+        return
+
+    os.chdir(os.path.join(os.path.dirname(__file__), ".."))
+    tuning_file = os.path.join("config", "pool-tuning.json")
+    with open(tuning_file) as f:
+        table = json.load(f)
+    table.update(tuned)
+    with open(tuning_file, "w") as f:
+        json.dump(table, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"updated {len(tuned)} pools in {tuning_file}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
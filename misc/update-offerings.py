@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Refresh the machine type offerings and shapes in /config, for the zones that
+config/aws.yml, config/gcp.yml and config/azure.yml use:
+
+  config/ec2-instance-type-offerings/<availability zone>.json
+  config/gce-machine-type-offerings.json
+  config/azure-vm-size-offerings/<location>.json
+  config/ec2-instance-types.json, config/gce-machine-types.json and
+  config/azure-vm-sizes.json
+
+This data is reasonably static, and a little time consuming to generate, and
+therefore is not generated every time tc-admin is run.  Rerun this if Worker
+Manager reports that a machine type is not available in a zone.
+
+Zones are queried concurrently (at most --jobs cloud CLI calls at once), and
+only files whose content changed are rewritten.  Offerings for zones that are
+not used are left alone, unless --all-zones is given, in which case every zone
+is refreshed, and offerings for zones that no longer exist are removed.
+Shapes are merged into the existing files.
+
+By default the aws, gcloud and az CLIs are used, with suitable credentials.
+With --fixtures DIR, the data is read from DIR instead, as
+
+  DIR/<cloud>/locations.json      [[region, zone], ..] for --all-zones
+  DIR/<cloud>/offerings/<zone>.json  [machine type, ..]
+  DIR/<cloud>/shapes.json         {machine type: shape}
+
+where <cloud> is aws, gcp or azure; this is useful for trying changes to this
+script without cloud credentials, and is used by its tests in generate/tests.
+
+Requires `pip install -e .` in the root of this repository.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+
+from generate.workers import cloud_config
+
+CLOUDS = ["aws", "gcp", "azure"]
+
+AWS_OFFERINGS_DIR = os.path.join("config", "ec2-instance-type-offerings")
+GCP_OFFERINGS_FILE = os.path.join("config", "gce-machine-type-offerings.json")
+AZURE_OFFERINGS_DIR = os.path.join("config", "azure-vm-size-offerings")
+SHAPES_FILES = {
+    "aws": os.path.join("config", "ec2-instance-types.json"),
+    "gcp": os.path.join("config", "gce-machine-types.json"),
+    "azure": os.path.join("config", "azure-vm-sizes.json"),
+}
+
+# the size of each GCP local SSD partition
+GCP_LOCAL_SSD_GB = 375
+
+# the CPU architectures that the clouds report for Arm machine types (aws
+# "arm64", gcloud "ARM64", az "Arm64"); anything else is taken to be amd64
+ARM64_ARCHITECTURES = {"arm64"}
+
+
+def number(value):
+    """Return a number as jq would write it: integral values without `.0`"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def architecture(*names):
+    """
+    Return the architecture ("amd64" or "arm64") of a machine type, given the
+    CPU architecture names its cloud reports for it
+    """
+    if any(n and n.lower() in ARM64_ARCHITECTURES for n in names):
+        return "arm64"
+    return "amd64"
+
+
+def used_locations(cloud):
+    """Return the sorted (region, zone) pairs used by config/<cloud>.yml"""
+    config = cloud_config(cloud)
+    if cloud == "aws":
+        return sorted(
+            (region, az)
+            for region, subnets in config["subnets"].items()
+            for az in subnets
+        )
+    if cloud == "gcp":
+        return sorted(
+            (region, f"{region}-{zone}")
+            for region, zones in config["regions"].items()
+            for zone in zones["zones"]
+        )
+    return sorted((location, location) for location in config["subnets"])
+
+
+class CliBackend:
+    """Fetch offerings and shapes with the aws, gcloud and az CLIs"""
+
+    def __init__(self, jobs):
+        self.semaphore = asyncio.Semaphore(jobs)
+
+    async def run_json(self, *args):
+        async with self.semaphore:
+            process = await asyncio.create_subprocess_exec(
+                *args, stdout=asyncio.subprocess.PIPE
+            )
+            stdout, _ = await process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(
+                "{} exited with {}".format(" ".join(args), process.returncode)
+            )
+        return json.loads(stdout)
+
+    async def locations(self, cloud):
+        if cloud == "aws":
+            regions = await self.run_json(
+                "aws",
+                "ec2",
+                "describe-regions",
+                "--no-paginate",
+                "--query",
+                "Regions[*].RegionName",
+                "--output",
+                "json",
+            )
+            zones = await asyncio.gather(
+                *(
+                    self.run_json(
+                        "aws",
+                        "--region",
+                        region,
+                        "ec2",
+                        "describe-availability-zones",
+                        "--no-paginate",
+                        "--filters",
+                        f"Name=region-name,Values={region}",
+                        "--query",
+                        "AvailabilityZones[*].ZoneName",
+                        "--output",
+                        "json",
+                    )
+                    for region in regions
+                )
+            )
+            return sorted(
+                (region, az) for region, azs in zip(regions, zones) for az in azs
+            )
+        if cloud == "gcp":
+            zones = await self.run_json(
+                "gcloud",
+                "compute",
+                "zones",
+                "list",
+                "--format=json(name,region)",
+                "--project=community-tc-workers",
+            )
+            return sorted((z["region"].split("/")[-1], z["name"]) for z in zones)
+        locations = await self.run_json(
+            "az", "account", "list-locations", "--query=[].name", "--output", "json"
+        )
+        return sorted((location, location) for location in set(locations))
+
+    async def offerings(self, cloud, region, zone):
+        if cloud == "aws":
+            return await self.run_json(
+                "aws",
+                "--region",
+                region,
+                "ec2",
+                "describe-instance-type-offerings",
+                "--no-paginate",
+                "--query",
+                "sort(InstanceTypeOfferings[*].InstanceType)",
+                "--location-type",
+                "availability-zone",
+                "--filters",
+                f"Name=location,Values={zone}",
+                "--output",
+                "json",
+            )
+        if cloud == "gcp":
+            machineTypes = await self.run_json(
+                "gcloud",
+                "compute",
+                "machine-types",
+                "list",
+                "--format=json(name)",
+                f"--zones={zone}",
+                "--project=community-tc-workers",
+            )
+            return sorted(mt["name"] for mt in machineTypes)
+        return await self.run_json(
+            "az",
+            "vm",
+            "list-skus",
+            "--location",
+            zone,
+            "--resource-type",
+            "virtualMachines",
+            "--query=sort([].name)",
+            "--output",
+            "json",
+        )
+
+    async def shapes(self, cloud, regions):
+        if cloud == "aws":
+            shapes = {}
+            for instanceTypes in await asyncio.gather(
+                *(
+                    self.run_json(
+                        "aws",
+                        "--region",
+                        region,
+                        "ec2",
+                        "describe-instance-types",
+                        "--query",
+                        "InstanceTypes[*].{name: InstanceType,"
+                        " vcpus: VCpuInfo.DefaultVCpus,"
+                        " memoryMiB: MemoryInfo.SizeInMiB,"
+                        " localDiskGb: InstanceStorageInfo.TotalSizeInGB,"
+                        " localDisks: InstanceStorageInfo.Disks[0].Count,"
+                        " architectures: ProcessorInfo.SupportedArchitectures}",
+                        "--output",
+                        "json",
+                    )
+                    for region in regions
+                )
+            ):
+                for it in instanceTypes:
+                    shapes[it["name"]] = {
+                        "vcpus": it["vcpus"],
+                        "memoryGb": number(it["memoryMiB"] / 1024),
+                        "localDiskGb": it["localDiskGb"] or 0,
+                        "localDisks": it["localDisks"] or 0,
+                        "architecture": architecture(*it["architectures"] or []),
+                    }
+            return shapes
+        if cloud == "gcp":
+            machineTypes = await self.run_json(
+                "gcloud",
+                "compute",
+                "machine-types",
+                "list",
+                "--format=json(name,guestCpus,memoryMb,bundledLocalSsds,architecture)",
+                "--project=community-tc-workers",
+            )
+            return {
+                mt["name"]: {
+                    "vcpus": mt["guestCpus"],
+                    "memoryGb": number(mt["memoryMb"] / 1024),
+                    "localDiskGb": (
+                        mt.get("bundledLocalSsds", {}).get("partitionCount", 0)
+                        * GCP_LOCAL_SSD_GB
+                    ),
+                    "architecture": architecture(mt.get("architecture")),
+                }
+                for mt in machineTypes
+            }
+        skus = await self.run_json(
+            "az",
+            "vm",
+            "list-skus",
+            "--resource-type",
+            "virtualMachines",
+            "--query=[].{name: name, capabilities: capabilities}",
+            "--output",
+            "json",
+        )
+        shapes = {}
+        for sku in skus:
+            c = {cap["name"]: cap["value"] for cap in sku["capabilities"] or []}
+            shapes[sku["name"]] = {
+                "vcpus": number(float(c["vCPUs"])),
+                "memoryGb": number(float(c["MemoryGB"])),
+                "localDiskGb": number(float(c.get("MaxResourceVolumeMB", 0)) / 1024),
+                "cacheDiskGb": math.floor(float(c.get("CachedDiskBytes", 0)) / 2**30),
+                "nvmeDiskGb": number(float(c.get("NvmeDiskSizeInMiB", 0)) / 1024),
+                "ephemeralOsDisk": c.get("EphemeralOSDiskSupported") == "True",
+                "architecture": architecture(c.get("CpuArchitectureType")),
+            }
+        return shapes
+
+
+class FixtureBackend:
+    """Read offerings and shapes from JSON files (see the module docstring)"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _load(self, cloud, *path):
+        with open(os.path.join(self.directory, cloud, *path)) as f:
+            return json.load(f)
+
+    async def locations(self, cloud):
+        locations = self._load(cloud, "locations.json")
+        return sorted(tuple(location) for location in locations)
+
+    async def offerings(self, cloud, region, zone):
+        return sorted(self._load(cloud, "offerings", f"{zone}.json"))
+
+    async def shapes(self, cloud, regions):
+        return self._load(cloud, "shapes.json")
+
+
+def write_if_changed(filename, data, indent=2):
+    """
+    Write data as JSON, unless the file already holds exactly that.  Return
+    True if the file was written.
+    """
+    content = json.dumps(data, indent=indent, sort_keys=True) + "\n"
+    if os.path.exists(filename):
+        with open(filename) as f:
+            if f.read() == content:
+                return False
+    with open(filename, "w") as f:
+        f.write(content)
+    return True
+
+
+async def refresh_cloud(backend, cloud, all_zones):
+    """
+    Refresh the offerings and shapes of one cloud, returning the list of files
+    written or removed.
+    """
+    if all_zones:
+        locations = await backend.locations(cloud)
+    else:
+        locations = used_locations(cloud)
+    offerings, shapes = await asyncio.gather(
+        asyncio.gather(
+            *(backend.offerings(cloud, region, zone) for region, zone in locations)
+        ),
+        backend.shapes(cloud, sorted({region for region, _ in locations})),
+    )
+    offerings = {zone: types for (_, zone), types in zip(locations, offerings)}
+
+    changed = []
+    if cloud == "gcp":
+        with open(GCP_OFFERINGS_FILE) as f:
+            existing = json.load(f)
+        # with all zones, entries for zones that no longer exist are dropped
+        entries = (
+            [] if all_zones else [e for e in existing if e["zone"] not in offerings]
+        )
+        entries.extend(
+            {"name": name, "zone": zone}
+            for zone, types in offerings.items()
+            for name in types
+        )
+        entries.sort(key=lambda e: (e["zone"], e["name"]))
+        if write_if_changed(GCP_OFFERINGS_FILE, entries):
+            changed.append(GCP_OFFERINGS_FILE)
+    else:
+        directory = AWS_OFFERINGS_DIR if cloud == "aws" else AZURE_OFFERINGS_DIR
+        # the aws CLI writes JSON with an indent of 4
+        indent = 4 if cloud == "aws" else 2
+        os.makedirs(directory, exist_ok=True)
+        for zone, types in sorted(offerings.items()):
+            filename = os.path.join(directory, f"{zone}.json")
+            if write_if_changed(filename, types, indent=indent):
+                changed.append(filename)
+        if all_zones:
+            for name in sorted(os.listdir(directory)):
+                if name.endswith(".json") and name[: -len(".json")] not in offerings:
+                    os.remove(os.path.join(directory, name))
+                    changed.append(os.path.join(directory, name))
+
+    with open(SHAPES_FILES[cloud]) as f:
+        merged = json.load(f)
+    merged.update(shapes)
+    if write_if_changed(SHAPES_FILES[cloud], merged):
+        changed.append(SHAPES_FILES[cloud])
+    return changed
+
+
+async def refresh(backend, clouds, all_zones):
+    changed = await asyncio.gather(
+        *(refresh_cloud(backend, cloud, all_zones) for cloud in clouds)
+    )
+    return [filename for filenames in changed for filename in filenames]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--cloud",
+        action="append",
+        choices=CLOUDS,
+        help="only refresh this cloud (may be repeated)",
+    )
+    parser.add_argument(
+        "--all-zones",
+        action="store_true",
+        help="refresh every zone, not just those used in config/<cloud>.yml",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=10,
+        help="the most cloud CLI calls to make at once (default 10)",
+    )
+    parser.add_argument(
+        "--fixtures",
+        metavar="DIR",
+        help="read the data from files in DIR rather than from the cloud CLIs",
+    )
+    args = parser.parse_args()
+
+    if args.fixtures:
+        backend = FixtureBackend(os.path.abspath(args.fixtures))
+    else:
+        backend = CliBackend(args.jobs)
+    os.chdir(os.path.join(os.path.dirname(__file__), ".."))
+    changed = asyncio.run(refresh(backend, args.cloud or CLOUDS, args.all_zones))
+    for filename in changed:
+        print(filename)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public License,
+# v. 2.0. If a copy of the MPL was not distributed with this file, You can
+# obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Populate /config/spot-prices.json with the current spot price of every machine
+type, in every region, used by a worker pool with
+
+  workerManagerConfig:
+    initialWeight: price-performance
+
+Like the offerings data, this is reasonably static and a little time consuming
+to generate, so it is not generated every time tc-admin is run.  Rerun it when
+adding such a pool, or from time to time as prices change.  Existing entries,
+including any hand-written `throughput` values, are kept.
+
+You will need the aws CLI and gcloud CLI in your PATH, with suitable
+credentials.  Azure prices come from the public Azure Retail Prices API.
+Prices are for Linux; the relative cost of machine types is what matters.
+
+Requires `pip install -e .` in the root of this repository.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import subprocess
+import sys
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+from generate import generate_resources, workers
+
+# the Compute Engine service in the Cloud Billing Catalog API
+GCE_SERVICE = "services/6F81-5844-456A"
+
+
+def wanted_prices():
+    """
+    Return {cloud: {machineType: set(regions)}} for the launch configs of
+    pools weighted by price/performance, by generating the worker pools with
+    a stand-in for `price_performance` that records what it is asked for.
+    """
+    wanted = defaultdict(lambda: defaultdict(set))
+
+    def record(cloud, machineType, region):
+        wanted[cloud][machineType].add(region)
+        return 1
+
+    workers.price_performance = record
+    asyncio.run(generate_resources())
+    return wanted
+
+
+def run_json(*args):
+    return json.loads(subprocess.check_output(args))
+
+
+def aws_prices(machineType, regions):
+    """Return the lowest current spot price across each region's zones"""
+    prices = {}
+    for region in regions:
+        history = run_json(
+            "aws",
+            "--region",
+            region,
+            "ec2",
+            "describe-spot-price-history",
+            "--instance-types",
+            machineType,
+            "--product-descriptions",
+            "Linux/UNIX",
+            "--start-time",
+            datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "--output",
+            "json",
+        )["SpotPriceHistory"]
+        if history:
+            prices[region] = min(float(h["SpotPrice"]) for h in history)
+    return prices
+
+
+def azure_prices(machineType, regions):
+    """Return the Linux spot price in each region from the Retail Prices API"""
+    prices = {}
+    for region in regions:
+        query = urllib.parse.urlencode(
+            {
+                "$filter": (
+                    "serviceName eq 'Virtual Machines' and priceType eq 'Consumption'"
+                    f" and armRegionName eq '{region}' and armSkuName eq '{machineType}'"
+                )
+            }
+        )
+        url = f"https://prices.azure.com/api/retail/prices?{query}"
+        while url:
+            with urllib.request.urlopen(url) as response:
+                page = json.load(response)
+            for item in page["Items"]:
+                if item["skuName"].endswith(" Spot") and "Windows" not in item.get(
+                    "productName", ""
+                ):
+                    prices[region] = item["retailPrice"]
+            url = page.get("NextPageLink")
+    return prices
+
+
+def gcp_sku_rates():
+    """
+    Return {(family, "Core" or "Ram", region): USD per vCPU- or GB-hour} for
+    spot VMs, from the Cloud Billing Catalog API.
+    """
+    token = subprocess.check_output(
+        ["gcloud", "auth", "print-access-token"], text=True
+    ).strip()
+    rates = {}
+    page_token = ""
+    while True:
+        url = "https://cloudbilling.googleapis.com/v1/{}/skus?{}".format(
+            GCE_SERVICE, urllib.parse.urlencode({"pageToken": page_token})
+        )
+        request = urllib.request.Request(
+            url, headers={"Authorization": f"Bearer {token}"}
+        )
+        with urllib.request.urlopen(request) as response:
+            page = json.load(response)
+        for sku in page.get("skus", []):
+            # e.g. "Spot Preemptible N2 Instance Core running in Americas"
+            words = sku["description"].split()
+            if words[:2] != ["Spot", "Preemptible"] or words[3:4] != ["Instance"]:
+                continue
+            resource = words[4]
+            if resource not in ("Core", "Ram"):
+                continue
+            rate = sku["pricingInfo"][0]["pricingExpression"]["tieredRates"][-1]
+            price = int(rate["unitPrice"]["units"]) + rate["unitPrice"]["nanos"] / 1e9
+            for region in sku["serviceRegions"]:
+                rates[(words[2].lower(), resource, region)] = price
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            return rates
+
+
+def gcp_prices(machineType, regions, _rates={}):
+    """Return the spot price in each region, from the per-core and per-GB rates"""
+    if not _rates:
+        _rates.update(gcp_sku_rates())
+    shape = workers.machine_shapes("gcp")[machineType]
+    family = machineType.split("-")[0]
+    prices = {}
+    for region in regions:
+        core = _rates.get((family, "Core", region))
+        ram = _rates.get((family, "Ram", region))
+        if core is not None and ram is not None:
+            prices[region] = round(core * shape["vcpus"] + ram * shape["memoryGb"], 6)
+    return prices
+
+
+FETCHERS = {"aws": aws_prices, "azure": azure_prices, "gcp": gcp_prices}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--cloud",
+        action="append",
+        choices=sorted(FETCHERS),
+        help="only update prices for this cloud (may be repeated)",
+    )
+    args = parser.parse_args()
+
+    os.chdir(os.path.join(os.path.dirname(__file__), ".."))
+    prices_file = os.path.join("config", "spot-prices.json")
+    with open(prices_file) as f:
+        table = json.load(f)
+
+    missing = []
+    wanted = wanted_prices()
+    for cloud, machineTypes in sorted(wanted.items()):
+        if args.cloud and cloud not in args.cloud:
+            continue
+        for machineType, regions in sorted(machineTypes.items()):
+            print(f"{cloud} {machineType}: {len(regions)} regions", file=sys.stderr)
+            prices = FETCHERS[cloud](machineType, sorted(regions))
+            entry = table.setdefault(cloud, {}).setdefault(machineType, {})
+            entry.setdefault("prices", {}).update(prices)
+            missing.extend(
+                f"{cloud} {machineType} {region}"
+                for region in sorted(regions - set(prices))
+            )
+
+    with open(prices_file, "w") as f:
+        json.dump(table, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+    if missing:
+        print("no spot price found for:", *missing, sep="\n  ", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
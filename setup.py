@@ -10,8 +10,9 @@ setup(
     packages=find_packages("."),
     install_requires=[
         "tc-admin>=5.2.1",
-        "json-e>=4.7.1",
+        "json-e==4.8.4",
         "ruamel.yaml",
+        "jsonschema",
     ],
     setup_requires=["pytest-runner"],
     tests_require=["pytest-mock", "pytest-asyncio"],